@@ -15,9 +15,9 @@ Typical usage:
 
 import logging
 from contextvars import ContextVar
-from typing import Optional
+from typing import Callable, Optional
 
-from config.config import DEFAULT_LLM
+from config.config import DEFAULT_LLM, SERVER_MODE
 
 logger = logging.getLogger(__name__)
 # Context variable storing the model for current request chain
@@ -42,3 +42,33 @@ def get_current_model() -> str:
     except LookupError:
         logger.error("Current request context not set. Defaulting to {DEFAULT_LLM}")
         return DEFAULT_LLM  # Default fallback
+
+
+def get_llm_backend(model: Optional[str] = None) -> str:
+    """
+    The backend serving the model (default: the current one): "bedrock" for the
+    default LLM in cloud mode, otherwise "groq" (the OpenAI-compatible API).
+    """
+    model = model or get_current_model()
+    if SERVER_MODE != "local" and model == DEFAULT_LLM:
+        return "bedrock"
+    return "groq"
+
+
+# Progress callback of the background job running this request chain, if any
+progress_callback_ctx: ContextVar[Optional[Callable[[float, str], None]]] = ContextVar(
+    "progress_callback", default=None
+)
+
+
+def report_progress(fraction: float, message: str):
+    """
+    Reports how far the current generation is (0..1) to the job running it.
+    A no-op outside of background jobs.
+    """
+    callback = progress_callback_ctx.get()
+    if callback is not None:
+        try:
+            callback(min(max(fraction, 0.0), 1.0), message)
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {str(e)}")
@@ -1,16 +1,29 @@
 # app/endpoints/generate.py
 
+import asyncio
+import contextvars
+import csv
+import io
 import json
 import logging
 import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from pathlib import Path
 
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 
-from app.context.request_context import selected_model_ctx
+from app.context.request_context import get_llm_backend, selected_model_ctx
 from app.lambda_function import lambda_handler
-from app.models.request import GenerateRequest, GenerateResponse
-from config.config import DEFAULT_LLM
+from app.models.request import GenerateRequest, GenerateResponse, OutputFormat
+from app.services.bulkhead import BulkheadFullError, get_bulkhead, run_in_bulkhead
+from app.services.stream_generation import GenerationStream, open_generation_stream
+from config.config import (
+    DEFAULT_LLM,
+    PIPELINE_RETRY_AFTER_SECONDS,
+    PIPELINE_STREAM_BUFFER_CHUNKS,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -32,8 +45,10 @@ async def generate_data(request: GenerateRequest):
             request.parameters.get("selectedModel", DEFAULT_LLM)
         )
 
-        # Call lambda handler and get raw response
-        lambda_response = lambda_handler(request, None)
+        # Call lambda handler and get raw response. It blocks on the LLM, so it
+        # runs on the selected backend's bulkhead (with this request's context)
+        # to keep the event loop free
+        lambda_response = await run_in_bulkhead(lambda_handler, request, None)
 
         # Check if lambda returned an error response
         if (
@@ -55,6 +70,13 @@ async def generate_data(request: GenerateRequest):
         )
     except HTTPException:
         raise  # Re-raise our custom HTTP exceptions
+    except BulkheadFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(PIPELINE_RETRY_AFTER_SECONDS)},
+        )
     except Exception as e:
         logger.exception(f"Failed to process request: {str(e)}")
         raise HTTPException(
@@ -64,3 +86,171 @@ async def generate_data(request: GenerateRequest):
     finally:
         # Clean up context to prevent leaks
         selected_model_ctx.reset(token)
+
+
+STREAM_MEDIA_TYPES = {
+    OutputFormat.CSV: "text/csv",
+    OutputFormat.JSON: "application/x-ndjson",
+}
+
+
+@router.post("/generate/stream", status_code=status.HTTP_200_OK)
+async def generate_data_stream(request: GenerateRequest):
+    """
+    Generate synthetic data and stream the rows as they are produced.
+
+    output_format "csv" streams a CSV file (header first). "json" streams NDJSON:
+    one {"row": {...}} line per row, then {"done": {"rows": n, "url": ...}} once
+    the full file has been saved, or {"error": ...} if generation fails midway.
+    """
+    media_type = STREAM_MEDIA_TYPES.get(request.output_format)
+    if media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Streaming supports the csv and json output formats only",
+        )
+
+    logger.info(f"Processing streaming request: {request.model_dump_json()}")
+    # The response body is produced after this function returns, so the model
+    # selection lives in a context of its own that every step runs in
+    context = contextvars.copy_context()
+    context.run(
+        selected_model_ctx.set,
+        (request.parameters or {}).get("selectedModel", DEFAULT_LLM),
+    )
+
+    # Opening the stream and producing every row run as one call on the
+    # backend's bulkhead, which hands the encoded lines to the response through
+    # a bounded queue. The first item is None once the stream is open, so
+    # template errors still surface as HTTP errors
+    encode = _csv_lines if request.output_format == OutputFormat.CSV else _ndjson_lines
+    lines = asyncio.Queue(maxsize=PIPELINE_STREAM_BUFFER_CHUNKS)
+    stop = threading.Event()
+    try:
+        get_bulkhead(context.run(get_llm_backend)).submit(
+            _produce_lines,
+            _run_in_context(context, _open_lines(request, encode)),
+            lines,
+            asyncio.get_running_loop(),
+            stop,
+        )
+        try:
+            opened = await lines.get()
+        except BaseException:
+            # Cancelled before the stream opened: release the worker
+            stop.set()
+            raise
+        if isinstance(opened, BaseException):
+            raise opened
+    except BulkheadFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(PIPELINE_RETRY_AFTER_SECONDS)},
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Failed to start streaming request: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error during synthetic data generation: {str(e)}",
+        )
+
+    return StreamingResponse(_consume_lines(lines, stop), media_type=media_type)
+
+
+# Put on the queue after the last line
+_END = object()
+
+
+def _open_lines(request: GenerateRequest, encode):
+    """Opens the generation stream, yields None, then the encoded lines."""
+    stream = open_generation_stream(request)
+    yield None
+    yield from encode(stream)
+
+
+def _produce_lines(lines_iterator, lines: asyncio.Queue, loop, stop: threading.Event):
+    """
+    Runs on a bulkhead worker: hands every line to the event loop's queue,
+    then _END, or the exception that ended the stream. Stops once the
+    response is gone (stop set).
+    """
+    try:
+        for line in lines_iterator:
+            if not _hand_over(line, lines, loop, stop):
+                return
+    except Exception as e:
+        _hand_over(e, lines, loop, stop)
+        return
+    _hand_over(_END, lines, loop, stop)
+
+
+def _hand_over(item, lines: asyncio.Queue, loop, stop: threading.Event) -> bool:
+    """Blocks until the queue takes the item; False if the consumer went away."""
+    future = asyncio.run_coroutine_threadsafe(lines.put(item), loop)
+    while True:
+        try:
+            future.result(timeout=1.0)
+            return True
+        except FutureTimeoutError:
+            if stop.is_set():
+                future.cancel()
+                return False
+
+
+async def _consume_lines(lines: asyncio.Queue, stop: threading.Event):
+    try:
+        while True:
+            line = await lines.get()
+            if line is _END:
+                return
+            if isinstance(line, BaseException):
+                raise line
+            yield line
+    finally:
+        # Client disconnected or the stream ended: release the worker
+        stop.set()
+
+
+def _ndjson_lines(stream: GenerationStream):
+    try:
+        for row in stream:
+            yield json.dumps({"row": row}, default=str) + "\n"
+        yield json.dumps({"done": {"rows": stream.rows, "url": stream.location}}) + "\n"
+    except Exception as e:
+        logger.exception(f"Streaming generation failed: {str(e)}")
+        yield json.dumps({"error": str(e)}) + "\n"
+
+
+def _csv_lines(stream: GenerationStream):
+    buffer = io.StringIO()
+    writer = None
+    try:
+        for row in stream:
+            if writer is None:
+                writer = csv.DictWriter(
+                    buffer, fieldnames=list(row), extrasaction="ignore"
+                )
+                writer.writeheader()
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated file
+        logger.exception(f"Streaming generation failed: {str(e)}")
+
+
+def _run_in_context(context: contextvars.Context, iterator):
+    """Advances the iterator inside the context (each step may run on another thread)."""
+    while True:
+        try:
+            item = context.run(next, iterator)
+        except StopIteration:
+            return
+        yield item
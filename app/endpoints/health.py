@@ -0,0 +1,55 @@
+# app/endpoints/health.py
+
+import logging
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.services.bulkhead import bulkhead_stats
+from app.services.llm_cache import get_llm_cache
+from app.services.model_registry import get_model_registry
+from app.services.rate_limiter import rate_limiter_stats
+from app.services.resilience import get_resilient_caller
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/health/live")
+async def liveness():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """
+    Readiness probe: only returns 200 once the model registry has loaded all
+    models and completed its warmup inference.
+    """
+    registry_status = get_model_registry().status()
+    if not registry_status["ready"]:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "warming_up", **registry_status},
+        )
+    return {"status": "ready", **registry_status}
+
+
+@router.get("/health/pipeline")
+async def pipeline():
+    """
+    Load of the per-backend pipeline bulkheads (running and queued requests,
+    limits, and how many were completed, failed or rejected with a 503), the
+    LLM response cache hit rate, the per-model rate limiters (concurrency
+    limit, in-flight calls and throttle events) and the LLM backends' circuit
+    breakers, latencies and retry/hedge/failover counts.
+    """
+    return {
+        "backends": bulkhead_stats(),
+        "llm_cache": get_llm_cache().stats(),
+        "rate_limits": rate_limiter_stats(),
+        "llm_resilience": get_resilient_caller().stats(),
+    }
@@ -0,0 +1,65 @@
+# app/endpoints/jobs.py
+
+import logging
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
+
+from app.endpoints.upload import read_upload
+from app.models.job import Job
+from app.models.request import GenerateRequest
+from app.services.bulkhead import BulkheadFullError
+from app.services.job_manager import get_job_manager
+from config.config import DEFAULT_LLM, PIPELINE_RETRY_AFTER_SECONDS
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.post("/jobs", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(request: GenerateRequest):
+    """
+    Queue synthetic data generation for a prompt and return the job right away.
+    Poll GET /api/jobs/{job_id} for progress and the result URL.
+    """
+    logger.info(f"Queueing request: {request.model_dump_json()}")
+    model = (request.parameters or {}).get("selectedModel", DEFAULT_LLM)
+    try:
+        return get_job_manager().submit_template(request, model)
+    except BulkheadFullError as e:
+        raise _at_capacity(e)
+
+
+@router.post("/jobs/upload", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def create_upload_job(
+    file: UploadFile = File(...), selected_model: str = Form(..., alias="selectedModel")
+):
+    """
+    Queue EPIC generation from an uploaded sample file and return the job right away.
+    """
+    content = await read_upload(file)
+    try:
+        return get_job_manager().submit_epic(content, selected_model)
+    except BulkheadFullError as e:
+        raise _at_capacity(e)
+
+
+@router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str):
+    """
+    Status, progress and (once succeeded) the result of a generation job.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found"
+        )
+    return job
+
+
+def _at_capacity(error: BulkheadFullError) -> HTTPException:
+    logger.warning(str(error))
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(error),
+        headers={"Retry-After": str(PIPELINE_RETRY_AFTER_SECONDS)},
+    )
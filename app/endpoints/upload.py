@@ -10,11 +10,13 @@ from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
 from app.context.request_context import selected_model_ctx
 from app.lambda_function import lambda_handler
 from app.models.request import GenerateResponse
+from app.services.bulkhead import BulkheadFullError, run_in_bulkhead
 from app.upload_main import main
 from app.utils.utility import save_uploaded_data_locally, save_uploaded_data_to_s3
 from config.config import (
     ALLOWED_UPLOAD_EXTENSIONS,
     ENABLE_PII,
+    PIPELINE_RETRY_AFTER_SECONDS,
     SAVE_UPLOADED_FILE,
     SERVER_MODE,
 )
@@ -32,29 +34,12 @@ async def upload_file(
         # Set context for this request chain
         token = selected_model_ctx.set(selected_model)
 
-        # --- Validation 1: Check file extension ---
-        file_extension = (
-            os.path.splitext(file.filename)[1].lower() if file.filename else ""
-        )
-        if file_extension not in ALLOWED_UPLOAD_EXTENSIONS:
-            error = f"Invalid file type. Only {', '.join(ALLOWED_UPLOAD_EXTENSIONS)} files are allowed"
-            logger.error(error)
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
-
-        # --- Read content ---
-        content = await file.read()
-
-        # --- Save uploaded file ---
-        if SAVE_UPLOADED_FILE:
-            if SERVER_MODE == "local":
-                upload_result = await save_uploaded_data_locally(file, content)
-            else:
-                upload_result = await save_uploaded_data_to_s3(file, content)
-                if ENABLE_PII:
-                    content = upload_result["originalFileName"]
-
-        # Call lambda handler and get raw response
-        lambda_response = lambda_handler(None, content)
+        content = await read_upload(file)
+
+        # Call lambda handler and get raw response. It blocks on the LLM, so it
+        # runs on the selected backend's bulkhead (with this request's context)
+        # to keep the event loop free
+        lambda_response = await run_in_bulkhead(lambda_handler, None, content)
 
         # Check if lambda returned an error response
         if (
@@ -77,6 +62,13 @@ async def upload_file(
 
     except HTTPException:
         raise  # Re-raise our custom HTTP exceptions
+    except BulkheadFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(PIPELINE_RETRY_AFTER_SECONDS)},
+        )
     except Exception as e:
         logger.exception(f"Failed to process request: {str(e)}")
         raise HTTPException(
@@ -86,3 +78,36 @@ async def upload_file(
     finally:
         # Clean up context to prevent leaks
         selected_model_ctx.reset(token)
+
+
+async def read_upload(file: UploadFile):
+    """
+    Validates and reads an uploaded sample file, saving it when
+    SAVE_UPLOADED_FILE is set.
+
+    Returns:
+        The content for the EPIC flow: the file bytes, or the stored file name
+        when PII masking reads it from S3.
+
+    Raises:
+        HTTPException: 400 for unsupported file types.
+    """
+    # --- Validation 1: Check file extension ---
+    file_extension = os.path.splitext(file.filename)[1].lower() if file.filename else ""
+    if file_extension not in ALLOWED_UPLOAD_EXTENSIONS:
+        error = f"Invalid file type. Only {', '.join(ALLOWED_UPLOAD_EXTENSIONS)} files are allowed"
+        logger.error(error)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+
+    # --- Read content ---
+    content = await file.read()
+
+    # --- Save uploaded file ---
+    if SAVE_UPLOADED_FILE:
+        if SERVER_MODE == "local":
+            upload_result = await save_uploaded_data_locally(file, content)
+        else:
+            upload_result = await save_uploaded_data_to_s3(file, content)
+            if ENABLE_PII:
+                content = upload_result["originalFileName"]
+    return content
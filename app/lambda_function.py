@@ -2,6 +2,7 @@ import json
 import logging
 
 from app.main import main_template
+from app.services.model_registry import get_model_registry
 from app.upload_main import main  # Import the main function from main.py
 
 logger = logging.getLogger(__name__)
@@ -18,7 +19,13 @@ def lambda_handler(request, content, event=""):
         # Decide between flow 1 OR 2
         if content == None:
             logger.info(f"Started template-generation")
-            status_code, result = main_template(user_input=request.prompt)
+            # Models are loaded once per container; later invocations reuse them
+            get_model_registry().warmup()
+            status_code, result = main_template(
+                user_input=request.prompt,
+                volume=request.volume,
+                parameters=request.parameters,
+            )
         else:
             logger.info(f"Started epic-generation.")
             status_code, result = main(content)
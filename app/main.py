@@ -10,7 +10,7 @@ from app.models.request import OutputFormat
 logger = logging.getLogger(__name__)
 
 
-def main_template(user_input):
+def main_template(user_input, volume=10, parameters=None):
     try:
         # Get the current script's directory
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -26,8 +26,8 @@ def main_template(user_input):
         request = GenerateRequest(
             prompt=user_input,
             output_format=OutputFormat.CSV,
-            volume=10,
-            parameters=None,
+            volume=volume,
+            parameters=parameters,
         )
 
         result = preprocess_input(request)
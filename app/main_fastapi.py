@@ -8,7 +8,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.core.logging import setup_logging
-from app.endpoints import generate, upload
+from app.endpoints import generate, health, jobs, upload
+from app.services.bulkhead import shutdown_bulkheads
+from app.services.http_client import bind_event_loop, close_http_clients
+from app.services.job_manager import shutdown_job_manager
+from app.services.model_registry import start_background_warmup
+from app.services.resilience import get_resilient_caller
 
 
 # Initialize logging before the app starts@asynccontextmanager
@@ -16,7 +21,19 @@ from app.endpoints import generate, upload
 async def lifespan(app: FastAPI):
     # Startup: initialize logging
     setup_logging()
+    # Load spaCy, the sentence encoder and the FAISS index once per worker in the
+    # background; /api/health/ready turns green after the warmup inference
+    warmup_task = start_background_warmup()
+    # LLM HTTP calls from the worker threads share one pooled client on this loop
+    bind_event_loop()
     yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+    # Stop the background job and pipeline workers before their HTTP clients go away
+    shutdown_job_manager()
+    shutdown_bulkheads()
+    get_resilient_caller().shutdown()
+    await close_http_clients()
 
 
 app = FastAPI(
@@ -38,6 +55,8 @@ app.add_middleware(
 # Include the generate endpoint router under a common prefix (e.g., /api)
 app.include_router(generate.router, prefix="/api")
 app.include_router(upload.router, prefix="/api")
+app.include_router(health.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
 
 if __name__ == "__main__":
     import uvicorn
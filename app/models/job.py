@@ -0,0 +1,40 @@
+# app/models/job.py
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Dict, Optional
+
+from pydantic import BaseModel, Field
+
+
+class JobKind(str, Enum):
+    TEMPLATE = "template"  # Prompt-based generation (GenerateRequest)
+    EPIC = "epic"  # Generation from an uploaded sample file
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    @property
+    def finished(self) -> bool:
+        return self in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Job(BaseModel):
+    job_id: str = Field(..., description="Identifier to poll GET /api/jobs/{job_id}")
+    kind: JobKind
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = Field(0.0, ge=0.0, le=1.0, description="Fraction completed")
+    message: Optional[str] = Field(None, description="Current step")
+    result: Optional[Dict] = Field(
+        None, description="Same data as the synchronous endpoint, including the url"
+    )
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=utc_now)
+    updated_at: datetime = Field(default_factory=utc_now)
@@ -0,0 +1,140 @@
+# app/services/bedrock_client.py
+"""
+Process-wide cache of Bedrock runtime clients.
+
+Creating a boto3 Session and client per call re-resolves credentials and starts
+with a cold connection pool. Clients are cached per (profile, region, endpoint)
+and configured with a connection pool large enough for concurrent batches,
+adaptive retries and explicit timeouts. boto3 clients are thread-safe once
+created; sessions are not, so creation happens under a lock.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from config.config import (
+    AWS_PROFILE,
+    BEDROCK_CONNECT_TIMEOUT,
+    BEDROCK_ENDPOINT_URL,
+    BEDROCK_MAX_ATTEMPTS,
+    BEDROCK_MAX_POOL_CONNECTIONS,
+    BEDROCK_READ_TIMEOUT,
+    BEDROCK_RETRY_MODE,
+    REGION_NAME,
+)
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[Tuple[Optional[str], str, Optional[str]], Any] = {}
+_lock = threading.Lock()
+
+
+def get_bedrock_client(
+    profile_name: Optional[str] = AWS_PROFILE,
+    region_name: str = REGION_NAME,
+    endpoint_url: Optional[str] = BEDROCK_ENDPOINT_URL,
+):
+    """
+    Returns the shared bedrock-runtime client for the profile and region,
+    creating it on first use.
+
+    Args:
+        profile_name: AWS profile (None for the default credential chain).
+        region_name: AWS region.
+        endpoint_url: Optional endpoint override (VPC endpoint, local stub).
+
+    Returns:
+        botocore.client.BaseClient: The bedrock-runtime client.
+    """
+    key = (profile_name, region_name, endpoint_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _create_client(profile_name, region_name, endpoint_url)
+            _clients[key] = client
+    return client
+
+
+def _create_client(profile_name, region_name, endpoint_url):
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+        retries={"mode": BEDROCK_RETRY_MODE, "max_attempts": BEDROCK_MAX_ATTEMPTS},
+        connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+        read_timeout=BEDROCK_READ_TIMEOUT,
+    )
+    # Initialize AWS Session with IAM Identity Center (SSO) profile
+    session = boto3.Session(profile_name=profile_name)
+    logger.info(f"Creating bedrock-runtime client for {profile_name}/{region_name}")
+    return session.client(
+        "bedrock-runtime",
+        region_name=region_name,
+        endpoint_url=endpoint_url,
+        config=config,
+    )
+
+
+def clear_bedrock_clients():
+    """Drops the cached clients (e.g. after rotating credentials)."""
+    with _lock:
+        _clients.clear()
+
+
+# Benchmark: cached client vs. a new session and client per call, against a
+# local stub of the InvokeModel API (no AWS account needed)
+if __name__ == "__main__":
+    import json
+    import os
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubBedrock(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = json.dumps({"completion": "`a,b\n1,2\n`"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBedrock)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "stub")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "stub")
+
+    def invoke(client):
+        response = client.invoke_model(modelId="stub-model", body=b"{}")
+        return json.loads(response["body"].read())
+
+    def uncached():
+        return invoke(_create_client(None, REGION_NAME, endpoint))
+
+    def cached():
+        return invoke(get_bedrock_client(None, REGION_NAME, endpoint))
+
+    calls, workers = 200, 16
+    for name, func in (("per-call client", uncached), ("cached client", cached)):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda _: func(), range(calls)))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:>16}: {calls / elapsed:7.1f} calls/sec "
+            f"({elapsed / calls * 1000:.2f} ms/call, {workers} threads)"
+        )
+    server.shutdown()
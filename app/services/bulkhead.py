@@ -0,0 +1,152 @@
+# app/services/bulkhead.py
+"""
+Per-backend bulkheads for the blocking generation pipeline.
+
+The async endpoints hand lambda_handler (spaCy, embeddings, boto3, HTTP calls)
+to a Bulkhead: a bounded thread pool with a bounded wait queue. Each LLM backend
+gets its own, so a Bedrock slowdown fills the Bedrock pool and queue while Groq
+requests keep their threads. When a backend's queue is full, requests are
+rejected with BulkheadFullError (a 503 at the API) instead of piling up.
+
+The caller's contextvars (selected_model_ctx, ...) are copied into the worker.
+
+Typical usage:
+- Endpoints: await run_in_bulkhead(lambda_handler, request, None)
+- Health: bulkhead_stats() for active/queued/rejected counts per backend
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from app.context.request_context import get_llm_backend
+from config.config import PIPELINE_MAX_QUEUE, PIPELINE_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class BulkheadFullError(RuntimeError):
+    """Raised when a bulkhead's wait queue is full."""
+
+
+class Bulkhead:
+    """A bounded thread pool plus a bounded wait queue for one backend."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"{name}-pipeline"
+        )
+
+    def submit(self, func: Callable, *args) -> Future:
+        """
+        Runs func(*args) on the bulkhead's pool in a copy of the caller's context.
+
+        Raises:
+            BulkheadFullError: If all workers are busy and the queue is full.
+        """
+        with self._lock:
+            if self.active + self.queued >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise BulkheadFullError(
+                    f"The {self.name} backend is at capacity "
+                    f"({self.active} running, {self.queued} queued)"
+                )
+            self.queued += 1
+
+        context = contextvars.copy_context()
+        future = self._executor.submit(self._call, context, func, args)
+        future.add_done_callback(self._on_done)
+        return future
+
+    async def run(self, func: Callable, *args):
+        """Awaitable submit(); cancelling the await drops the call if it hasn't started."""
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def _call(self, context, func, args):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return context.run(func, *args)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            if future.cancelled():
+                # Cancelled while waiting, _call never ran
+                self.queued -= 1
+            elif future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "active": self.active,
+                "queued": self.queued,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_bulkheads: Dict[str, Bulkhead] = {}
+_bulkheads_lock = threading.Lock()
+
+
+def get_bulkhead(backend: str) -> Bulkhead:
+    """The process-wide bulkhead of a backend ("bedrock" or "groq")."""
+    bulkhead = _bulkheads.get(backend)
+    if bulkhead is None:
+        with _bulkheads_lock:
+            bulkhead = _bulkheads.get(backend)
+            if bulkhead is None:
+                bulkhead = Bulkhead(
+                    backend, PIPELINE_MAX_WORKERS[backend], PIPELINE_MAX_QUEUE[backend]
+                )
+                _bulkheads[backend] = bulkhead
+    return bulkhead
+
+
+async def run_in_bulkhead(func: Callable, *args, backend: Optional[str] = None):
+    """
+    Runs blocking pipeline work on the bulkhead of the backend serving the
+    current request's model (set selected_model_ctx first).
+
+    Raises:
+        BulkheadFullError: If that backend is at capacity.
+    """
+    return await get_bulkhead(backend or get_llm_backend()).run(func, *args)
+
+
+def bulkhead_stats() -> Dict[str, Dict]:
+    """Load of every backend's bulkhead, including ones not used yet."""
+    return {backend: get_bulkhead(backend).stats() for backend in PIPELINE_MAX_WORKERS}
+
+
+def shutdown_bulkheads():
+    """Stops the bulkhead pools (app shutdown); queued calls are cancelled."""
+    with _bulkheads_lock:
+        for bulkhead in _bulkheads.values():
+            bulkhead.shutdown()
+        _bulkheads.clear()
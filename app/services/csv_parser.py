@@ -1,38 +1,176 @@
+import csv
 import json
 import logging
 import re
-from typing import Dict, Optional
+import time
+from typing import Iterable, List, NamedTuple, Optional, Set
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Language tag after an opening ``` fence, e.g. ```csv
+_LANGUAGE_TAG = re.compile(r"[A-Za-z-]*")
+# Bare CSV (outside backticks) ends at a blank line
+_BARE_END = "\n\n"
+# Share of the expected columns a line must name to start a bare block while
+# streaming
+_BARE_HEADER_MATCH = 0.5
+
+
+class CsvBlock(NamedTuple):
+    """A candidate CSV payload found in an LLM response."""
+
+    kind: str  # "fenced" (```), "span" (` or ``) or "bare" (no backticks)
+    text: str
+
+
+def _fence_length(text: str, start: int) -> int:
+    end = start
+    while end < len(text) and text[end] == "`":
+        end += 1
+    return end - start
+
+
+def _skip_language_tag(text: str, start: int) -> int:
+    """Where a fenced block's data starts: past its ```csv line, if it has one."""
+    newline = text.find("\n", start)
+    line_end = len(text) if newline == -1 else newline
+    if _LANGUAGE_TAG.fullmatch(text[start:line_end].strip()):
+        return min(line_end + 1, len(text))
+    return start
+
+
+def _field_count(line: str) -> int:
+    return len(next(csv.reader([line]), []))
+
+
+def _bare_blocks(text: str) -> List[CsvBlock]:
+    """Runs of two or more consecutive lines with commas in text."""
+    blocks = []
+    run: List[str] = []
+    for line in text.split("\n") + [""]:
+        if "," in line:
+            run.append(line)
+            continue
+        # Skip leading prose ("Sure, here it is:") introducing the data or not
+        # as wide as the header
+        first = 0
+        while first < len(run) - 1 and (
+            run[first].rstrip().endswith(":")
+            or _field_count(run[first]) != _field_count(run[first + 1])
+        ):
+            first += 1
+        if len(run) - first >= 2:
+            blocks.append(CsvBlock("bare", "\n".join(run[first:])))
+        run = []
+    return blocks
+
+
+def scan_csv_blocks(text: str) -> List[CsvBlock]:
+    """
+    Every candidate CSV block of an LLM response, in one pass over the text:
+    fenced blocks (```, with or without a language tag), `single` or ``double``
+    backtick spans, and bare comma-separated lines outside backticks.
+
+    A block runs to its matching closing fence, so backticks inside a fenced
+    block are data; an unclosed block (a truncated answer) runs to the end.
+    """
+    blocks = []
+    pos = 0
+    while pos < len(text):
+        start = text.find("`", pos)
+        if start == -1:
+            blocks.extend(_bare_blocks(text[pos:]))
+            break
+        if start > pos:
+            blocks.extend(_bare_blocks(text[pos:start]))
+
+        fence = _fence_length(text, start)
+        data_start = start + fence
+        if fence >= 3:
+            data_start = _skip_language_tag(text, data_start)
+        end = text.find("`" * fence, data_start)
+        if end == -1:
+            end = len(text)
+        blocks.append(
+            CsvBlock("fenced" if fence >= 3 else "span", text[data_start:end])
+        )
+        pos = end + fence
+    return blocks
+
+
+def _column_key(name: str) -> str:
+    return name.strip().strip("\"'").lower()
+
+
+def _expected_keys(expected_columns: Iterable[str]) -> List[Set[str]]:
+    # An expected "Parent.Child" column also matches a bare "Child" header
+    return [
+        {_column_key(column), _column_key(column.rsplit(".", 1)[-1])}
+        for column in expected_columns
+    ]
+
+
+def _header_match(header: List[str], expected: List[Set[str]]) -> float:
+    """Share of the expected columns named in header."""
+    names = {_column_key(column) for column in header}
+    return sum(1 for keys in expected if keys & names) / len(expected)
+
+
+def select_csv_block(
+    blocks: List[CsvBlock], expected_columns: Optional[Iterable[str]] = None
+) -> Optional[CsvBlock]:
+    """
+    The block most likely to hold the requested CSV: the one whose header
+    names most of expected_columns, then tabular blocks (a header of two or
+    more columns and at least one row), blocks in backticks over bare lines,
+    and the most rows. Ties go to the earlier block.
+    """
+    expected = _expected_keys(expected_columns or [])
+    best, best_rank = None, None
+    for index, block in enumerate(blocks):
+        body = block.text.strip()
+        if not body:
+            continue
+        newline = body.find("\n")
+        header = next(csv.reader([body if newline == -1 else body[:newline]]), [])
+        rows = body.count("\n")
+        tabular = len(header) > 1 and rows > 0
+        rank = (
+            _header_match(header, expected) if expected else 0,
+            tabular,
+            block.kind != "bare",
+            rows,
+            -index,
+        )
+        if best_rank is None or rank > best_rank:
+            best, best_rank = block, rank
+    return best
+
 
 class CsvParser:
-    """Class to parse and process JSON data from LLM responses"""
+    """Class to parse and process CSV data from LLM responses"""
 
     @staticmethod
-    def parse_csv_response(raw_response: str):
+    def parse_csv_response(
+        raw_response: str, expected_columns: Optional[Iterable[str]] = None
+    ):
         """
-        Process raw LLM response and extract valid JSON data
+        Process raw LLM response and extract its CSV data
         Args:
             raw_response: Raw string response from LLM
+            expected_columns: Optional columns the CSV should have; picks the
+                              block whose header matches them best
         Returns:
-            List of parsed JSON dictionaries
+            The CSV text of the selected block (see select_csv_block)
         """
         try:
-            # Extract the CSV data from the output text
-            # old code
-            # csv_data_match = re.search(
-            #     r"```tabular-data-csv\s*(.*)\s*```", raw_response, re.DOTALL
-            # )
-            csv_data_match = re.search(r"`([^`]+)`", raw_response, re.DOTALL)
-            if csv_data_match:
-                csv_data = csv_data_match.group(1)
-            else:
+            block = select_csv_block(scan_csv_blocks(raw_response), expected_columns)
+            if block is None:
                 raise ValueError("No CSV data found in the provided text.")
 
-            return csv_data
+            return block.text
 
         except (ValueError, json.JSONDecodeError) as e:
             logger.error(f"Parsing failed: {str(e)}")
@@ -40,3 +178,251 @@ class CsvParser:
         except Exception as e:
             logger.error(f"Unexpected error: {str(e)}")
             raise
+
+
+def _partial_fence(text: str, fence: str) -> int:
+    """Length of the longest proper prefix of fence that text ends with."""
+    for size in range(len(fence) - 1, 0, -1):
+        if text.endswith(fence[:size]):
+            return size
+    return 0
+
+
+class IncrementalCsvParser:
+    """
+    Incremental counterpart of CsvParser.parse_csv_response for streamed LLM
+    output, fed chunk by chunk.
+
+    feed() returns every record whose terminating newline has arrived (newlines
+    inside quoted fields don't end a record). The first record is the header and
+    is kept in `header` rather than returned. Text before the opening backtick(s)
+    and a language tag after an opening ``` fence are skipped; the matching
+    closing fence ends the data, so inline backticks in a fenced block are data.
+
+    A block without records (an inline `code` span in the prose) or whose header
+    names none of expected_columns is skipped and the search goes on. With
+    expected_columns, a line naming most of them also starts a bare block, up to
+    the next blank line. A response without any block is scanned as a whole on
+    close() (see scan_csv_blocks).
+    """
+
+    def __init__(self, expected_columns: Optional[Iterable[str]] = None):
+        self.header: Optional[List[str]] = None
+        self._expected_columns = list(expected_columns or [])
+        self._expected = _expected_keys(self._expected_columns)
+        self._state = "search"  # search -> data -> done, back to search on a skip
+        self._window = ""  # Unsearched text: the last incomplete line or fence
+        self._seen: List[str] = []  # Text searched since the last block
+        self._fence = ""  # Closing delimiter of the current block
+        self._carry = ""  # Data ending in part of the closing fence
+        self._skip = False  # Dropping the current block
+        self._rows = 0  # Records returned from the current block
+        self._pending = ""  # Data after the last complete record
+        self._quotes = 0  # Quotes in _pending so far
+        self._scanned = 0  # How much of _pending has been scanned for newlines
+
+    def feed(self, chunk: str) -> List[List[str]]:
+        """Consumes a chunk and returns the records it completed."""
+        rows: List[List[str]] = []
+        while chunk and self._state != "done":
+            if self._state == "search":
+                self._seen.append(chunk)
+                chunk = self._find_data_start(chunk, final=False)
+                if chunk is None:
+                    break
+                self._state = "data"
+            chunk = self._consume(chunk, rows)
+        return rows
+
+    def close(self) -> List[List[str]]:
+        """
+        Ends the stream and returns the last record (if it had no newline).
+
+        Raises:
+            ValueError: If no CSV data was found.
+        """
+        if self._state == "search":
+            data = self._find_data_start("", final=True)
+            if data is None:
+                return self._parse_seen()
+            self._state = "data"
+            rows = self.feed(data)
+            return rows + self.close()
+        if self._state == "done":
+            return []
+        self._state = "done"
+        return [] if self._skip else self._flush()
+
+    def _find_data_start(self, chunk: str, final: bool) -> Optional[str]:
+        """Data of the block chunk opens, or None while no opening is complete."""
+        text = self._window + chunk
+        start = text.find("`")
+        header = self._find_bare_header(text, len(text) if start == -1 else start)
+        if header != -1:
+            self._open(_BARE_END)
+            return text[header:]
+        if start == -1:
+            self._window = text[text.rfind("\n") + 1 :]
+            return None
+
+        fence = _fence_length(text, start)
+        data_start = start + fence
+        if data_start == len(text) and not final:
+            # The fence may continue in the next chunk
+            self._window = text[start:]
+            return None
+        if fence >= 3:
+            if text.find("\n", data_start) == -1 and not final:
+                self._window = text[start:]
+                return None
+            data_start = _skip_language_tag(text, data_start)
+        self._open("`" * fence)
+        return text[data_start:]
+
+    def _find_bare_header(self, text: str, end: int) -> int:
+        """Start of the first complete line before end naming the expected columns."""
+        if not self._expected:
+            return -1
+        line_start = 0
+        while True:
+            newline = text.find("\n", line_start, end)
+            if newline == -1:
+                return -1
+            header = next(csv.reader([text[line_start:newline]]), [])
+            if header and _header_match(header, self._expected) >= _BARE_HEADER_MATCH:
+                return line_start
+            line_start = newline + 1
+
+    def _open(self, fence: str):
+        self._fence = fence
+        self._window, self._seen = "", []
+        self._carry, self._skip, self._rows = "", False, 0
+        self._pending, self._quotes, self._scanned = "", 0, 0
+        self.header = None
+
+    def _consume(self, chunk: str, rows: List[List[str]]) -> str:
+        """
+        Feeds block data and returns the text after the block if it ended
+        without records, to search on; "" otherwise.
+        """
+        text = self._carry + chunk
+        end = text.find(self._fence)
+        if end == -1:
+            # A closing fence split across chunks completes in the next one
+            keep = _partial_fence(text, self._fence)
+            data, self._carry, rest = (
+                text[: len(text) - keep],
+                text[len(text) - keep :],
+                "",
+            )
+        else:
+            data, self._carry, rest = text[:end], "", text[end + len(self._fence) :]
+        if not self._skip:
+            self._pending += data
+            rows.extend(self._complete_records())
+        if end == -1:
+            return ""
+
+        if not self._skip:
+            rows.extend(self._flush())
+        if self._rows:
+            self._state = "done"
+            return ""
+        self._state = "search"
+        return rest
+
+    def _parse_seen(self) -> List[List[str]]:
+        """The best block of a response that never opened one while streaming."""
+        self._state = "done"
+        block = select_csv_block(
+            scan_csv_blocks("".join(self._seen)), self._expected_columns
+        )
+        if block is None:
+            raise ValueError("No CSV data found in the provided text.")
+        self._pending = block.text + "\n"
+        return self._complete_records() + self._flush()
+
+    def _complete_records(self) -> List[List[str]]:
+        text = self._pending
+        records = []
+        record_start = 0
+        pos = self._scanned
+        quotes = self._quotes
+        while True:
+            newline = text.find("\n", pos)
+            if newline == -1:
+                break
+            quotes += text.count('"', pos, newline)
+            pos = newline + 1
+            # An odd quote count means the newline is inside a quoted field
+            if quotes % 2 == 0:
+                records.append(text[record_start:newline])
+                record_start = pos
+                quotes = 0
+        self._quotes = quotes + text.count('"', pos)
+        self._pending = text[record_start:]
+        self._scanned = len(self._pending)
+        return self._parse_records(records)
+
+    def _flush(self) -> List[List[str]]:
+        records = [self._pending] if self._pending.strip() else []
+        self._pending, self._quotes, self._scanned = "", 0, 0
+        return self._parse_records(records)
+
+    def _parse_records(self, records: List[str]) -> List[List[str]]:
+        if self._skip:
+            return []
+        rows = [
+            row
+            for row in csv.reader(record.rstrip("\r") for record in records)
+            if row and any(field.strip() for field in row)
+        ]
+        if rows and self.header is None:
+            header = rows.pop(0)
+            if self._expected and not _header_match(header, self._expected):
+                # Not the requested data, e.g. an example in another format
+                self._skip = True
+                return []
+            self.header = header
+        self._rows += len(rows)
+        return rows
+
+
+# Throughput benchmark on multi-megabyte responses
+if __name__ == "__main__":
+    import random
+
+    rng = random.Random(0)
+    columns = ["PolicyID", "PolicyHolder", "Premium", "Notes"]
+    lines = [",".join(columns)] + [
+        f'POL-{i:07d},Holder {i},{rng.uniform(100, 5000):.2f},"Note {i}, ok"'
+        for i in range(100_000)
+    ]
+    csv_text = "\n".join(lines) + "\n"
+    example = "```csv\nid,value\n1,`x`\n```\n"
+    responses = {
+        "fenced": f"Use `{columns[0]}` as key.\n{example}Data:\n```csv\n{csv_text}```\n",
+        "span": f"Here it is, as asked:\n`{csv_text}`\nDone.",
+        "bare": f"Here it is, as asked:\n{csv_text}\nDone.",
+    }
+    for kind, response in responses.items():
+        megabytes = len(response) / 1e6
+
+        start = time.perf_counter()
+        data = CsvParser.parse_csv_response(response, columns)
+        elapsed = time.perf_counter() - start
+        assert data.count("\n") >= 100_000
+
+        start = time.perf_counter()
+        parser = IncrementalCsvParser(columns)
+        rows = 0
+        for i in range(0, len(response), 64):
+            rows += len(parser.feed(response[i : i + 64]))
+        rows += len(parser.close())
+        streamed = time.perf_counter() - start
+        assert rows == 100_000
+
+        print(
+            f"{kind:>6}: {megabytes:.1f} MB, scan {megabytes / elapsed:7.1f} MB/sec, "
+            f"incremental (64-char chunks) {megabytes / streamed:5.1f} MB/sec"
+        )
@@ -0,0 +1,347 @@
+# app/services/deduplicator.py
+"""
+Hash-based duplicate suppression for generated rows.
+
+Rows are fingerprinted as 64-bit hashes of their normalized values (strings
+stripped, lower-cased and whitespace-collapsed, numbers in one canonical
+float format, so "100" and 100.0 collide). RowDeduplicator drops rows whose
+fingerprint was seen before, either as an exact row or by its key columns
+(the template's primary identifier, such as PolicyID), across:
+- the sample data the generation was seeded with (EPIC uploads), and
+- every earlier batch / chunk of the same job.
+
+Seen fingerprints are kept in a sorted NumPy array (8 bytes per row). Past
+DEDUP_MAX_EXACT_FINGERPRINTS they move to a Bloom filter sized for
+DEDUP_BLOOM_CAPACITY rows, so memory stays bounded for multi-million-row jobs
+at the cost of occasionally dropping a unique row (DEDUP_BLOOM_FALSE_POSITIVE_RATE).
+"""
+
+import logging
+import math
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.local_generator import is_identifier, key_columns
+from config.config import (
+    DEDUP_BLOOM_CAPACITY,
+    DEDUP_BLOOM_FALSE_POSITIVE_RATE,
+    DEDUP_MAX_EXACT_FINGERPRINTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Multiplier combining column hashes into a row hash (the 64-bit FNV prime)
+_COMBINE_PRIME = np.uint64(0x100000001B3)
+# Hash of a missing value
+_MISSING_HASH = np.uint64(0x9E3779B97F4A7C15)
+# First characters of text that may parse as a number
+_NUMBER_START = frozenset("0123456789+-.")
+# New fingerprints are buffered and merged into the sorted array in bulk
+_PENDING_LIMIT = 65536
+
+
+def _hash_values(values: pd.Series) -> np.ndarray:
+    """
+    pd.util.hash_array of each value's canonical form: numbers (numeric columns
+    and numeric text alike) as float64, other text stripped, lower-cased and
+    whitespace-collapsed.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return pd.util.hash_array(values.to_numpy(dtype=float))
+    # Plain comprehensions beat chained pandas str accessors here
+    texts = values.tolist()
+    if not pd.api.types.is_string_dtype(values):
+        texts = [str(value) for value in texts]
+    folded = [" ".join(text.split()).lower() for text in texts]
+    hashes = pd.util.hash_array(np.array(folded, dtype=object))
+    candidates = [i for i, text in enumerate(folded) if text[:1] in _NUMBER_START]
+    if candidates:
+        numbers = pd.to_numeric(
+            pd.Series([folded[i] for i in candidates], dtype=object), errors="coerce"
+        ).to_numpy(dtype=float)
+        numeric = ~np.isnan(numbers)
+        hashes[np.array(candidates)[numeric]] = pd.util.hash_array(numbers[numeric])
+    return hashes
+
+
+@lru_cache(maxsize=4096)
+def _name_hash(name: str) -> np.uint64:
+    return pd.util.hash_array(np.array([name], dtype=object))[0]
+
+
+def fingerprint_rows(
+    df: pd.DataFrame, columns: Optional[List[str]] = None
+) -> np.ndarray:
+    """
+    One uint64 fingerprint per row over the normalized values of `columns`
+    (all columns by default). Column order doesn't matter.
+
+    Each column is factorized and only its distinct values are normalized and
+    hashed (see _hash_values); the codes map them back to the rows.
+    """
+    names = {
+        str(column).strip().lower(): column
+        for column in (df.columns if columns is None else columns)
+    }
+    row_hashes = np.zeros(len(df), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for name in sorted(names):
+            codes, uniques = pd.factorize(df[names[name]])
+            hashes = _hash_values(pd.Series(uniques))
+            # Missing values get code -1, i.e. the appended last slot
+            hashes = np.append(hashes, _MISSING_HASH)[codes]
+            # Mixing in the column name keeps "a,b" apart from "b,a"
+            row_hashes = row_hashes * _COMBINE_PRIME ^ (hashes ^ _name_hash(name))
+    return row_hashes
+
+
+class BloomFilter:
+    """Bit-array Bloom filter over uint64 fingerprints (double hashing)."""
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        bits = max(
+            64, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        )
+        self.size = bits
+        self.hash_count = max(1, round(bits / capacity * math.log(2)))
+        self._bits = np.zeros((bits + 7) // 8, dtype=np.uint8)
+        self._offsets = np.arange(self.hash_count, dtype=np.uint64)
+
+    def _positions(self, fingerprints: np.ndarray) -> np.ndarray:
+        low = fingerprints & np.uint64(0xFFFFFFFF)
+        high = (fingerprints >> np.uint64(32)) | np.uint64(1)
+        with np.errstate(over="ignore"):
+            positions = low[:, None] + self._offsets[None, :] * high[:, None]
+        return positions % np.uint64(self.size)
+
+    def contains(self, fingerprints: np.ndarray) -> np.ndarray:
+        positions = self._positions(fingerprints)
+        bits = self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7))
+        return (bits & 1).astype(bool).all(axis=1)
+
+    def add(self, fingerprints: np.ndarray):
+        positions = self._positions(fingerprints).ravel()
+        np.bitwise_or.at(
+            self._bits,
+            positions >> np.uint64(3),
+            (1 << (positions & np.uint64(7))).astype(np.uint8),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self._bits.nbytes
+
+
+class FingerprintSet:
+    """
+    Seen fingerprints: exact (a sorted array plus a small unsorted buffer) up
+    to max_exact entries, then a Bloom filter.
+    """
+
+    def __init__(
+        self,
+        max_exact: int = DEDUP_MAX_EXACT_FINGERPRINTS,
+        bloom_capacity: int = DEDUP_BLOOM_CAPACITY,
+        false_positive_rate: float = DEDUP_BLOOM_FALSE_POSITIVE_RATE,
+    ):
+        self.max_exact = max_exact
+        self.bloom_capacity = bloom_capacity
+        self.false_positive_rate = false_positive_rate
+        self.count = 0
+        self._sorted = np.empty(0, dtype=np.uint64)
+        self._pending = np.empty(0, dtype=np.uint64)
+        self._bloom: Optional[BloomFilter] = None
+
+    @property
+    def exact(self) -> bool:
+        return self._bloom is None
+
+    def contains(self, fingerprints: np.ndarray) -> np.ndarray:
+        if self._bloom is not None:
+            return self._bloom.contains(fingerprints)
+        found = np.zeros(len(fingerprints), dtype=bool)
+        if len(self._sorted):
+            index = np.searchsorted(self._sorted, fingerprints)
+            index[index == len(self._sorted)] = 0
+            found = self._sorted[index] == fingerprints
+        if len(self._pending):
+            found |= np.isin(fingerprints, self._pending)
+        return found
+
+    def add(self, fingerprints: np.ndarray):
+        """Adds fingerprints that aren't in the set yet."""
+        self.count += len(fingerprints)
+        if self._bloom is not None:
+            self._bloom.add(fingerprints)
+            return
+        self._pending = np.concatenate((self._pending, fingerprints))
+        if len(self._pending) >= _PENDING_LIMIT:
+            self._sorted = np.union1d(self._sorted, self._pending)
+            self._pending = np.empty(0, dtype=np.uint64)
+        if self.count > self.max_exact:
+            self._switch_to_bloom()
+
+    def _switch_to_bloom(self):
+        logger.info(
+            f"{self.count} fingerprints, switching to a Bloom filter for "
+            f"{self.bloom_capacity} rows"
+        )
+        self._bloom = BloomFilter(
+            max(self.bloom_capacity, self.count), self.false_positive_rate
+        )
+        self._bloom.add(np.concatenate((self._sorted, self._pending)))
+        self._sorted = self._pending = np.empty(0, dtype=np.uint64)
+
+    @property
+    def nbytes(self) -> int:
+        if self._bloom is not None:
+            return self._bloom.nbytes
+        return self._sorted.nbytes + self._pending.nbytes
+
+
+def _first_occurrences(fingerprints: np.ndarray) -> np.ndarray:
+    """True for the first row of each fingerprint within one batch."""
+    first = np.zeros(len(fingerprints), dtype=bool)
+    first[np.unique(fingerprints, return_index=True)[1]] = True
+    return first
+
+
+class RowDeduplicator:
+    """Drops rows already seen, exactly or by key columns, across batches."""
+
+    def __init__(
+        self,
+        key_columns: Iterable[str] = (),
+        seed_rows: Optional[pd.DataFrame] = None,
+        exact_rows: bool = True,
+        **fingerprint_options,
+    ):
+        """
+        Args:
+            key_columns: Columns identifying a row (e.g. PolicyID); rows
+                         repeating a seen key are dropped even if other
+                         values differ.
+            seed_rows: Rows that count as seen from the start, e.g. the
+                       sample data shown to the LLM.
+            exact_rows: Also drop repeats of whole rows; False only checks
+                        the key columns (cheaper for wide generated frames).
+            fingerprint_options: max_exact, bloom_capacity and
+                                 false_positive_rate of the fingerprint sets.
+        """
+        self.key_columns = list(key_columns)
+        self.exact_rows = exact_rows
+        self._rows = FingerprintSet(**fingerprint_options)
+        self._keys = FingerprintSet(**fingerprint_options)
+        self.dropped_exact = 0
+        self.dropped_key = 0
+        if seed_rows is not None and len(seed_rows):
+            self.filter(seed_rows)
+            self.dropped_exact = self.dropped_key = 0
+
+    @classmethod
+    def for_fields(cls, fields: Dict, **kwargs) -> "RowDeduplicator":
+        """Keyed on the template's primary identifier (see key_columns)."""
+        return cls(key_columns=key_columns(fields), **kwargs)
+
+    @classmethod
+    def for_sample(cls, sample: pd.DataFrame, **kwargs) -> "RowDeduplicator":
+        """
+        Seeded with sample data and keyed on its first identifier-like column
+        whose values are unique in the sample; identifiers repeating there
+        (e.g. a ClientID shared by several rows) are foreign keys.
+        """
+        keys = [
+            column
+            for column in sample.columns
+            if is_identifier(str(column), {}) and sample[column].is_unique
+        ]
+        return cls(key_columns=keys[:1], seed_rows=sample, **kwargs)
+
+    def filter(self, df: pd.DataFrame) -> pd.DataFrame:
+        """The rows of df not seen before; they are remembered as seen."""
+        if df.empty:
+            return df
+        keep = np.ones(len(df), dtype=bool)
+        if self.exact_rows:
+            rows = fingerprint_rows(df)
+            keep = _first_occurrences(rows) & ~self._rows.contains(rows)
+        dropped_exact = int(len(df) - keep.sum())
+
+        # Keys are matched case-insensitively, and Parent.Child also matches a
+        # bare Child column
+        keys = _resolve_columns(df, self.key_columns)
+        dropped_key = 0
+        if keys:
+            key_prints = fingerprint_rows(df.rename(columns=keys), list(keys.values()))
+            unique_keys = _first_occurrences(key_prints) & ~self._keys.contains(
+                key_prints
+            )
+            dropped_key = int((keep & ~unique_keys).sum())
+            keep &= unique_keys
+            self._keys.add(key_prints[keep])
+        if self.exact_rows:
+            self._rows.add(rows[keep])
+
+        self.dropped_exact += dropped_exact
+        self.dropped_key += dropped_key
+        if dropped_exact or dropped_key:
+            logger.info(
+                f"Dropped {dropped_exact} duplicate and {dropped_key} duplicate-key "
+                f"rows of {len(df)}"
+            )
+        return df[keep]
+
+    def stats(self) -> Dict:
+        return {
+            "seen_rows": self._rows.count if self.exact_rows else self._keys.count,
+            "dropped_exact": self.dropped_exact,
+            "dropped_key": self.dropped_key,
+            "exact": self._rows.exact and self._keys.exact,
+            "fingerprint_bytes": self._rows.nbytes + self._keys.nbytes,
+        }
+
+
+def _resolve_columns(df: pd.DataFrame, key_columns: List[str]) -> Dict[str, str]:
+    """Maps the df's columns holding the keys to the keys' canonical names."""
+    by_name = {str(column).strip().lower(): column for column in df.columns}
+    resolved = {}
+    for key in key_columns:
+        for name in (key.lower(), key.rsplit(".", 1)[-1].lower()):
+            if name in by_name:
+                resolved[by_name[name]] = key.lower()
+                break
+    return resolved
+
+
+# Throughput benchmark over the bundled templates, on local generator output
+if __name__ == "__main__":
+    import glob
+    import json
+    import os
+    import time
+
+    from app.services.local_generator import LocalGenerator
+
+    templates_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
+    rows, batches = 1_000_000, 10
+    for path in sorted(glob.glob(os.path.join(templates_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            template = json.load(f)
+        generator = LocalGenerator(template["fields"], seed=0)
+        frames = [generator.generate(rows // batches) for _ in range(batches)]
+        deduplicator = RowDeduplicator.for_fields(template["fields"])
+
+        start = time.perf_counter()
+        for frame in frames:
+            deduplicator.filter(frame)
+        elapsed = time.perf_counter() - start
+        stats = deduplicator.stats()
+        print(
+            f"{template['template_name']:>40}: "
+            f"{stats['dropped_exact'] + stats['dropped_key']:>7} dropped, "
+            f"{stats['fingerprint_bytes'] / 1e6:5.1f} MB, "
+            f"{rows / elapsed / 1e6:6.2f}M rows/sec"
+        )
@@ -6,7 +6,6 @@ import string
 from collections import defaultdict
 from io import StringIO
 
-import boto3
 import pandas as pd
 from fastapi import HTTPException
 
@@ -91,6 +90,8 @@ class EPICPromptGenerator:
         Raises:
             FileNotFoundError: If the file cannot be found or accessed
         """
+        import boto3
+
         session = boto3.Session(profile_name=AWS_PROFILE)
         s3 = session.client("s3")
 
@@ -0,0 +1,235 @@
+# app/services/http_client.py
+"""
+Shared, pooled HTTP clients for the Groq / OpenAI-compatible LLM backends.
+
+One httpx.AsyncClient per process keeps connections (and TLS sessions) alive
+between calls, speaks HTTP/2 when the optional `h2` package is installed and
+applies the timeouts and pool limits from config.
+
+The generation pipeline is synchronous and runs in worker threads, so post_json
+submits the request to the app's event loop (bound in the FastAPI lifespan) and
+waits for the result. Without a bound loop (Lambda, scripts, tests) it uses a
+pooled synchronous httpx.Client with the same settings instead.
+
+Typical usage:
+- FastAPI lifespan: bind_event_loop() on startup, await close_http_clients() on shutdown
+- Services: post_json(url, payload, headers), or stream_sse(...) for
+  server-sent events (OpenAI-compatible "stream": true)
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import queue
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+import httpx
+
+from config.config import (
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_POOL_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_WRITE_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+_async_client: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[httpx.Client] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+_SSE_DONE = object()
+_END = object()
+
+
+def _client_settings() -> Dict:
+    return {
+        "http2": HTTP2_ENABLED and importlib.util.find_spec("h2") is not None,
+        "timeout": httpx.Timeout(
+            connect=HTTP_CONNECT_TIMEOUT,
+            read=HTTP_READ_TIMEOUT,
+            write=HTTP_WRITE_TIMEOUT,
+            pool=HTTP_POOL_TIMEOUT,
+        ),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """The shared async client, created on first use (call it from the event loop)."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        settings = _client_settings()
+        _async_client = httpx.AsyncClient(**settings)
+        logger.info(f"Created shared async HTTP client (http2={settings['http2']})")
+    return _async_client
+
+
+def get_sync_client() -> httpx.Client:
+    """The shared synchronous client used when no event loop is bound."""
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        with _lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(**_client_settings())
+    return _sync_client
+
+
+def bind_event_loop(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Routes post_json from worker threads through the async client on this loop."""
+    global _loop
+    _loop = loop or asyncio.get_running_loop()
+
+
+ResponseHook = Callable[[httpx.Response], None]
+
+
+async def apost_json(
+    url: str,
+    payload: Dict,
+    headers: Optional[Dict] = None,
+    response_hook: Optional[ResponseHook] = None,
+) -> Dict:
+    """POSTs JSON with the shared async client and returns the decoded JSON body."""
+    response = await get_async_client().post(url, json=payload, headers=headers)
+    if response_hook is not None:
+        response_hook(response)
+    response.raise_for_status()
+    return response.json()
+
+
+def post_json(
+    url: str,
+    payload: Dict,
+    headers: Optional[Dict] = None,
+    response_hook: Optional[ResponseHook] = None,
+) -> Dict:
+    """
+    Synchronous POST for the service layer.
+
+    Args:
+        response_hook: Called with every response (including errors) before the
+                       status is checked, e.g. to read rate-limit headers.
+
+    Raises:
+        httpx.HTTPError: On connection errors, timeouts and non-2xx responses.
+    """
+    loop = _loop
+    if loop is not None and loop.is_running() and not _in_loop_thread(loop):
+        future = asyncio.run_coroutine_threadsafe(
+            apost_json(url, payload, headers, response_hook), loop
+        )
+        return future.result()
+
+    response = get_sync_client().post(url, json=payload, headers=headers)
+    if response_hook is not None:
+        response_hook(response)
+    response.raise_for_status()
+    return response.json()
+
+
+async def astream_sse(
+    url: str, payload: Dict, headers: Optional[Dict] = None
+) -> AsyncIterator[Dict]:
+    """POSTs JSON and yields the decoded `data:` events of an SSE response."""
+    async with get_async_client().stream(
+        "POST", url, json=payload, headers=headers
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            event = _parse_sse_line(line)
+            if event is _SSE_DONE:
+                return
+            if event is not None:
+                yield event
+
+
+def stream_sse(
+    url: str, payload: Dict, headers: Optional[Dict] = None
+) -> Iterator[Dict]:
+    """
+    Synchronous counterpart of astream_sse. Events are yielded as they arrive;
+    closing the generator early cancels the request.
+    """
+    loop = _loop
+    if loop is not None and loop.is_running() and not _in_loop_thread(loop):
+        yield from _iterate_on_loop(astream_sse(url, payload, headers), loop)
+        return
+
+    with get_sync_client().stream(
+        "POST", url, json=payload, headers=headers
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            event = _parse_sse_line(line)
+            if event is _SSE_DONE:
+                return
+            if event is not None:
+                yield event
+
+
+def _parse_sse_line(line: str):
+    """The JSON payload of a `data:` line, _SSE_DONE for [DONE], else None."""
+    if not line.startswith("data:"):
+        return None  # Blank separators, comments, event/id fields
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return _SSE_DONE
+    return json.loads(data) if data else None
+
+
+def _iterate_on_loop(agen: AsyncIterator, loop: asyncio.AbstractEventLoop) -> Iterator:
+    """Drives an async iterator on the loop and hands its items to this thread."""
+    items: queue.Queue = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put((item, None))
+        except BaseException as e:
+            items.put((_END, e))
+            raise
+        items.put((_END, None))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), loop)
+    try:
+        while True:
+            item, error = items.get()
+            if item is _END:
+                if error is not None and not isinstance(error, asyncio.CancelledError):
+                    raise error
+                return
+            yield item
+    finally:
+        future.cancel()
+
+
+def _in_loop_thread(loop: asyncio.AbstractEventLoop) -> bool:
+    # Blocking on the loop from its own thread would deadlock
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+async def close_http_clients():
+    """Closes the shared clients; called on app shutdown."""
+    global _async_client, _sync_client, _loop
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+    _loop = None
@@ -0,0 +1,186 @@
+# app/services/job_manager.py
+"""
+Background execution of generation requests.
+
+POST /api/jobs returns as soon as the job is stored; the job then runs
+lambda_handler's template or EPIC flow on the bulkhead of its model's backend
+(see app/services/bulkhead.py), and clients poll GET /api/jobs/{job_id} for
+status, progress and the result URL instead of holding a connection open for
+the whole LLM round-trip.
+
+At most JOB_MAX_PENDING jobs (each possibly holding an uploaded file) are
+queued or running per process; beyond that, and when the backend's bulkhead
+is full, submitting raises a BulkheadFullError (a 503 at the API).
+
+Each job runs in its own context carrying the selected model and a progress
+callback (see report_progress in app/context/request_context.py).
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import Future
+from concurrent.futures import wait as wait_for_futures
+from typing import Dict, Optional
+
+from app.context.request_context import (
+    get_llm_backend,
+    progress_callback_ctx,
+    selected_model_ctx,
+)
+from app.models.job import Job, JobKind, JobStatus
+from app.models.request import GenerateRequest
+from app.services.bulkhead import BulkheadFullError, get_bulkhead
+from app.services.job_store import JobStore, get_job_store
+from config.config import JOB_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+class JobManager:
+    def __init__(
+        self, store: Optional[JobStore] = None, max_pending: int = JOB_MAX_PENDING
+    ):
+        self.store = store or get_job_store()
+        self.max_pending = max_pending
+        # Pending job id -> its future (None while the job is being submitted)
+        self._futures: Dict[str, Optional[Future]] = {}
+        self._lock = threading.Lock()
+
+    def submit_template(self, request: GenerateRequest, model: str) -> Job:
+        """Queues the prompt-based (template) flow for the request."""
+        return self._submit(JobKind.TEMPLATE, model, request, None)
+
+    def submit_epic(self, content, model: str) -> Job:
+        """Queues the EPIC flow for uploaded content (file name or bytes)."""
+        return self._submit(JobKind.EPIC, model, None, content)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def shutdown(self, wait: bool = False):
+        """
+        Cancels the jobs that haven't started (they are marked failed);
+        wait=True also waits for the running ones. Jobs still running when the
+        process exits are failed by the next SQLiteJobStore to open the file.
+        """
+        with self._lock:
+            futures = [future for future in self._futures.values() if future]
+        for future in futures:
+            future.cancel()
+        if wait:
+            wait_for_futures(futures)
+
+    def _submit(self, kind: JobKind, model: str, request, content) -> Job:
+        """
+        Raises:
+            BulkheadFullError: If max_pending jobs are pending or the backend's
+                               bulkhead is at capacity.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if len(self._futures) >= self.max_pending:
+                raise BulkheadFullError(
+                    f"{len(self._futures)} generation jobs are already pending"
+                )
+            self._futures[job_id] = None
+        job = self.store.create(Job(job_id=job_id, kind=kind))
+        context = contextvars.copy_context()
+        context.run(selected_model_ctx.set, model)
+        context.run(progress_callback_ctx.set, self._progress_callback(job.job_id))
+        try:
+            future = get_bulkhead(get_llm_backend(model)).submit(
+                context.run, self._run, job.job_id, request, content
+            )
+        except BulkheadFullError as e:
+            with self._lock:
+                del self._futures[job_id]
+            # The client gets a 503 and never sees this job id
+            self.store.update(
+                job.job_id, status=JobStatus.FAILED, error=str(e), message="Rejected"
+            )
+            raise
+        with self._lock:
+            self._futures[job.job_id] = future
+        future.add_done_callback(functools.partial(self._on_done, job.job_id))
+        logger.info(f"Queued {kind.value} job {job.job_id} (model {model})")
+        return job
+
+    def _progress_callback(self, job_id: str):
+        lock = threading.Lock()
+        last = [0.0]
+
+        def report(fraction: float, message: str):
+            # Batches complete out of order; progress never goes backwards
+            with lock:
+                last[0] = max(last[0], fraction)
+                self.store.update(job_id, progress=last[0], message=message)
+
+        return report
+
+    def _on_done(self, job_id: str, future: Future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if future.cancelled():
+            # Cancelled by shutdown() before a worker picked it up
+            logger.warning(f"Job {job_id} cancelled at shutdown")
+            self.store.update(
+                job_id,
+                status=JobStatus.FAILED,
+                error="The server shut down before the job started",
+                message="Cancelled",
+            )
+
+    def _run(self, job_id: str, request, content):
+        from app.lambda_function import lambda_handler
+
+        self.store.update(job_id, status=JobStatus.RUNNING, message="Started")
+        try:
+            response = lambda_handler(request, content)
+            body = json.loads(response.get("body", "{}"))
+            if response.get("statusCode", 200) >= 400:
+                self.store.update(
+                    job_id,
+                    status=JobStatus.FAILED,
+                    error=body.get("error", "Unknown error from lambda handler"),
+                    message="Failed",
+                )
+            else:
+                self.store.update(
+                    job_id,
+                    status=JobStatus.SUCCEEDED,
+                    progress=1.0,
+                    result=body,
+                    message="Done",
+                )
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed: {str(e)}")
+            self.store.update(
+                job_id, status=JobStatus.FAILED, error=str(e), message="Failed"
+            )
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Returns the process-wide JobManager, creating it on first use."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
+
+
+def shutdown_job_manager():
+    """Stops the process-wide JobManager, if one was created (app shutdown)."""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
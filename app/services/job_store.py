@@ -0,0 +1,207 @@
+# app/services/job_store.py
+"""
+Pluggable storage for background generation jobs.
+
+JobStore is the interface the JobManager and the /api/jobs endpoints use.
+InMemoryJobStore keeps jobs in the process (fine for a single worker);
+SQLiteJobStore keeps them in a SQLite file, so every worker process on the host
+sees the same jobs and they survive restarts. get_job_store() builds the one
+selected by JOB_STORE_BACKEND.
+
+Each SQLite job records the process that created (and runs) it. Opening the
+store fails the unfinished jobs whose process is gone, so a killed or
+restarted worker doesn't leave them queued or running forever.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from app.models.job import Job, JobStatus, utc_now
+from config.config import JOB_STORE_BACKEND, JOB_STORE_MAX_JOBS, JOB_STORE_SQLITE_PATH
+
+logger = logging.getLogger(__name__)
+
+# "<pid>:<token>" of this process; the token tells a restarted process that
+# reuses a pid (e.g. pid 1 in a container) from the one that created a job
+_OWNER = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+
+def _owner_is_gone(owner: Optional[str]) -> bool:
+    """Whether the process recorded as a job's owner no longer exists."""
+    if not owner:
+        # Created before owners were recorded
+        return True
+    if owner == _OWNER:
+        return False
+    pid = int(owner.split(":", 1)[0])
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        # Exists, but belongs to another user
+        return False
+    return False
+
+
+class JobStore(ABC):
+    """Create, read and update jobs; implementations must be thread-safe."""
+
+    @abstractmethod
+    def create(self, job: Job) -> Job:
+        """Stores a new job."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with this id, or None."""
+
+    @abstractmethod
+    def update(self, job_id: str, **changes) -> Optional[Job]:
+        """Applies field changes (and bumps updated_at); None if the job is unknown."""
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self, max_jobs: int = JOB_STORE_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job: Job) -> Job:
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def update(self, job_id: str, **changes) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = job.model_copy(update={**changes, "updated_at": utc_now()})
+            self._jobs[job_id] = job
+            return job
+
+    def _evict(self):
+        # Drop the oldest finished jobs; running ones are never evicted
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        finished = [j.job_id for j in self._jobs.values() if j.status.finished]
+        for job_id in finished[:excess]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs as JSON documents in a SQLite table, safe across threads and processes."""
+
+    def __init__(
+        self, path: str = JOB_STORE_SQLITE_PATH, max_jobs: int = JOB_STORE_MAX_JOBS
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " finished INTEGER NOT NULL,"
+                " created_at TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._fail_orphaned_jobs()
+
+    def _fail_orphaned_jobs(self):
+        """Fails the unfinished jobs of processes that no longer exist."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, owner FROM jobs WHERE finished = 0"
+            ).fetchall()
+        orphaned = [job_id for job_id, owner in rows if _owner_is_gone(owner)]
+        for job_id in orphaned:
+            self.update(
+                job_id,
+                status=JobStatus.FAILED,
+                error="The worker running this job stopped",
+                message="Failed",
+            )
+        if orphaned:
+            logger.warning(f"Failed {len(orphaned)} jobs left by stopped workers")
+
+    def create(self, job: Job) -> Job:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, finished, created_at, data, owner)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    job.job_id,
+                    int(job.status.finished),
+                    job.created_at.isoformat(),
+                    job.model_dump_json(),
+                    _OWNER,
+                ),
+            )
+            self._conn.execute(
+                "DELETE FROM jobs WHERE job_id IN ("
+                " SELECT job_id FROM jobs WHERE finished = 1"
+                " ORDER BY created_at LIMIT max(0, (SELECT count(*) FROM jobs) - ?))",
+                (self.max_jobs,),
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return Job.model_validate_json(row[0]) if row else None
+
+    def update(self, job_id: str, **changes) -> Optional[Job]:
+        # Read-modify-write in one transaction so concurrent updates don't interleave
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            job = Job.model_validate(
+                {**json.loads(row[0]), **changes, "updated_at": utc_now()}
+            )
+            self._conn.execute(
+                "UPDATE jobs SET finished = ?, data = ? WHERE job_id = ?",
+                (int(job.status.finished), job.model_dump_json(), job_id),
+            )
+        return job
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def get_job_store(backend: str = JOB_STORE_BACKEND) -> JobStore:
+    """Builds the job store selected by JOB_STORE_BACKEND ("memory" or "sqlite")."""
+    if backend == "memory":
+        return InMemoryJobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore()
+    raise ValueError(f"Unknown job store backend: {backend}")
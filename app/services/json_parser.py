@@ -4,6 +4,10 @@ import re
 from pathlib import Path
 from typing import Dict, List, Optional
 
+import pandas as pd
+
+from app.services.output_validator import OutputValidator
+
 logger = logging.getLogger(__name__)
 
 
@@ -31,7 +35,7 @@ class JsonParser:
 
             # Validate against schema if provided
             if self.schema:
-                self._validate_schema(json_objects)
+                json_objects = self._validate_schema(json_objects)
 
             self.parsed_data = json_objects
             return json_objects
@@ -79,17 +83,33 @@ class JsonParser:
 
         return json_objects
 
-    def _validate_schema(self, data: List[Dict]):
-        """Validate data against provided JSON schema"""
+    def _validate_schema(self, data: List[Dict]) -> List[Dict]:
+        """
+        Validate data against the schema (a template's "fields")
+        Returns:
+            The objects without violations
+        """
         if not self.schema:
-            return
+            return data
+
+        # Nested objects become "Parent.Child" columns, arrays joined strings
+        df = pd.json_normalize(data).map(
+            lambda v: "; ".join(map(str, v)) if isinstance(v, list) else v
+        )
+        result = OutputValidator(self.schema).validate(df)
+        if result.invalid_count:
+            logger.warning(
+                f"{result.invalid_count}/{len(data)} objects violate the schema: "
+                f"{result.violations()}"
+            )
+        valid = [
+            item for item, invalid in zip(data, result.invalid_rows) if not invalid
+        ]
+        if not valid:
+            raise ValueError("No JSON objects match the schema")
 
-        # Implement your schema validation logic here
-        # Example using jsonschema:
-        # from jsonschema import validate
-        # for item in data:
-        #     validate(instance=item, schema=self.schema)
         logger.info("Schema validation passed")
+        return valid
 
     def save_to_file(self, file_path: Path, indent: int = 2):
         """
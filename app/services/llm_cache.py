@@ -0,0 +1,293 @@
+# app/services/llm_cache.py
+"""
+Content-addressed cache of raw LLM completions.
+
+Keys are the SHA-256 of (backend, model ID, final prompt, sampling parameters),
+so identical requests (same template schema, user request, output format and
+model) reuse the earlier completion instead of paying for it again. Entries
+live in a memory LRU tier (TTLCache) over a size-bounded on-disk tier that is
+shared by the worker processes of a host and survives restarts; both expire
+after LLM_CACHE_TTL_SECONDS.
+
+The cache is opt-in (LLM_CACHE_ENABLED). A request can bypass the lookup with
+parameters = {"cache": false}; its fresh completion still replaces the entry.
+Only completions passing the caller's validator are stored, so one unusable
+answer isn't replayed for every identical request.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+from app.utils.ttl_cache import TTLCache
+from config.config import (
+    LLM_CACHE_DIR,
+    LLM_CACHE_DISK_MAX_BYTES,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MEMORY_SIZE,
+    LLM_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Set for requests that asked to skip cached completions
+cache_bypass_ctx: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+# Cached completions served per thread, so callers timing a backend call can
+# tell hits from real calls
+_thread_hits = threading.local()
+
+
+def cache_hits_on_thread() -> int:
+    """Completions get_or_compute served from the cache on this thread so far."""
+    return getattr(_thread_hits, "count", 0)
+
+
+@contextmanager
+def bypass_llm_cache(bypass: bool = True):
+    """Skips cache lookups for the LLM calls made inside the block."""
+    token = cache_bypass_ctx.set(bypass)
+    try:
+        yield
+    finally:
+        cache_bypass_ctx.reset(token)
+
+
+def make_cache_key(backend: str, model_id: str, prompt: str, params: Dict) -> str:
+    """SHA-256 over a canonical JSON encoding of the request."""
+    canonical = json.dumps(
+        {"backend": backend, "model": model_id, "prompt": prompt, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    One JSON file per entry under <directory>/<key[:2]>/. Reads refresh the
+    file's mtime, and the least recently used files are deleted once the total
+    size exceeds max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: Optional[float]):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._files())
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json"):
+                    yield os.path.join(root, name)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and time.time() > expires_at:
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        return entry["value"]
+
+    def set(self, key: str, value: str):
+        path = self._path(key)
+        expires_at = (
+            time.time() + self.ttl_seconds if self.ttl_seconds is not None else None
+        )
+        data = json.dumps({"expires_at": expires_at, "value": value})
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so readers in other processes never see partial files
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += os.path.getsize(path) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key: str):
+        self._remove(self._path(key))
+
+    def _remove(self, path: str):
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def _evict(self):
+        # Down to 90% of the budget so eviction doesn't run on every write
+        files = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+        self._size = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if self._size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def size_bytes(self) -> int:
+        return self._size
+
+
+class LLMResponseCache:
+    def __init__(
+        self,
+        enabled: bool = LLM_CACHE_ENABLED,
+        memory_size: int = LLM_CACHE_MEMORY_SIZE,
+        directory: Optional[str] = LLM_CACHE_DIR,
+        disk_max_bytes: int = LLM_CACHE_DISK_MAX_BYTES,
+        ttl_seconds: Optional[float] = LLM_CACHE_TTL_SECONDS,
+    ):
+        """
+        Args:
+            enabled: When False, get_or_compute always calls the LLM.
+            memory_size: Entries in the memory tier.
+            directory: Root of the disk tier; None keeps the cache in memory only.
+            disk_max_bytes: Size budget of the disk tier.
+            ttl_seconds: Entry lifetime; None keeps entries until evicted.
+        """
+        self.enabled = enabled
+        self.memory = TTLCache(maxsize=memory_size, ttl_seconds=ttl_seconds)
+        self.disk = (
+            DiskCache(directory, disk_max_bytes, ttl_seconds)
+            if enabled and directory
+            else None
+        )
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(
+        self,
+        backend: str,
+        model_id: str,
+        prompt: str,
+        params: Dict,
+        compute: Callable[[], str],
+        validate: Optional[Callable[[str], object]] = None,
+    ) -> str:
+        """
+        The cached completion for the request, or compute() stored under its key.
+
+        Empty completions and completions validate() raises on are never cached
+        (the caller still gets them, to reject itself). A cached entry failing
+        validate() is evicted and recomputed.
+        """
+        if not self.enabled:
+            return compute()
+
+        key = make_cache_key(backend, model_id, prompt, params)
+        if cache_bypass_ctx.get():
+            self._count("bypassed")
+        else:
+            value = self.get(key)
+            if value is not None:
+                if self._accepts(value, validate):
+                    _thread_hits.count = cache_hits_on_thread() + 1
+                    return value
+                logger.info("Evicting a cached LLM completion that fails validation")
+                self.delete(key)
+
+        value = compute()
+        if value and self._accepts(value, validate):
+            self.set(key, value)
+        return value
+
+    @staticmethod
+    def _accepts(value: str, validate: Optional[Callable[[str], object]]) -> bool:
+        if validate is None:
+            return True
+        try:
+            validate(value)
+        except Exception:
+            return False
+        return True
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("hits", "disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except OSError as e:
+                logger.warning(f"Could not write LLM cache entry: {str(e)}")
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def _count(self, *counters: str):
+        with self._lock:
+            for counter in counters:
+                setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters, hit rate and tier sizes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "disk_bytes": self.disk.size_bytes() if self.disk else 0,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_llm_cache() -> LLMResponseCache:
+    """The process-wide LLM response cache, configured from config."""
+    return LLMResponseCache()
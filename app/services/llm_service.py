@@ -1,16 +1,39 @@
 # app/services/llm_service.py
+import contextvars
+import itertools
 import json
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-import requests
+import httpx
+import pandas as pd
 
-from app.context.request_context import get_current_model
+from app.context.request_context import (
+    get_current_model,
+    get_llm_backend,
+    report_progress,
+)
+from app.services import http_client
+from app.services.bedrock_client import get_bedrock_client
+from app.services.csv_parser import CsvParser, IncrementalCsvParser
+from app.services.deduplicator import RowDeduplicator
+from app.services.output_validator import OutputValidator
 from app.services.request_model import RequestModel
+from app.services.resilience import get_resilient_caller
 from app.utils import utility
 from config.config import (
     DEFAULT_LLM,
     LLM_BEDROCK_MODEL_ID,
     LLM_LOCAL_URL,
+    LLM_MAX_BATCH_ROUNDS,
+    LLM_MAX_CONCURRENT_BATCHES,
+    LLM_MAX_OUTPUT_TOKENS,
+    LLM_MAX_ROWS_PER_BATCH,
+    LLM_STREAM_MICRO_BATCH_ROWS,
+    LLM_TOKENS_PER_FIELD,
     S3_OUTPUT_BUCKET,
     S3_OUTPUT_FOLDER,
     SERVER_MODE,
@@ -19,28 +42,355 @@ from config.config import (
 logger = logging.getLogger(__name__)
 
 
+def _count_fields(fields):
+    """Number of leaf fields (CSV columns) in a template's fields."""
+    count = 0
+    for spec in (fields or {}).values():
+        if isinstance(spec, dict) and isinstance(spec.get("properties"), dict):
+            count += _count_fields(spec["properties"])
+        else:
+            count += 1
+    return count
+
+
+def _merge_batches(frames):
+    """Concatenates batch DataFrames on the first batch's columns, dropping duplicates."""
+    columns = list(frames[0].columns)
+    merged = pd.concat([frame.reindex(columns=columns) for frame in frames])
+    return merged.drop_duplicates().reset_index(drop=True)
+
+
 class LLMService:
     @staticmethod
-    def call_llm_api(prompt, max_tokens=3000, temperature=0.5, top_p=0.9):
+    def call_llm_api(
+        prompt, max_tokens=3000, temperature=0.5, top_p=0.9, seed_rows=None
+    ):
         """
-        Calls the appropriate LLM API based on SERVER_MODE.
+        Calls the appropriate LLM API based on SERVER_MODE, then parses the CSV
+        answer and saves it (S3 for Bedrock, locally otherwise).
+
+        Rows repeating seed_rows (e.g. the uploaded sample data), exactly or by
+        an identifier column, are dropped before saving.
         """
-        if SERVER_MODE == "local":
-            # old call
-            # return LLMService.call_local_llm(prompt, max_tokens, temperature, top_p)
-            destination_uri = LLMService.call_local_llm_new(prompt)
-        else:
-            # old call
-            # return LLMService.call_bedrock_llm(prompt, max_tokens, temperature, top_p)
-            model = get_current_model()
-            if model == DEFAULT_LLM:
-                destination_uri = LLMService.call_bedrock_llm_new(
-                    prompt, max_tokens, temperature, top_p
+        # The sample's header tells the CSV answer apart from other blocks
+        columns = None if seed_rows is None else list(seed_rows.columns)
+        output_text = LLMService.call_llm_text(
+            prompt,
+            max_tokens,
+            temperature,
+            top_p,
+            validate=lambda text: CsvParser.parse_csv_response(text, columns),
+        )
+        csv_data = CsvParser.parse_csv_response(output_text, columns)
+        df = RequestModel()._parse_csv_response(csv_data, get_llm_backend())
+        if seed_rows is not None:
+            df = RowDeduplicator.for_sample(seed_rows).filter(df)
+            if df.empty:
+                raise RuntimeError("Every generated row repeats the sample data")
+        return LLMService._save_dataframe(df)
+
+    @staticmethod
+    def call_llm_text(
+        prompt, max_tokens=3000, temperature=0.5, top_p=0.9, validate=None
+    ):
+        """
+        Same model selection as call_llm_api, but returns the raw completion
+        text instead of parsing and saving it.
+
+        Retryable errors are retried, and slow or failing backends are hedged
+        or failed over to their alternates (see app/services/resilience.py).
+        validate raises on completions that shouldn't be accepted; those are
+        not cached either.
+        """
+        request_model = RequestModel()
+
+        def complete(backend):
+            if backend == "bedrock":
+                return request_model.complete_bedrock(
+                    prompt, max_tokens, temperature, top_p, validate=validate
                 )
+            return request_model.complete_groq(prompt, validate=validate)
+
+        return get_resilient_caller().call(get_llm_backend(), complete, validate)
+
+    @staticmethod
+    def stream_llm_text(prompt, max_tokens=3000, temperature=0.5, top_p=0.9):
+        """Streaming call_llm_text: yields completion text chunks as they arrive."""
+        request_model = RequestModel()
+        if get_llm_backend() == "bedrock":
+            return request_model.stream_bedrock(prompt, max_tokens, temperature, top_p)
+        return request_model.stream_groq(prompt)
+
+    @staticmethod
+    def stream_rows(prompt, max_tokens=LLM_MAX_OUTPUT_TOKENS, columns=None):
+        """
+        Streams the LLM's CSV answer and yields each row (a dict keyed by the
+        CSV header) as soon as its newline arrives. columns, the expected CSV
+        header, lets the parser skip other blocks and find bare CSV.
+        """
+        start = time.perf_counter()
+        parser = IncrementalCsvParser(columns)
+        rows = 0
+        chunks = LLMService.stream_llm_text(prompt, max_tokens=max_tokens)
+        for records in itertools.chain(map(parser.feed, chunks), [None]):
+            if records is None:
+                records = parser.close()
+            for record in records:
+                if rows == 0:
+                    logger.info(
+                        f"First streamed row after {time.perf_counter() - start:.2f}s"
+                    )
+                rows += 1
+                yield dict(zip(parser.header, record))
+        logger.info(f"{rows} rows streamed in {time.perf_counter() - start:.2f}s")
+
+    @staticmethod
+    def plan_batches(volume, fields, max_tokens=LLM_MAX_OUTPUT_TOKENS):
+        """
+        Splits a volume into row batches that fit the model's output budget.
+
+        Args:
+            volume: Total number of rows requested.
+            fields: The template's "fields", used to estimate tokens per row.
+            max_tokens: Output token budget of one LLM call.
+
+        Returns:
+            list: Rows per batch, summing to volume.
+        """
+        row_tokens = max(1, _count_fields(fields)) * LLM_TOKENS_PER_FIELD
+        # Keep a quarter of the budget for the header and formatting
+        rows_per_batch = max(
+            1, min(LLM_MAX_ROWS_PER_BATCH, int(max_tokens * 0.75) // row_tokens)
+        )
+        full, rest = divmod(volume, rows_per_batch)
+        return [rows_per_batch] * full + ([rest] if rest else [])
+
+    @staticmethod
+    def generate_rows(
+        build_prompt,
+        volume,
+        fields,
+        max_tokens=LLM_MAX_OUTPUT_TOKENS,
+        seed_rows=None,
+    ):
+        """
+        Generates `volume` rows with concurrent LLM calls and saves one CSV.
+
+        Batches from plan_batches run on a bounded thread pool, each in a copy of
+        the caller's context so the selected model carries over. Each parsed
+        batch is validated against the template's field constraints (see
+        OutputValidator) and stripped of rows duplicating earlier batches or the
+        seed rows, exactly or by identifier (see RowDeduplicator); rows lost to
+        failed batches, duplicates or violations are topped up in up to
+        LLM_MAX_BATCH_ROUNDS extra rounds.
+
+        Args:
+            build_prompt: Callable (rows, batch_index) -> prompt for one batch.
+            volume: Total number of rows requested.
+            fields: The template's "fields", used for batch sizing.
+            max_tokens: Output token budget of one LLM call.
+            seed_rows: Optional DataFrame of rows the output must not repeat,
+                       e.g. the sample data shown in the prompt.
+
+        Returns:
+            str: Local path or S3 URL of the generated file.
+        """
+        start = time.perf_counter()
+        validator = OutputValidator(fields)
+        deduplicator = RowDeduplicator.for_fields(fields, seed_rows=seed_rows)
+        frames = []
+        rows = 0
+        batch_index = 0
+        for _ in range(1 + LLM_MAX_BATCH_ROUNDS):
+            batches = LLMService.plan_batches(volume - rows, fields, max_tokens)
+            prompts = [
+                build_prompt(size, batch_index + i) for i, size in enumerate(batches)
+            ]
+            batch_index += len(batches)
+
+            workers = min(LLM_MAX_CONCURRENT_BATCHES, len(prompts))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        LLMService._generate_batch,
+                        prompt,
+                        max_tokens,
+                        validator.columns,
+                    )
+                    for prompt in prompts
+                ]
+                for future in as_completed(futures):
+                    df = future.result()
+                    if df is not None:
+                        # Only valid, unseen rows count towards the volume, so
+                        # the next round asks for replacements of the rest
+                        frames.append(deduplicator.filter(validator.filter(df)))
+                        done = sum(len(frame) for frame in frames)
+                        report_progress(
+                            0.1 + 0.8 * min(done, volume) / volume,
+                            f"{min(done, volume)}/{volume} rows generated",
+                        )
+
+            if not frames:
+                raise RuntimeError("Every LLM batch failed")
+            df = _merge_batches(frames)
+            rows = len(df)
+            if rows >= volume:
+                break
+            logger.info(
+                f"{rows}/{volume} valid rows after merging, requesting the rest"
+            )
+
+        if rows == 0:
+            raise RuntimeError("The LLM generated no valid rows")
+        df = df.head(volume)
+        report_progress(0.9, "Saving the generated data")
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"{len(df)} rows from {batch_index} LLM batches in {elapsed:.2f}s "
+            f"({len(df) / max(elapsed, 1e-9):.1f} rows/sec)"
+        )
+        return LLMService._save_dataframe(df)
+
+    @staticmethod
+    def stream_generated_rows(
+        build_prompt, volume, fields, max_tokens=LLM_MAX_OUTPUT_TOKENS
+    ):
+        """
+        Streaming generate_rows: yields up to `volume` valid, unique rows (dicts)
+        as soon as any batch parses them. Batches run concurrently and are topped up as in
+        generate_rows; saving the rows is left to the caller.
+        """
+        start = time.perf_counter()
+        validator = OutputValidator(fields)
+        deduplicator = RowDeduplicator.for_fields(fields)
+        streamed = 0
+        batch_index = 0
+        stop = threading.Event()
+        for _ in range(1 + LLM_MAX_BATCH_ROUNDS):
+            batches = LLMService.plan_batches(volume - streamed, fields, max_tokens)
+            prompts = [
+                build_prompt(size, batch_index + i) for i, size in enumerate(batches)
+            ]
+            batch_index += len(batches)
+
+            rows = queue.Queue()
+            workers = min(LLM_MAX_CONCURRENT_BATCHES, len(prompts))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for prompt in prompts:
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        LLMService._stream_batch,
+                        prompt,
+                        max_tokens,
+                        validator.columns,
+                        rows,
+                        stop,
+                    )
+                try:
+                    # Each batch puts None when it's done
+                    pending = len(prompts)
+                    while pending and streamed < volume:
+                        micro_batch, finished = LLMService._drain(rows)
+                        pending -= finished
+                        for row in LLMService._unique_rows(
+                            micro_batch, validator, deduplicator
+                        ):
+                            if streamed >= volume:
+                                break
+                            streamed += 1
+                            yield row
+                finally:
+                    # Volume reached or the consumer stopped early: abandon
+                    # the running batches before waiting for the pool
+                    stop.set()
+
+            if not streamed:
+                raise RuntimeError("Every LLM batch failed")
+            if streamed >= volume:
+                break
+            stop.clear()
+            logger.info(f"{streamed}/{volume} rows streamed, requesting the rest")
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"{streamed} rows streamed from {batch_index} LLM batches in "
+            f"{elapsed:.2f}s ({streamed / max(elapsed, 1e-9):.1f} rows/sec)"
+        )
+
+    @staticmethod
+    def _drain(rows, limit=LLM_STREAM_MICRO_BATCH_ROWS):
+        """
+        Waits for the next queued row, then takes whatever else is already
+        queued (up to limit rows). Returns the rows and the number of finished
+        batches (None markers) taken.
+        """
+        micro_batch = []
+        finished = 0
+        item = rows.get()
+        while True:
+            if item is None:
+                finished += 1
             else:
-                destination_uri = LLMService.call_local_llm_new(prompt)
+                micro_batch.append(item)
+            if len(micro_batch) >= limit:
+                break
+            try:
+                item = rows.get_nowait()
+            except queue.Empty:
+                break
+        return micro_batch, finished
 
-        return destination_uri
+    @staticmethod
+    def _unique_rows(micro_batch, validator, deduplicator):
+        """
+        The rows of a micro-batch that pass the validator and that the
+        deduplicator hasn't seen, in order.
+        """
+        if not micro_batch:
+            return []
+        kept = deduplicator.filter(validator.filter(pd.DataFrame(micro_batch)))
+        return [micro_batch[i] for i in kept.index]
+
+    @staticmethod
+    def _stream_batch(prompt, max_tokens, columns, rows, stop):
+        """Puts one batch's streamed rows on the queue, then None."""
+        stream = LLMService.stream_rows(prompt, max_tokens=max_tokens, columns=columns)
+        try:
+            for row in stream:
+                if stop.is_set():
+                    break
+                rows.put(row)
+        except Exception as e:
+            logger.warning(f"LLM batch stream failed: {str(e)}")
+        finally:
+            stream.close()
+            rows.put(None)
+
+    @staticmethod
+    def _generate_batch(prompt, max_tokens, columns=None):
+        """One LLM call parsed into a DataFrame, or None if it failed."""
+        try:
+            output_text = LLMService.call_llm_text(
+                prompt,
+                max_tokens=max_tokens,
+                validate=lambda text: CsvParser.parse_csv_response(text, columns),
+            )
+            csv_data = CsvParser.parse_csv_response(output_text, columns)
+            return RequestModel()._parse_csv_response(csv_data, get_llm_backend())
+        except Exception as e:
+            logger.warning(f"LLM batch failed: {str(e)}")
+            return None
+
+    @staticmethod
+    def _save_dataframe(df):
+        """Saves where the single-call path does: S3 for Bedrock, locally otherwise."""
+        if SERVER_MODE != "local" and get_current_model() == DEFAULT_LLM:
+            return utility.save_dataframe_to_s3(
+                df, bucket_name=S3_OUTPUT_BUCKET, prefix=S3_OUTPUT_FOLDER
+            )
+        return utility.save_dataframe_locally(df)
 
     @staticmethod
     def call_local_llm(prompt, max_tokens, temperature, top_p):
@@ -57,11 +407,9 @@ class LLMService:
             "model": "deepseek-r1-distill-llama-8b",  # Critical for LM Studio
         }
         try:
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+            data = http_client.post_json(url, payload, headers)
             return data["choices"][0]["text"]
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error("Error calling local LLM API:", e)
             return "ERROR"
 
@@ -71,9 +419,7 @@ class LLMService:
         Calls the LLM using AWS Bedrock API.
         This is a stub example – replace with actual boto3 calls and response handling.
         """
-        import boto3
-
-        bedrock_client = boto3.client("bedrock-runtime")
+        bedrock_client = get_bedrock_client()
         payload = {
             "prompt": prompt,
             "max_tokens": max_tokens,
@@ -0,0 +1,235 @@
+# app/services/model_registry.py
+"""
+Process-wide registry of warm NLP/embedding models.
+
+Loading spaCy, the SentenceTransformer encoder and the FAISS index is by far the
+most expensive part of template selection. The registry loads them once per
+process (FastAPI worker or Lambda container), runs a warmup inference and then
+hands the shared instances to PromptProcessor/preprocess_input.
+
+With OPEN_SEARCH, templates are selected by OpenSearch queries, so no spaCy
+pipeline, encoder or FAISS index is loaded.
+
+Typical usage:
+- FastAPI: start_background_warmup() in the app lifespan
+- Lambda: call get_model_registry().warmup() in the handler; it is a no-op
+  after the first invocation of a container
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.utils.template_loader import compute_catalog_version, load_template_mappings
+from config.config import OPEN_SEARCH, TEMPLATE_CATALOG_REFRESH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SPACY_MODEL_NAME = "en_core_web_sm"
+WARMUP_PROMPT = "Generate synthetic data for a tax free saving account"
+
+
+class ModelRegistry:
+    """
+    Owns the spaCy pipeline, sentence embedding matcher (encoder + FAISS index)
+    and template mappings shared by every request in the process.
+    """
+
+    def __init__(self):
+        self.nlp = None
+        self.template_matcher = None
+        self.template_mappings = None
+        self.prompt_processor = None
+        self.ready = False
+        self.error = None
+        self.warmup_seconds = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._catalog_checked_at = time.monotonic()
+
+    def warmup(self) -> "ModelRegistry":
+        """
+        Load all models and run a warmup inference. Safe to call repeatedly and
+        from several threads; only the first call does any work.
+
+        Returns:
+            ModelRegistry: The ready registry.
+
+        Raises:
+            Exception: Re-raises any model loading error (the registry stays not ready).
+        """
+        if self.ready:
+            return self
+
+        with self._lock:
+            if self.ready:
+                return self
+
+            start = time.perf_counter()
+            try:
+                self._load()
+                # A first inference pays for lazy allocations (torch kernels,
+                # spaCy vectors), so the readiness probe only turns green after it.
+                # OpenSearch has nothing local to warm up
+                if not OPEN_SEARCH:
+                    self.prompt_processor.process(WARMUP_PROMPT)
+            except Exception as e:
+                self.error = str(e)
+                logger.exception(f"Model registry warmup failed: {self.error}")
+                raise
+
+            self.warmup_seconds = time.perf_counter() - start
+            self.error = None
+            self.ready = True
+            logger.info(f"Model registry ready in {self.warmup_seconds:.2f}s")
+        return self
+
+    def _load(self):
+        """Load the NLP pipeline, embedding matcher and template mappings."""
+        from app.services.prompt_processor import PromptProcessor
+
+        if OPEN_SEARCH:
+            self.template_mappings = load_template_mappings()
+            self.prompt_processor = PromptProcessor(
+                None, nlp=None, template_mappings=self.template_mappings
+            )
+            return
+
+        import spacy
+
+        from app.services.sentence_embeddings import SentenceEmbeddingMatcher
+
+        # NER is not used by template selection
+        self.nlp = spacy.load(SPACY_MODEL_NAME, exclude=["ner"])
+        self.template_matcher = SentenceEmbeddingMatcher()
+        self.template_mappings = load_template_mappings()
+        self.prompt_processor = PromptProcessor(
+            self.template_matcher,
+            nlp=self.nlp,
+            template_mappings=self.template_mappings,
+        )
+
+    def refresh_catalog_if_stale(self) -> bool:
+        """
+        At most once every TEMPLATE_CATALOG_REFRESH_SECONDS, starts a background
+        reload of the template mappings and the FAISS metadata (see
+        refresh_catalog), so no request waits for S3. Requests keep using the
+        current catalog until the reload swaps it.
+
+        Returns:
+            bool: True if a refresh was started.
+        """
+        if (
+            OPEN_SEARCH
+            or not self.ready
+            or time.monotonic() - self._catalog_checked_at
+            < TEMPLATE_CATALOG_REFRESH_SECONDS
+        ):
+            return False
+        # Only one refresh at a time; the others keep serving
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        now = time.monotonic()
+        if now - self._catalog_checked_at < TEMPLATE_CATALOG_REFRESH_SECONDS:
+            self._refresh_lock.release()
+            return False
+        self._catalog_checked_at = now
+        threading.Thread(
+            target=self._refresh_in_background, name="catalog-refresh", daemon=True
+        ).start()
+        return True
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh_catalog()
+        except Exception as e:
+            logger.exception(f"Template catalog refresh failed: {str(e)}")
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_catalog(self) -> bool:
+        """
+        Reloads the template mappings and the FAISS metadata. When either
+        changed, the processor's candidate index is rebuilt and the
+        template-match cache is cleared (its keys also carry the catalog
+        version, so stale entries are never served).
+
+        Returns:
+            bool: True if the catalog changed.
+        """
+        changed = False
+        mappings = load_template_mappings()
+        if not mappings or not isinstance(mappings, dict):
+            # Keep serving the current catalog if the reload came back empty
+            logger.warning(
+                "Template mappings reload returned nothing, keeping current catalog"
+            )
+        elif not isinstance(self.template_mappings, dict) or compute_catalog_version(
+            mappings
+        ) != compute_catalog_version(self.template_mappings):
+            self.template_mappings = mappings
+            self.prompt_processor.template_mappings = mappings
+            changed = True
+
+        if self.template_matcher.reload_if_changed():
+            changed = True
+
+        if changed:
+            self.prompt_processor.template_cache.clear()
+            logger.info(
+                f"Template catalog changed, now at version {self.prompt_processor.catalog_version}"
+            )
+        return changed
+
+    def status(self) -> dict:
+        """Summary used by the readiness endpoint."""
+        return {
+            "ready": self.ready,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+            "catalog_version": (
+                self.prompt_processor.catalog_version if self.prompt_processor else None
+            ),
+            "template_cache": (
+                self.prompt_processor.template_cache.stats()
+                if self.prompt_processor
+                else None
+            ),
+        }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Returns the process-wide ModelRegistry, creating it (not yet warmed up) on first use.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def start_background_warmup() -> "asyncio.Task":
+    """
+    Warms the process-wide registry up on a worker thread (call from the running
+    event loop). A failure is logged and reported by the readiness probe rather
+    than left as an unretrieved task exception.
+    """
+    task = asyncio.create_task(asyncio.to_thread(get_model_registry().warmup))
+    task.add_done_callback(_log_warmup_failure)
+    return task
+
+
+def _log_warmup_failure(task: "asyncio.Task"):
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error(f"Background model warmup failed: {error!r}")
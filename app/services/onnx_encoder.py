@@ -0,0 +1,211 @@
+# app/services/onnx_encoder.py
+"""
+ONNX Runtime backend for the sentence embedding model.
+
+Runs an exported, int8 dynamically quantized all-MiniLM-L6-v2 on the CPU
+without importing PyTorch. Everything is loaded from a local directory
+(EMBEDDING_ONNX_MODEL_DIR), so no network access is needed at runtime.
+
+Export the model once (needs torch/transformers, e.g. in CI or a build step):
+    python -m app.services.onnx_encoder export
+
+Check that the ONNX backend picks the same templates as the torch one:
+    python -m app.services.onnx_encoder check
+"""
+
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+from config.config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_ONNX_MAX_LENGTH,
+    EMBEDDING_ONNX_MODEL_DIR,
+    EMBEDDING_ONNX_MODEL_FILE,
+    EMBEDDING_ONNX_THREADS,
+)
+
+logger = logging.getLogger(__name__)
+SAMPLE_REQUESTS_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "data", "sample_requests.json"
+)
+
+
+class OnnxSentenceEncoder:
+    """
+    Drop-in replacement for SentenceTransformer.encode backed by ONNX Runtime:
+    tokenization with the local tokenizer.json, transformer forward pass, then
+    attention-masked mean pooling (the all-MiniLM-L6-v2 pooling).
+    """
+
+    def __init__(
+        self,
+        model_dir=EMBEDDING_ONNX_MODEL_DIR,
+        model_file=EMBEDDING_ONNX_MODEL_FILE,
+        max_length=EMBEDDING_ONNX_MAX_LENGTH,
+        num_threads=EMBEDDING_ONNX_THREADS,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX model not found at '{model_path}'. "
+                "Run 'python -m app.services.onnx_encoder export' first."
+            )
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {
+            model_input.name for model_input in self.session.get_inputs()
+        }
+        logger.info(f"Loaded ONNX sentence encoder from {model_path}")
+
+    def encode(self, sentences, batch_size=64, normalize_embeddings=False, **kwargs):
+        """
+        Encodes sentences into a (len(sentences), dim) float32 array.
+        Extra keyword arguments of SentenceTransformer.encode are ignored.
+        """
+        if isinstance(sentences, str):
+            sentences = [sentences]
+
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            encodings = self.tokenizer.encode_batch(
+                sentences[start : start + batch_size]
+            )
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array(
+                [e.attention_mask for e in encodings], dtype=np.int64
+            )
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.array(
+                    [e.type_ids for e in encodings], dtype=np.int64
+                )
+
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over the non-padding tokens
+            mask = attention_mask[:, :, None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            batches.append(summed / np.clip(mask.sum(axis=1), 1e-9, None))
+
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        embeddings = np.concatenate(batches).astype(np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings
+
+
+def export_onnx_model(
+    model_name=f"sentence-transformers/{EMBEDDING_MODEL_NAME}",
+    output_dir=EMBEDDING_ONNX_MODEL_DIR,
+    quantize=True,
+):
+    """
+    Exports the Hugging Face model to ONNX next to its tokenizer.json and, by
+    default, writes an int8 dynamically quantized copy (EMBEDDING_ONNX_MODEL_FILE).
+    Needs torch and transformers; the runtime backend does not.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["template selection"], return_tensors="pt")
+    input_names = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    logger.info(f"Exported {model_name} to {fp32_path}")
+
+    if quantize:
+        quantized_path = os.path.join(output_dir, EMBEDDING_ONNX_MODEL_FILE)
+        quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+        logger.info(f"Wrote int8 quantized model to {quantized_path}")
+
+
+def load_sample_requests(path=SAMPLE_REQUESTS_PATH):
+    """The bundled corpus of example user requests."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_onnx_accuracy(requests=None):
+    """
+    Compares the template the torch and ONNX backends select for each request.
+
+    Returns:
+        list: (request, torch template, onnx template) for every disagreement.
+    """
+    import tempfile
+
+    from app.services.sentence_embeddings import SentenceEmbeddingMatcher
+
+    requests = requests or load_sample_requests()
+    winners = {}
+    for backend in ("torch", "onnx"):
+        # Build a throwaway index per backend so both compare like for like
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            matcher = SentenceEmbeddingMatcher(
+                index_path=os.path.join(tmp_dir, "index.index"),
+                metadata_path=os.path.join(tmp_dir, "metadata.json"),
+                backend=backend,
+            )
+            winners[backend] = matcher.match_templates(requests)
+
+    return [
+        (request, torch_winner, onnx_winner)
+        for request, torch_winner, onnx_winner in zip(
+            requests, winners["torch"], winners["onnx"]
+        )
+        if torch_winner != onnx_winner
+    ]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+
+    if command == "export":
+        export_onnx_model()
+    elif command == "check":
+        mismatches = check_onnx_accuracy()
+        for request, torch_winner, onnx_winner in mismatches:
+            logger.error(f"'{request}': torch={torch_winner} onnx={onnx_winner}")
+        logger.info(f"{len(mismatches)} mismatches on the sample request corpus")
+        sys.exit(1 if mismatches else 0)
+    else:
+        sys.exit(f"Unknown command: {command} (expected 'export' or 'check')")
@@ -0,0 +1,312 @@
+# app/services/output_validator.py
+"""
+Vectorized validation of generated rows against a template's field constraints.
+
+OutputValidator compiles a template's `fields` once into pandas/NumPy column
+checks (enum membership, number/integer ranges, YYYY-MM-DD dates and their
+min/max, booleans, regex `pattern`s, unique key columns, enum arrays and
+missing values). validate() runs every check once per DataFrame and returns a
+per-row/per-column violation mask, so callers can keep the valid rows and ask
+the LLM for replacements of only the failed ones (see LLMService.generate_rows).
+
+Columns use the local generator's naming: object fields are flattened to
+"Parent.Child". A CSV column named like the leaf ("Child") is accepted too.
+
+Every field is required: a blank or missing value is a violation unless the
+field sets "nullable": true or "required": false. The bundled templates set
+neither, so for them a row with any empty cell is dropped and regenerated.
+"""
+
+import logging
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.local_generator import flatten_fields, key_columns
+
+logger = logging.getLogger(__name__)
+
+# Separators the LLM uses between the items of an array value; commas only
+# separate items when no enum value contains one
+ARRAY_ITEM_SEPARATORS = r"\s*[;,|]\s*"
+ARRAY_ITEM_SEPARATORS_NO_COMMA = r"\s*[;|]\s*"
+BOOLEAN_VALUES = {"true", "false", "1", "0", "yes", "no"}
+
+# Takes the distinct values of a column and returns a boolean array, True where
+# the value violates the field's constraints
+ColumnCheck = Callable[[pd.Series], np.ndarray]
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_string_dtype(series):
+        return series
+    return series.astype(str)
+
+
+def _enum_check(values: List) -> ColumnCheck:
+    allowed = {str(v) for v in values}
+    numeric = [v for v in values if isinstance(v, (int, float))]
+
+    def check(series):
+        valid = _as_text(series).isin(allowed).to_numpy()
+        if numeric and pd.api.types.is_numeric_dtype(series):
+            # read_csv turns numeric enums into floats ("1" -> 1.0)
+            valid |= series.isin(numeric).to_numpy()
+        return ~valid
+
+    return check
+
+
+def _number_check(spec: Dict, integer: bool) -> ColumnCheck:
+    low, high = spec.get("min"), spec.get("max")
+
+    def check(series):
+        values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+        with np.errstate(invalid="ignore"):
+            invalid = np.isnan(values)
+            if low is not None:
+                invalid |= values < low
+            if high is not None:
+                invalid |= values > high
+            if integer:
+                invalid |= values % 1 != 0
+        return invalid
+
+    return check
+
+
+def _boolean_check(series):
+    if pd.api.types.is_bool_dtype(series):
+        return np.zeros(len(series), dtype=bool)
+    return ~_as_text(series).str.lower().isin(BOOLEAN_VALUES).to_numpy()
+
+
+def _date_check(spec: Dict) -> ColumnCheck:
+    # Templates only use YYYY-MM-DD
+    low = pd.Timestamp(spec["min"]) if spec.get("min") else None
+    high = pd.Timestamp(spec["max"]) if spec.get("max") else None
+
+    def check(series):
+        dates = pd.to_datetime(_as_text(series), format="%Y-%m-%d", errors="coerce")
+        invalid = dates.isna()
+        if low is not None:
+            invalid |= dates < low
+        if high is not None:
+            invalid |= dates > high
+        return invalid.to_numpy()
+
+    return check
+
+
+def _pattern_check(pattern: str) -> Optional[ColumnCheck]:
+    # Patterns are matched in full, so edge anchors are redundant
+    try:
+        regex = re.compile(pattern.removeprefix("^").removesuffix("$"))
+    except re.error as e:
+        logger.warning(f"Invalid pattern {pattern!r}, not validating it: {str(e)}")
+        return None
+
+    def check(series):
+        # A plain loop over the values beats the pandas str accessor here
+        values = _as_text(series).to_numpy(dtype=object)
+        fullmatch = regex.fullmatch
+        matched = np.fromiter(
+            (fullmatch(v) is not None for v in values), dtype=bool, count=len(values)
+        )
+        return ~matched
+
+    return check
+
+
+def _enum_array_check(values: List) -> ColumnCheck:
+    allowed = {str(v) for v in values}
+    separators = (
+        ARRAY_ITEM_SEPARATORS_NO_COMMA
+        if any("," in v for v in allowed)
+        else ARRAY_ITEM_SEPARATORS
+    )
+
+    def check(series):
+        items = (
+            _as_text(series)
+            .str.strip("[]")
+            .str.split(separators, regex=True)
+            .explode()
+            .str.strip("'\" ")
+        )
+        invalid = ~items.isin(allowed) & (items != "")
+        # One flag per row: any invalid item fails the row
+        return invalid.groupby(level=0).any().to_numpy()
+
+    return check
+
+
+def _duplicated(codes: np.ndarray) -> np.ndarray:
+    """
+    True for repeats of an earlier value. pd.factorize numbers values in order
+    of first appearance, so a repeat is a code not above the running maximum.
+    """
+    if len(codes) == 0:
+        return np.zeros(0, dtype=bool)
+    seen = np.maximum.accumulate(codes)
+    return np.concatenate(([False], codes[1:] <= seen[:-1]))
+
+
+def _run_check(check: ColumnCheck, distinct: pd.Series) -> np.ndarray:
+    invalid = np.array(check(distinct), dtype=bool)
+    if invalid.any() and pd.api.types.is_string_dtype(distinct):
+        # Values padded with spaces (" Basic") get a second chance stripped
+        retry = np.flatnonzero(invalid)
+        stripped = distinct.iloc[retry].str.strip().reset_index(drop=True)
+        invalid[retry] = check(stripped)
+    return invalid
+
+
+class ValidationResult:
+    """Violation mask of one validated DataFrame."""
+
+    def __init__(self, df: pd.DataFrame, mask: pd.DataFrame, missing: List[str]):
+        self.df = df
+        # True where a value violates its field's constraints
+        self.mask = mask
+        self.invalid_rows: np.ndarray = mask.to_numpy().any(axis=1)
+        self.missing_columns = missing
+
+    @property
+    def valid(self) -> pd.DataFrame:
+        """The rows without violations."""
+        return self.df[~self.invalid_rows]
+
+    @property
+    def invalid_count(self) -> int:
+        return int(self.invalid_rows.sum())
+
+    def violations(self) -> Dict[str, int]:
+        """Violations per column, for the columns that have any."""
+        counts = self.mask.sum()
+        return {column: int(count) for column, count in counts.items() if count}
+
+
+class OutputValidator:
+    """
+    Compiled constraint checks for one template's fields. Fields are required
+    unless marked "nullable": true or "required": false (see module docstring).
+    """
+
+    def __init__(self, fields: Dict):
+        """
+        Args:
+            fields: The template's "fields" object.
+        """
+        self.columns: List[str] = []
+        self._checks: Dict[str, List[ColumnCheck]] = {}
+        self._unique: Dict[str, bool] = {}
+        self._required: Dict[str, bool] = {}
+        keys = key_columns(fields)
+        for column, spec in flatten_fields(fields or {}):
+            self.columns.append(column)
+            self._checks[column] = self._compile(column, spec)
+            self._unique[column] = bool(spec.get("pattern")) and column in keys
+            self._required[column] = not (
+                spec.get("nullable") or spec.get("required") is False
+            )
+
+    @staticmethod
+    def _compile(column: str, spec: Dict) -> List[ColumnCheck]:
+        datatype = spec.get("datatype")
+        checks = []
+        if spec.get("enum"):
+            checks.append(_enum_check(spec["enum"]))
+        elif datatype in ("number", "integer"):
+            checks.append(_number_check(spec, integer=datatype == "integer"))
+        elif datatype == "boolean":
+            checks.append(_boolean_check)
+        elif datatype == "date":
+            checks.append(_date_check(spec))
+        elif datatype == "array":
+            enum = (spec.get("items") or {}).get("enum")
+            if enum:
+                checks.append(_enum_array_check(enum))
+        elif spec.get("pattern") and datatype in (None, "string"):
+            check = _pattern_check(spec["pattern"])
+            if check is not None:
+                checks.append(check)
+        return checks
+
+    def _resolve(self, df: pd.DataFrame, column: str) -> Optional[str]:
+        """The DataFrame column holding a field: its flattened name or its leaf."""
+        if column in df.columns:
+            return column
+        leaf = column.rsplit(".", 1)[-1]
+        return leaf if leaf in df.columns else None
+
+    def validate(self, df: pd.DataFrame) -> ValidationResult:
+        """
+        Runs every column check once over the DataFrame.
+
+        Fields missing from the DataFrame can't be fixed by regenerating rows,
+        so they are reported in missing_columns rather than as row violations.
+        """
+        mask = {}
+        missing = []
+        for column in self.columns:
+            source = self._resolve(df, column)
+            if source is None:
+                missing.append(column)
+                continue
+            # Checks run once per distinct value (generated columns repeat
+            # enums, dates and array combinations) and are mapped back to the
+            # rows by code; missing values get code -1, i.e. the last slot
+            codes, uniques = pd.factorize(df[source])
+            distinct = pd.Series(uniques)
+            blank = codes == -1
+            if pd.api.types.is_string_dtype(distinct):
+                blank |= np.append((distinct == "").to_numpy(bool), True)[codes]
+            invalid = blank.copy() if self._required[column] else np.zeros_like(blank)
+            for check in self._checks[column]:
+                invalid |= np.append(_run_check(check, distinct), False)[codes]
+            if self._unique[column]:
+                invalid |= _duplicated(codes) & ~blank
+            mask[column] = invalid
+        if missing:
+            logger.warning(f"Generated data lacks template fields: {missing}")
+        return ValidationResult(df, pd.DataFrame(mask, index=df.index), missing)
+
+    def filter(self, df: pd.DataFrame) -> pd.DataFrame:
+        """The valid rows of df, logging how many were dropped and why."""
+        result = self.validate(df)
+        if result.invalid_count:
+            logger.info(
+                f"Dropped {result.invalid_count}/{len(df)} invalid rows: "
+                f"{result.violations()}"
+            )
+        return result.valid
+
+
+# Throughput benchmark over the bundled templates, on local generator output
+if __name__ == "__main__":
+    import glob
+    import json
+    import os
+
+    from app.services.local_generator import LocalGenerator
+
+    templates_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
+    rows = 1_000_000
+    for path in sorted(glob.glob(os.path.join(templates_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            template = json.load(f)
+        df = LocalGenerator(template["fields"], seed=0).generate(rows)
+        validator = OutputValidator(template["fields"])
+
+        start = time.perf_counter()
+        result = validator.validate(df)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{template['template_name']:>40}: {len(validator.columns):>3} columns, "
+            f"{result.invalid_count:>7} invalid, "
+            f"{rows / elapsed / 1e6:6.2f}M rows/sec"
+        )
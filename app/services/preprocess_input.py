@@ -3,19 +3,31 @@
 import json
 import logging
 import os
+from typing import Dict, Optional, Tuple
 
-from app.context.request_context import get_current_model
+from app.context.request_context import get_current_model, report_progress
 from app.models.request import GenerateRequest
+from app.services.llm_cache import bypass_llm_cache
 from app.services.llm_service import LLMService
-from app.services.prompt_processor import PromptProcessor
-from app.services.sentence_embeddings import SentenceEmbeddingMatcher
+from app.services.local_generator import generate_locally
+from app.services.model_registry import ModelRegistry, get_model_registry
 from app.utils.template_loader import load_single_template
-from config.config import DEFAULT_LLM, OPEN_SEARCH
+from config.config import DEFAULT_GENERATION_ENGINE, DEFAULT_LLM, OPEN_SEARCH
 
 logger = logging.getLogger(__name__)
 
+TRANSCRIPT_TEMPLATES = (
+    "call_transcript_generation_user_based",
+    "call_transcript_generation_versatile",
+)
+# Field keys that only steer local generation and deduplication (see
+# key_columns); they are left out of the schema sent to the LLM
+GENERATION_ONLY_KEYS = ("unique",)
 
-def preprocess_input(request: GenerateRequest) -> str:
+
+def preprocess_input(
+    request: GenerateRequest, registry: Optional[ModelRegistry] = None
+) -> str:
     """
     Preprocesses the user input to select the best matching template and then builds
     and sends a final prompt to the LLM for synthetic data generation.
@@ -24,61 +36,148 @@ def preprocess_input(request: GenerateRequest) -> str:
       1. Try rule-based template selection.
       2. If NOT_FOUND, try sentence embedding based matching.
       3. If a template is found, load the JSON schema.
-      4. Build the final prompt including:
+         With parameters["engine"] == "local", rows are generated by the local
+         generator instead of steps 4-5.
+      4. Build the final prompt (per row batch, see LLMService.generate_rows) including:
          - User's original input.
          - A static instruction message.
          - The selected JSON schema (pretty printed).
-      5. Send the prompt to the LLM API and return the generated synthetic data.
+      5. Send the batches to the LLM API concurrently and return the location of
+         the merged synthetic data.
+
+    Args:
+        request: The generation request.
+        registry: Warm model registry to take the PromptProcessor from. Defaults to
+                  the process-wide registry (warmed up on first use).
     """
     user_input = request.prompt
 
-    processor = PromptProcessor(SentenceEmbeddingMatcher())
-    result = processor.process(user_input)
+    template_name, selected_template, error = select_template(user_input, registry)
+    if error:
+        return error
+    report_progress(0.1, f"Generating data with template '{template_name}'")
+
+    parameters = request.parameters or {}
+    # parameters["cache"] = False skips cached LLM completions for this request
+    with bypass_llm_cache(parameters.get("cache") is False):
+        if template_name in TRANSCRIPT_TEMPLATES:
+            # Handle special case for call transcript generation
+            final_prompt = transcript_prompt(selected_template, user_input)
+            result = LLMService.call_llm_for_transcript(final_prompt)
+        elif generation_engine(request) == "local":
+            # Structured fields are generated locally; the LLM only supplies
+            # example values for free-text fields
+            result = generate_locally(
+                selected_template, request.volume, seed=parameters.get("seed")
+            )
+        else:
+            # Step 4-5: Build the prompt per row batch and send the batches to the LLM
+            result = LLMService.generate_rows(
+                lambda rows, batch_index: build_generation_prompt(
+                    selected_template,
+                    user_input,
+                    request.output_format,
+                    rows,
+                    batch_index,
+                ),
+                request.volume,
+                selected_template.get("fields"),
+            )
+    return result
+
+
+def select_template(
+    user_input: str, registry: Optional[ModelRegistry] = None
+) -> Tuple[Optional[str], Optional[Dict], Optional[str]]:
+    """
+    Steps 1-3 of preprocess_input: picks the template for the user input and
+    loads its JSON schema.
+
+    Returns:
+        tuple: (template name, template, None), or (None, None, error message)
+               when no template matches or it can't be loaded.
+    """
+    registry = (registry or get_model_registry()).warmup()
+    registry.refresh_catalog_if_stale()
+    result = registry.prompt_processor.process(user_input)
 
     if result["template"] is None or result["template"] == "NOT_FOUND":
         # If no template was found, return early or handle accordingly.
         logger.info("No matching template found for the input.")
-        return result["error"]
+        return None, None, result["error"]
 
     # Load the selected JSON template (schema)
     if OPEN_SEARCH:
-        selected_template = result["template"]
-    else:
-        selected_template = load_single_template(result["template"])
-        if not selected_template:
-            logger.info("Template file could not be loaded.")
-            return "Template file could not be loaded."
-    find_template = json.loads(selected_template)
-    # print("Check selected template")
-    # print(selected_template)
-    # print(type(selected_template))
-    if find_template["template_name"] in (
-        "call_transcript_generation_user_based",
-        "call_transcript_generation_versatile",
-    ):
-        # Handle special case for call transcript generation
-        final_prompt = transcript_prompt(selected_template, user_input)
-        result = LLMService.call_llm_for_transcript(final_prompt)
-    else:
-        # Build the final prompt with best practices in prompt engineering.
-        static_instruction = f"You are a synthetic data generator. Respond to the user request ONLY with valid {request.output_format} matching the schema:\n\n"
+        # OpenSearch returns the whole schema as a JSON string
+        selected_template = json.loads(result["template"])
+        return selected_template.get("template_name"), selected_template, None
 
-        final_prompt = (
-            f"{static_instruction}\n\n"
-            f"Schema:\n{json.dumps(selected_template, indent=2)}\n\n"
-            f"User Request: {user_input}\n\n"
-            f"- Enclose the data entirely within backticks for easy extraction.\n"
-            f"- No explanations"
-            f"- No additional text"
-            f"- No markdown formatting"
-            f"- Never use markdown code blocks"
-            f"Ensure that any specific field modifications (if mentioned by the user) are considered."
-            f"Generate {request.volume} synthetic examples. Output pure {request.output_format} only:"
-        )
+    selected_template = load_single_template(result["template"])
+    if not selected_template:
+        logger.info("Template file could not be loaded.")
+        return None, None, "Template file could not be loaded."
+    return result["template"], selected_template, None
 
-        # Step 5: Send the final prompt to the LLM API
-        result = LLMService.call_llm_api(final_prompt)
-    return result
+
+def build_generation_prompt(
+    selected_template, user_input, output_format, rows, batch_index=0
+):
+    """
+    Builds the LLM prompt for one batch of `rows` synthetic records.
+    Batches after the first are asked to vary their values, which keeps the
+    prompts distinct and reduces duplicates across batches.
+    """
+    # Build the final prompt with best practices in prompt engineering.
+    static_instruction = f"You are a synthetic data generator. Respond to the user request ONLY with valid {output_format} matching the schema:\n\n"
+    batch_instruction = (
+        f"This is batch {batch_index + 1}: use different names, identifiers and values than earlier batches.\n"
+        if batch_index
+        else ""
+    )
+
+    return (
+        f"{static_instruction}\n\n"
+        f"Schema:\n{json.dumps(prompt_schema(selected_template), indent=2)}\n\n"
+        f"User Request: {user_input}\n\n"
+        f"- Enclose the data entirely within backticks for easy extraction.\n"
+        f"- No explanations"
+        f"- No additional text"
+        f"- No markdown formatting"
+        f"- Never use markdown code blocks"
+        f"Ensure that any specific field modifications (if mentioned by the user) are considered."
+        f"{batch_instruction}"
+        f"Generate {rows} synthetic examples. Output pure {output_format} only:"
+    )
+
+
+def prompt_schema(template: Dict) -> Dict:
+    """The template without GENERATION_ONLY_KEYS in its fields."""
+
+    def strip(fields):
+        return {
+            name: (
+                {
+                    key: strip(value) if key == "properties" else value
+                    for key, value in spec.items()
+                    if key not in GENERATION_ONLY_KEYS
+                }
+                if isinstance(spec, dict)
+                else spec
+            )
+            for name, spec in fields.items()
+        }
+
+    if not isinstance(template.get("fields"), dict):
+        return template
+    return {**template, "fields": strip(template["fields"])}
+
+
+def generation_engine(request: GenerateRequest) -> str:
+    """The engine requested in parameters["engine"], else DEFAULT_GENERATION_ENGINE."""
+    engine = (request.parameters or {}).get("engine", DEFAULT_GENERATION_ENGINE)
+    if engine not in ("llm", "local"):
+        raise ValueError(f"Unknown generation engine: {engine}")
+    return engine
 
 
 def transcript_prompt(selected_template, user_input):
@@ -1,25 +1,33 @@
 import json
 import logging
 import re
-from typing import Any, Dict, List, Optional
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-import spacy
-from rapidfuzz import fuzz, process
-from spacy.lang.en.stop_words import STOP_WORDS
-
-from app.services.open_search import get_best_matching_schema
-from app.services.sentence_embeddings import SentenceEmbeddingMatcher
+from app.utils.phrase_matcher import remove_phrases
 from app.utils.template_loader import load_template_mappings
+from app.utils.ttl_cache import TTLCache
 from config.config import (
     DEFAULT_FORMAT,
     DEFAULT_RECORD_COUNT,
     FILLER_PHRASES,
     OPEN_SEARCH,
     SUPPORTED_FORMATS,
+    TEMPLATE_CACHE_SIZE,
+    TEMPLATE_CACHE_TTL_SECONDS,
 )
 
 logger = logging.getLogger(__name__)
 
+_CACHE_KEY_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# spaCy, rapidfuzz (via the candidate index) and the OpenSearch client are
+# imported on first use so importing this module stays cheap
+if TYPE_CHECKING:
+    from spacy.language import Language
+
+    from app.services.sentence_embeddings import SentenceEmbeddingMatcher
+
 
 class PromptProcessor:
     """
@@ -27,20 +35,44 @@ class PromptProcessor:
     Extracts parameters and identifies the appropriate template.
     """
 
-    def __init__(self, template_matcher: SentenceEmbeddingMatcher):
+    def __init__(
+        self,
+        template_matcher: "SentenceEmbeddingMatcher",
+        nlp: Optional["Language"] = None,
+        template_mappings: Optional[Dict[str, List[str]]] = None,
+    ):
         """
         Initialize the processor with template matching functionality.
 
         Args:
             template_matcher: An object with a match_template method that finds the
                              appropriate template based on the query.
+            nlp: A loaded spaCy pipeline. Pass the shared one from the model
+                 registry; loads "en_core_web_sm" when omitted (not with
+                 OPEN_SEARCH, which selects templates without spaCy).
+            template_mappings: Pre-loaded template mappings; loaded when omitted.
         """
-        self.nlp = spacy.load("en_core_web_sm")
+        if nlp is None and not OPEN_SEARCH:
+            import spacy
+
+            nlp = spacy.load("en_core_web_sm", exclude=["ner"])
+        self.nlp = nlp
+        self._stop_words = nlp.Defaults.stop_words if nlp is not None else set()
         self.template_matcher = template_matcher
 
+        # (normalized prompt, catalog version) -> template name
+        self.template_cache = TTLCache(
+            maxsize=TEMPLATE_CACHE_SIZE, ttl_seconds=TEMPLATE_CACHE_TTL_SECONDS
+        )
+
         # Mapping of canonical template keys to descriptive category strings.
         # The mapping can be updated regularly with domain-specific synonyms in the templates.
-        self.template_mappings = load_template_mappings()
+        # Assigning template_mappings (re)builds the fuzzy candidate index
+        self.template_mappings = (
+            template_mappings
+            if template_mappings is not None
+            else load_template_mappings()
+        )
 
         # Patterns for extraction
         self.record_count_patterns = [
@@ -81,6 +113,21 @@ class PromptProcessor:
             "thousand": 1000,
         }
 
+    @property
+    def template_mappings(self):
+        return self._template_mappings
+
+    @template_mappings.setter
+    def template_mappings(self, template_mappings):
+        from app.services.template_candidate_index import TemplateCandidateIndex
+
+        self._template_mappings = template_mappings
+        self._candidate_index = (
+            TemplateCandidateIndex(template_mappings)
+            if isinstance(template_mappings, dict)
+            else None
+        )
+
     def process(self, user_input: str) -> Dict[str, Any]:
         """
         Process the user input and extract parameters.
@@ -91,20 +138,13 @@ class PromptProcessor:
         Returns:
             Dict containing extracted parameters and template information.
         """
-        # Start with original input for reference
-        original_input = user_input
-
-        # Basic normalization
-        normalized_input = user_input.strip()
-
-        # Extract parameters
-        record_count = self._extract_record_count(normalized_input)
-        data_format = self._extract_data_format(normalized_input)
         template_success = True
 
         # Find matching template
         try:
             if OPEN_SEARCH:
+                from app.services.open_search import get_best_matching_schema
+
                 # Use OpenSearch for template selection
                 schema, schema_name = get_best_matching_schema(user_input)
 
@@ -122,26 +162,140 @@ class PromptProcessor:
                     template_success = False
 
                 if template_success:
-                    # Step 1: Rule-Based Template Selection
-                    template_name = self._select_template_rule_based(user_input)
-                    if template_name == "NOT_FOUND":
-                        # Step 2: Embedding-Based Template Selection
-                        template_name = self.template_matcher.match_template(user_input)
+                    # Repeated prompts are served from the template-match cache
+                    cache_key = self._template_cache_key(user_input)
+                    template_name = self.template_cache.get(cache_key)
+                    if template_name is None:
+                        # Step 1: Rule-Based Template Selection
+                        template_name = self._select_template_rule_based(user_input)
                         if template_name == "NOT_FOUND":
-                            # No template found by either method
-                            template_name = "NOT_FOUND"
-                            template_success = False
+                            # Step 2: Embedding-Based Template Selection
+                            template_name = self.template_matcher.match_template(
+                                user_input
+                            )
+                        self.template_cache.set(cache_key, template_name)
+                    if template_name == "NOT_FOUND":
+                        # No template found by either method
+                        template_success = False
 
         except Exception as e:
             logger.error(f"Template matching error: {str(e)}")
             template_name = None
             template_success = False
 
+        return self._build_result(user_input, template_name, template_success)
+
+    def process_many(
+        self, prompts: List[str], batch_size: int = 64
+    ) -> List[Dict[str, Any]]:
+        """
+        Process a batch of user inputs. Produces the same per-prompt results as
+        process(), but runs spaCy with nlp.pipe, encodes every prompt left
+        unresolved by the rule-based step in a single batch and runs one FAISS
+        batch search.
+
+        Args:
+            prompts: The natural language prompts to classify.
+            batch_size: Number of texts spaCy buffers per nlp.pipe batch.
+
+        Returns:
+            List of result dicts, in the same order as prompts.
+        """
+        start = time.perf_counter()
+
+        if OPEN_SEARCH or self.template_mappings == "NOT_FOUND":
+            # OpenSearch queries are per prompt; the error path is cheap anyway
+            results = [self.process(prompt) for prompt in prompts]
+        else:
+            try:
+                results = self._process_batch(prompts, batch_size)
+            except Exception as e:
+                logger.error(f"Batch template matching error: {str(e)}")
+                results = [self.process(prompt) for prompt in prompts]
+
+        elapsed = time.perf_counter() - start
+        throughput = len(prompts) / elapsed if elapsed > 0 else float("inf")
+        logger.info(
+            f"Processed {len(prompts)} prompts in {elapsed:.2f}s "
+            f"({throughput:.1f} prompts/sec)"
+        )
+        return results
+
+    def _process_batch(
+        self, prompts: List[str], batch_size: int
+    ) -> List[Dict[str, Any]]:
+        """NLP template selection for a batch of prompts (rule-based, then embeddings)."""
+        cache_keys = [self._template_cache_key(prompt) for prompt in prompts]
+        template_names = [self.template_cache.get(key) for key in cache_keys]
+
+        # Only prompts missing from the cache go through spaCy and the matchers
+        misses = [i for i, name in enumerate(template_names) if name is None]
+        if misses:
+            key_phrases = self._extract_key_phrases(
+                [prompts[i] for i in misses], batch_size
+            )
+            for i, match in zip(misses, self._candidate_index.match_many(key_phrases)):
+                template_names[i] = match
+
+            unresolved = [i for i in misses if template_names[i] == "NOT_FOUND"]
+            if unresolved:
+                matches = self.template_matcher.match_templates(
+                    [prompts[i] for i in unresolved]
+                )
+                for i, match in zip(unresolved, matches):
+                    template_names[i] = match
+
+            for i in misses:
+                self.template_cache.set(cache_keys[i], template_names[i])
+
+        results = []
+        for prompt, template_name in zip(prompts, template_names):
+            results.append(
+                self._build_result(
+                    prompt,
+                    template_name,
+                    template_success=template_name != "NOT_FOUND",
+                    log_level=logging.DEBUG,
+                )
+            )
+        return results
+
+    @property
+    def catalog_version(self) -> str:
+        """Version of the template catalog: mappings plus the embedding index metadata."""
+        mappings_version = (
+            self._candidate_index.version if self._candidate_index else "none"
+        )
+        index_version = getattr(self.template_matcher, "catalog_version", "none")
+        return f"{mappings_version}:{index_version}"
+
+    def _template_cache_key(self, user_input: str) -> Tuple[str, str]:
+        """
+        Cache key for template matches: the lowercased prompt reduced to its
+        alphanumeric words, plus the catalog version, so entries computed against
+        an older catalog are never served.
+        """
+        normalized_prompt = " ".join(
+            _CACHE_KEY_WORD_PATTERN.findall(user_input.lower())
+        )
+        return normalized_prompt, self.catalog_version
+
+    def _build_result(
+        self,
+        user_input: str,
+        template_name: Optional[str],
+        template_success: bool,
+        log_level: int = logging.INFO,
+    ) -> Dict[str, Any]:
+        """Assemble the result dict returned by process() and process_many()."""
+        # Basic normalization
+        normalized_input = user_input.strip()
+
         # Prepare result
         result = {
-            "original_input": original_input,
-            "record_count": record_count,
-            "data_format": data_format,
+            "original_input": user_input,
+            "record_count": self._extract_record_count(normalized_input),
+            "data_format": self._extract_data_format(normalized_input),
             "template": template_name if template_name else None,
             "error": None,
         }
@@ -154,7 +308,7 @@ class PromptProcessor:
                 result["error"] = "No matching template found."
 
         # Log the processing results
-        logger.info(f"Processed request: {result}")
+        logger.log(log_level, f"Processed request: {result}")
 
         return result
 
@@ -196,41 +350,33 @@ class PromptProcessor:
         3. Lemmatizing the text.
         """
         # Step 1: Lowercase, remove punctuation, and filter out stopwords.
-        doc = self.nlp(text.lower())
+        # Step 2: Remove filler phrases.
+        # Both only read token text and is_alpha, so the tokenizer is enough
+        filtered_text = self._filter_doc(self.nlp.make_doc(text.lower()))
+
+        # Step 3: Lemmatize the text.
+        return self._lemmatize_doc(self.nlp(filtered_text))
+
+    def _filter_doc(self, doc) -> str:
+        """Drop punctuation and stopwords from a lowercased Doc, then remove filler phrases."""
         filtered_tokens = [
             token.text
             for token in doc
-            if token.is_alpha and token.text not in STOP_WORDS
+            if token.is_alpha and token.text not in self._stop_words
         ]
-        filtered_text = " ".join(filtered_tokens)
+        return self._remove_filler_phrases(" ".join(filtered_tokens))
 
-        # Step 2: Remove filler phrases.
-        filtered_text = self._remove_filler_phrases(filtered_text)
-
-        # Step 3: Lemmatize the text.
-        doc2 = self.nlp(filtered_text)
-        lemmatized_tokens = [token.lemma_ for token in doc2 if token.is_alpha]
-        return " ".join(lemmatized_tokens)
+    @staticmethod
+    def _lemmatize_doc(doc) -> str:
+        """Join the lemmas of the alphabetic tokens of a Doc."""
+        return " ".join(token.lemma_ for token in doc if token.is_alpha)
 
     def _remove_filler_phrases(self, text: str) -> str:
         """
         Remove common filler phrases from the text.
         """
-        # First define a regex pattern that matches whole words or phrases
-        for phrase in FILLER_PHRASES:
-            # Escape any regex special characters in the phrase
-            escaped_phrase = re.escape(phrase)
-            # Create pattern that ensures we match at word boundaries
-            pattern = r"\b" + escaped_phrase + r"\b"
-            # Replace the phrase with empty string
-            text = re.sub(pattern, "", text)
-
-        # Clean up any double spaces that might result from removals
-        text = re.sub(r"\s+", " ", text)
-        # Trim leading/trailing whitespace
-        text = text.strip()
-
-        return text
+        # One precompiled longest-match-first alternation instead of a re.sub per phrase
+        return remove_phrases(text, FILLER_PHRASES)
 
     def _extract_key_phrase(self, text: str) -> str:
         """
@@ -238,12 +384,36 @@ class PromptProcessor:
         This function normalizes the text, filters out common filler words, and then extracts the
         most domain-relevant noun chunk.
         """
-
         # Normalize text
         normalized = self._normalize_text(text)
 
         # Process the cleaned text to extract noun chunks
-        doc_clean = self.nlp(normalized)
+        return self._key_phrase_from_doc(self.nlp(normalized), normalized)
+
+    def _extract_key_phrases(self, texts: List[str], batch_size: int = 64) -> List[str]:
+        """
+        Batched _extract_key_phrase: tokenizes all texts for the filter step, then
+        runs the two spaCy passes over all of them with nlp.pipe.
+        """
+        filtered = [
+            self._filter_doc(doc)
+            for doc in self.nlp.tokenizer.pipe(
+                (text.lower() for text in texts), batch_size=batch_size
+            )
+        ]
+        normalized = [
+            self._lemmatize_doc(doc)
+            for doc in self.nlp.pipe(filtered, batch_size=batch_size)
+        ]
+        return [
+            self._key_phrase_from_doc(doc, text)
+            for doc, text in zip(
+                self.nlp.pipe(normalized, batch_size=batch_size), normalized
+            )
+        ]
+
+    def _key_phrase_from_doc(self, doc_clean, normalized: str) -> str:
+        """Pick the longest multi-word noun chunk of the normalized Doc as key phrase."""
         noun_chunks = [
             chunk.text for chunk in doc_clean.noun_chunks if len(chunk.text.split()) > 1
         ]
@@ -270,21 +440,48 @@ class PromptProcessor:
         - The key for the selected template (e.g., "TFSA") or a default ("Life") if no match is confident.
         """
         normalized_request = self._extract_key_phrase(user_request)
+        return self._match_key_phrase(normalized_request, threshold)
 
-        # Flatten the list of candidates since each value in TEMPLATE_CANDIDATES is a list of strings
-        candidate_list = [
-            desc for sublist in self.template_mappings.values() for desc in sublist
-        ]
-
-        # Use RapidFuzz to get the best matching candidate
-        best_match, score, _ = process.extractOne(
-            normalized_request, candidate_list, scorer=fuzz.token_sort_ratio
-        )
-
-        if score >= threshold:
-            # Find the canonical key that maps to the best match
-            for key, value_list in self.template_mappings.items():
-                if best_match in value_list:
-                    return key
-        # Fallback to a default template if none meets the threshold
-        return "NOT_FOUND"
+    def _match_key_phrase(
+        self, normalized_request: str, threshold: float = 85.0
+    ) -> str:
+        """Fuzzy-match an extracted key phrase against the template mappings."""
+        # Precomputed candidate index: token-sorted phrases scored with
+        # process.cdist, winner resolved through a candidate -> template dict
+        return self._candidate_index.match(normalized_request, threshold)
+
+
+if __name__ == "__main__":
+    import spacy
+
+    # CPU cost of key-phrase extraction: the filter step on the tokenizer versus
+    # the original full parse of the lowercased prompt
+    nlp = spacy.load("en_core_web_sm", exclude=["ner"])
+    processor = PromptProcessor(None, nlp=nlp, template_mappings={})
+    prompts = [
+        "Generate synthetic data for a tax free saving account",
+        "I need data for a health insurance policy",
+        "Produce synthetic records for locked-in retirement accounts",
+        "Create mock data for a first-time home buyer savings account",
+        "Generate mock data for registered retirement savings plans",
+    ] * 200
+
+    def full_parse_key_phrase(text):
+        filtered_text = processor._filter_doc(nlp(text.lower()))
+        normalized = processor._lemmatize_doc(nlp(filtered_text))
+        return processor._key_phrase_from_doc(nlp(normalized), normalized)
+
+    for name, extract in (
+        ("full parse", full_parse_key_phrase),
+        ("tokenizer filter", processor._extract_key_phrase),
+    ):
+        start = time.perf_counter()
+        phrases = [extract(prompt) for prompt in prompts]
+        per_prompt_ms = (time.perf_counter() - start) / len(prompts) * 1000
+        print(f"{name}: {per_prompt_ms:.3f} ms/prompt")
+    assert phrases == [full_parse_key_phrase(prompt) for prompt in prompts]
+
+    start = time.perf_counter()
+    processor._extract_key_phrases(prompts)
+    per_prompt_ms = (time.perf_counter() - start) / len(prompts) * 1000
+    print(f"batched: {per_prompt_ms:.3f} ms/prompt")
@@ -0,0 +1,234 @@
+# app/services/rate_limiter.py
+"""
+Adaptive client-side rate limiting per LLM provider and model.
+
+Each (provider, model) gets a ProviderLimiter combining:
+- a token bucket capping the request rate (requests_per_minute, burst), and
+- an AIMD concurrency controller: the number of calls allowed in flight grows
+  by one per "window" of successful calls and is halved whenever the provider
+  throttles (HTTP 429, Bedrock ThrottlingException).
+
+Throttled calls and `retry-after` / `x-ratelimit-*` response headers pause the
+limiter until the provider's reset time. Callers are queued rather than failed:
+run() waits for a slot and retries throttled calls up to
+RATE_LIMIT_MAX_THROTTLE_RETRIES times.
+
+Typical usage (transports raise RateLimitedError on throttling):
+    get_rate_limiter("groq", GROQ_MODEL_ID).run(lambda: call_groq(...))
+"""
+
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from config.config import (
+    RATE_LIMIT_DEFAULT_RETRY_AFTER,
+    RATE_LIMIT_MAX_THROTTLE_RETRIES,
+    RATE_LIMITS,
+)
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+class RateLimitedError(RuntimeError):
+    """The provider throttled the call; retry_after is in seconds, if known."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """
+    Seconds in a rate-limit header: plain seconds ("2", "0.5"), Go-style
+    durations ("1m26.4s", "120ms") or an HTTP date (retry-after).
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderLimiter:
+    """Token bucket plus AIMD concurrency limit for one provider/model."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        burst: int,
+        initial_concurrency: int,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+    ):
+        self.name = name
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(initial_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.throttle_events = 0
+        self.completed = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def run(self, func: Callable):
+        """
+        Calls func() once a slot and a token are available. Calls raising
+        RateLimitedError shrink the limit, pause the limiter and are queued
+        again, up to RATE_LIMIT_MAX_THROTTLE_RETRIES times.
+        """
+        for attempt in range(RATE_LIMIT_MAX_THROTTLE_RETRIES + 1):
+            try:
+                with self.slot():
+                    return func()
+            except RateLimitedError as e:
+                if attempt == RATE_LIMIT_MAX_THROTTLE_RETRIES:
+                    raise
+                logger.warning(f"{self.name} throttled, requeueing: {str(e)}")
+
+    @contextmanager
+    def slot(self):
+        """Holds one rate-limited call slot for the duration of the block."""
+        self.acquire()
+        try:
+            yield
+        except RateLimitedError as e:
+            self.release(throttled=True, retry_after=e.retry_after)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        else:
+            self.release(succeeded=True)
+
+    def acquire(self):
+        """Blocks until the limiter isn't paused and a slot and a token are free."""
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now < self._paused_until:
+                        self._cond.wait(self._paused_until - now)
+                        continue
+                    if self.in_flight >= int(self.limit):
+                        self._cond.wait()
+                        continue
+                    self._refill(now)
+                    if self._tokens < 1:
+                        self._cond.wait((1 - self._tokens) / self.rate)
+                        continue
+                    self._tokens -= 1
+                    self.in_flight += 1
+                    return
+            finally:
+                self.waiting -= 1
+
+    def release(
+        self,
+        succeeded: bool = False,
+        throttled: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                # Multiplicative decrease, and wait out the provider's window
+                self.throttle_events += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self._pause(
+                    retry_after
+                    if retry_after is not None
+                    else RATE_LIMIT_DEFAULT_RETRY_AFTER
+                )
+            elif succeeded:
+                # Additive increase: about +1 after `limit` successful calls
+                self.completed += 1
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """
+        Pauses until the provider's reset time when a response says the request
+        or token quota is used up (x-ratelimit-remaining-* == 0) or carries a
+        retry-after.
+        """
+        pause = parse_duration(headers.get("retry-after", ""))
+        for quota in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{quota}")
+            if remaining is not None and remaining.strip() in ("0", "0.0"):
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{quota}", ""))
+                if reset is not None:
+                    pause = max(pause or 0.0, reset)
+        if pause:
+            with self._cond:
+                self._pause(pause)
+
+    def _pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _refill(self, now: float):
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled_at) * self.rate
+        )
+        self._refilled_at = now
+
+    def stats(self) -> Dict:
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "tokens": round(self._tokens, 2),
+                "throttle_events": self.throttle_events,
+                "completed": self.completed,
+                "paused_for": round(max(0.0, self._paused_until - now), 2),
+            }
+
+
+_limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model_id: str) -> ProviderLimiter:
+    """The process-wide limiter for a provider ("groq", "bedrock") and model."""
+    key = (provider, model_id)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                limiter = ProviderLimiter(
+                    f"{provider}/{model_id}", **RATE_LIMITS[provider]
+                )
+                _limiters[key] = limiter
+    return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict]:
+    """Current limit, in-flight and waiting calls and throttle events per limiter."""
+    return {limiter.name: limiter.stats() for limiter in list(_limiters.values())}
@@ -3,11 +3,13 @@ import logging
 import re
 from io import StringIO
 
-import boto3
 import pandas as pd
-import requests
 
+from app.services import http_client
+from app.services.bedrock_client import get_bedrock_client
 from app.services.csv_parser import CsvParser
+from app.services.llm_cache import get_llm_cache
+from app.services.rate_limiter import RateLimitedError, get_rate_limiter, parse_duration
 from app.utils import utility
 from config.config import (
     AWS_PROFILE,
@@ -23,6 +25,49 @@ from config.config import (
 
 logger = logging.getLogger(__name__)
 
+BEDROCK_THROTTLING_CODES = (
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+)
+
+
+def _raise_if_throttled(call):
+    """Runs a Bedrock call, turning throttling errors into RateLimitedError."""
+    from botocore.exceptions import ClientError
+
+    try:
+        return call()
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in BEDROCK_THROTTLING_CODES:
+            raise RateLimitedError(f"Bedrock throttled the call: {code}") from e
+        raise
+
+
+def _rate_limit_hook(limiter):
+    """Feeds rate-limit headers to the limiter and turns 429s into RateLimitedError."""
+
+    def hook(response):
+        limiter.update_from_headers(response.headers)
+        if response.status_code == 429:
+            raise RateLimitedError(
+                f"Groq rate limit: {response.text[:200]}",
+                retry_after=parse_duration(response.headers.get("retry-after", "")),
+            )
+
+    return hook
+
+
+def _message_content(response_json):
+    """The completion text of an OpenAI-style chat response."""
+    choices = response_json.get("choices")
+    if not choices:
+        # Error bodies (e.g. rate limits) have no choices
+        error = response_json.get("error") or response_json
+        raise ValueError(f"LLM response has no choices: {error}")
+    return choices[0]["message"]["content"]
+
 
 class RequestModel:
     def __init__(self):
@@ -34,11 +79,53 @@ class RequestModel:
     def send_request_bedrock(
         self, prompt, max_tokens=4000, temperature=0.7, top_p=0.9, top_k=250
     ):
-        # Initialize AWS Session with IAM Identity Center (SSO) profile
-        session = boto3.Session(profile_name=self.AWS_PROFILE)
+        output_text = self.complete_bedrock(
+            prompt, max_tokens, temperature, top_p, top_k
+        )
+
+        # Extract the CSV data from the output text
+        csv_data = CsvParser.parse_csv_response(output_text)
+
+        # Load the CSV data into a Pandas DataFrame
+        df = self._parse_csv_response(csv_data, "bedrock")
+
+        destination_uri = utility.save_dataframe_to_s3(
+            df, bucket_name=S3_OUTPUT_BUCKET, prefix=S3_OUTPUT_FOLDER
+        )
+
+        return destination_uri
+
+    def complete_bedrock(
+        self,
+        prompt,
+        max_tokens=4000,
+        temperature=0.7,
+        top_p=0.9,
+        top_k=250,
+        validate=None,
+    ):
+        """
+        Sends the prompt to Bedrock and returns the raw completion text. Only
+        completions validate() accepts are cached.
+        """
+        params = {
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "top_k": top_k,
+        }
+        return get_llm_cache().get_or_compute(
+            "bedrock",
+            LLM_BEDROCK_MODEL_ID,
+            prompt,
+            params,
+            lambda: self._invoke_bedrock(prompt, max_tokens, temperature, top_p, top_k),
+            validate,
+        )
 
-        # Create Bedrock client
-        bedrock_client = session.client("bedrock-runtime", region_name=self.region_name)
+    def _invoke_bedrock(self, prompt, max_tokens, temperature, top_p, top_k):
+        # Shared, pool-tuned client for this profile and region
+        bedrock_client = get_bedrock_client(self.AWS_PROFILE, self.region_name)
 
         # Define the request payload
 
@@ -62,33 +149,53 @@ class RequestModel:
         #     },
         # }
 
-        # Invoke the Titan model
-        response = bedrock_client.invoke_model(
-            modelId=LLM_BEDROCK_MODEL_ID, body=json.dumps(payload)
-        )
+        def invoke():
+            response = bedrock_client.invoke_model(
+                modelId=LLM_BEDROCK_MODEL_ID, body=json.dumps(payload)
+            )
+            with response["body"] as stream:
+                return json.loads(stream.read())
 
-        with response["body"] as stream:
-            response_body = json.loads(stream.read())
+        # Invoke the model behind the per-model rate limiter, which queues
+        # throttled calls and retries them
+        response_body = get_rate_limiter("bedrock", LLM_BEDROCK_MODEL_ID).run(
+            lambda: _raise_if_throttled(invoke)
+        )
 
         # Extract the output text
         # output_text = response_body["results"][0]["outputText"]
 
         # Extract the generated response from Claude
-        output_text = response_body.get("completion", "").strip()
+        return response_body.get("completion", "").strip()
+
+    def send_request_groq(self, prompt):
+        csv_data = self.complete_groq(prompt)
 
         # Extract the CSV data from the output text
-        csv_data = CsvParser.parse_csv_response(output_text)
+        csv_data = CsvParser.parse_csv_response(csv_data)
 
-        # Load the CSV data into a Pandas DataFrame
-        df = self._parse_csv_response(csv_data, "bedrock")
+        # Convert the CSV data into a pandas DataFrame
+        df = self._parse_csv_response(csv_data, "groq")
 
-        destination_uri = utility.save_dataframe_to_s3(
-            df, bucket_name=S3_OUTPUT_BUCKET, prefix=S3_OUTPUT_FOLDER
-        )
+        destination_uri = utility.save_dataframe_locally(df)
 
         return destination_uri
 
-    def send_request_groq(self, prompt):
+    def complete_groq(self, prompt, validate=None):
+        """
+        Sends the prompt to Groq and returns the raw completion text. Only
+        completions validate() accepts are cached.
+        """
+        return get_llm_cache().get_or_compute(
+            "groq",
+            GROQ_MODEL_ID,
+            prompt,
+            {},
+            lambda: self._invoke_groq(prompt),
+            validate,
+        )
+
+    def _invoke_groq(self, prompt):
         # Define the API endpoint and headers
         API_KEY = self.GROQ_API_KEY
         url = self.groq_url
@@ -102,22 +209,64 @@ class RequestModel:
             "model": GROQ_MODEL_ID,
             "messages": [{"role": "user", "content": prompt}],
         }
-        # Send the request to the Groq API
-        response = requests.post(url, json=data, headers=headers)
+        # Send the request to the Groq API over the shared connection pool,
+        # queued behind the per-model rate limiter (which retries 429s)
+        limiter = get_rate_limiter("groq", GROQ_MODEL_ID)
+        response_json = limiter.run(
+            lambda: http_client.post_json(
+                url, data, headers, response_hook=_rate_limit_hook(limiter)
+            )
+        )
 
         # Extracting the message content
-        response_json = response.json()
-        csv_data = response_json["choices"][0]["message"]["content"]
-
-        # Extract the CSV data from the output text
-        csv_data = CsvParser.parse_csv_response(csv_data)
-
-        # Convert the CSV data into a pandas DataFrame
-        df = self._parse_csv_response(csv_data, "groq")
+        return _message_content(response_json)
 
-        destination_uri = utility.save_dataframe_locally(df)
-
-        return destination_uri
+    def stream_bedrock(
+        self, prompt, max_tokens=4000, temperature=0.7, top_p=0.9, top_k=250
+    ):
+        """Yields completion text chunks from Bedrock as they are generated."""
+        bedrock_client = get_bedrock_client(self.AWS_PROFILE, self.region_name)
+        payload = {
+            "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
+            "max_tokens_to_sample": max_tokens,
+            "temperature": temperature,
+            "top_k": top_k,
+            "top_p": top_p,
+            "stop_sequences": ["\n\nHuman:"],
+            "anthropic_version": "bedrock-2023-05-31",
+        }
+        # A stream holds its rate limiter slot until it is consumed
+        with get_rate_limiter("bedrock", LLM_BEDROCK_MODEL_ID).slot():
+            response = _raise_if_throttled(
+                lambda: bedrock_client.invoke_model_with_response_stream(
+                    modelId=LLM_BEDROCK_MODEL_ID, body=json.dumps(payload)
+                )
+            )
+            for event in response["body"]:
+                chunk = event.get("chunk")
+                if chunk:
+                    text = json.loads(chunk["bytes"]).get("completion", "")
+                    if text:
+                        yield text
+
+    def stream_groq(self, prompt):
+        """Yields completion text chunks from Groq (server-sent events)."""
+        headers = {
+            "Authorization": f"Bearer {self.GROQ_API_KEY}",
+            "Content-Type": "application/json",
+        }
+        data = {
+            "model": GROQ_MODEL_ID,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+        }
+        # A stream holds its rate limiter slot until it is consumed
+        with get_rate_limiter("groq", GROQ_MODEL_ID).slot():
+            for event in http_client.stream_sse(self.groq_url, data, headers):
+                choices = event.get("choices") or [{}]
+                text = (choices[0].get("delta") or {}).get("content")
+                if text:
+                    yield text
 
     def _parse_csv_response(self, csv_data: str, source: str) -> pd.DataFrame:
         try:
@@ -129,29 +278,8 @@ class RequestModel:
             raise
     
     def send_transcript_request_groq(self, prompt):
-        # Define the API endpoint and headers
-        API_KEY = self.GROQ_API_KEY
-        url = self.groq_url
-        # print("############## PROMPT #####################")
-        # print(prompt)
-        headers = {
-            "Authorization": f"Bearer {API_KEY}",
-            "Content-Type": "application/json",
-        }
-
-        data = {
-            "model": GROQ_MODEL_ID,
-            "messages": [{"role": "user", "content": prompt}],
-        }
-        # Send the request to the Groq API
-        response = requests.post(url, json=data, headers=headers)
-
-        # Extracting the message content
-        response_json = response.json()
-        # print("############## RESPONSE #####################")
-        # print(response_json)
-        # Access the content containing the transcript directly from the dictionary
-        transcript_content = response_json['choices'][0]['message']['content']
+        # Access the content containing the transcript (cached like any completion)
+        transcript_content = self.complete_groq(prompt)
 
         # Find the start and end of the actual transcript using the backticks
         start_index = transcript_content.find("```")
@@ -178,39 +306,11 @@ class RequestModel:
     def send_transcript_request_bedrock(
         self, prompt, max_tokens=4000, temperature=0.7, top_p=0.9, top_k=250
     ):
-        # Initialize AWS Session with IAM Identity Center (SSO) profile
-        session = boto3.Session(profile_name=self.AWS_PROFILE)
-
-        # Create Bedrock client
-        bedrock_client = session.client("bedrock-runtime", region_name=self.region_name)
-
-        # Define the request payload
-
-        # Antrhopic
-        payload = {
-            "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
-            "max_tokens_to_sample": max_tokens,
-            "temperature": temperature,
-            "top_k": top_k,
-            "top_p": top_p,
-            "stop_sequences": ["\n\nHuman:"],
-            "anthropic_version": "bedrock-2023-05-31",
-        }
-
-
-        response = bedrock_client.invoke_model(
-            modelId=LLM_BEDROCK_MODEL_ID, body=json.dumps(payload)
+        # Extract the generated response from Claude (cached like any completion)
+        output_text = self.complete_bedrock(
+            prompt, max_tokens, temperature, top_p, top_k
         )
 
-        with response["body"] as stream:
-            response_body = json.loads(stream.read())
-
-        # Extract the output text
-        # output_text = response_body["results"][0]["outputText"]
-
-        # Extract the generated response from Claude
-        output_text = response_body.get("completion", "").strip()
-
         destination_uri = utility.save_text_to_s3(
             output_text, bucket_name=S3_OUTPUT_BUCKET, prefix=S3_OUTPUT_FOLDER
         )
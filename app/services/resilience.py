@@ -0,0 +1,465 @@
+# app/services/resilience.py
+"""
+Retries, hedging and circuit breaking for LLM calls across backends.
+
+ResilientCaller.call(primary, call) runs call(backend) for the request's
+backend ("bedrock" or "groq") and:
+- retries retryable errors (httpx timeouts and connection errors, 5xx, Bedrock
+  internal/timeout error codes) with exponential backoff and full jitter.
+  botocore transport errors (read timeouts, endpoint connection errors) were
+  already retried BEDROCK_MAX_ATTEMPTS times by the client, so they fail over
+  straight away;
+- optionally hedges: when the primary hasn't answered after its recent latency
+  percentile (LLM_HEDGE_PERCENTILE), the same request is sent to the next
+  alternate backend. The primary runs on the caller's thread and can't be
+  interrupted, so its answer is used when it succeeds; when it fails (e.g. a
+  straggler that times out), the hedge's answer is returned without a fresh
+  failover. Only hedges use the LLM_HEDGE_WORKERS pool;
+- keeps a circuit breaker per backend: after LLM_BREAKER_FAILURE_THRESHOLD
+  consecutive failures the backend is skipped for LLM_BREAKER_RESET_SECONDS,
+  then a single trial call decides whether it is closed again;
+- fails over to the alternates (LLM_ALTERNATE_BACKENDS) when the primary fails,
+  returns an invalid completion or its breaker is open. There are none by
+  default: failover and hedging send prompts to another provider, so they
+  are opt-in.
+
+Throttling is handled by the rate limiter underneath and is not retried again.
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from app.services.llm_cache import cache_hits_on_thread
+from config.config import (
+    LLM_ALTERNATE_BACKENDS,
+    LLM_BREAKER_FAILURE_THRESHOLD,
+    LLM_BREAKER_RESET_SECONDS,
+    LLM_HEDGE_DEFAULT_DELAY,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_WORKERS,
+    LLM_HEDGING_ENABLED,
+    LLM_RETRY_ATTEMPTS,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+BEDROCK_RETRYABLE_CODES = (
+    "InternalServerException",
+    "ModelTimeoutException",
+    "ModelNotReadyException",
+    "ServiceUnavailableException",
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when every backend that could serve a call has an open breaker."""
+
+
+class InvalidCompletionError(ValueError):
+    """The backend answered, but the completion is unusable."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed LLM call is worth repeating on the same backend."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    if isinstance(error, httpx.TransportError):
+        # Timeouts, connection and protocol errors
+        return True
+    try:
+        from botocore.exceptions import ClientError
+    except ImportError:
+        return False
+    # BotoCoreError (read timeouts, connection errors) isn't retried: botocore's
+    # own retries already spent up to BEDROCK_MAX_ATTEMPTS x BEDROCK_READ_TIMEOUT
+    return (
+        isinstance(error, ClientError)
+        and error.response.get("Error", {}).get("Code") in BEDROCK_RETRYABLE_CODES
+    )
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry."""
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one backend."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the backend. Once the reset timeout has passed,
+        an open breaker lets a single trial call through.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit of {self.name} closed again")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                logger.warning(
+                    f"Circuit of {self.name} opened after {self.failures} failures"
+                )
+                self.state = self.OPEN
+                self.opened += 1
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "opened": self.opened,
+            }
+
+
+class LatencyTracker:
+    """Latencies of the last `window` successful calls to one backend."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent: float, min_samples: int = 1) -> Optional[float]:
+        """The given percentile in seconds, or None with fewer than min_samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percent / 100))
+        return samples[index]
+
+
+class ResilientCaller:
+    def __init__(
+        self,
+        retry_attempts: int = LLM_RETRY_ATTEMPTS,
+        base_delay: float = LLM_RETRY_BASE_DELAY,
+        max_delay: float = LLM_RETRY_MAX_DELAY,
+        hedging: bool = LLM_HEDGING_ENABLED,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+        hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        hedge_default_delay: float = LLM_HEDGE_DEFAULT_DELAY,
+        alternates: Optional[Dict[str, List[str]]] = None,
+        failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = LLM_BREAKER_RESET_SECONDS,
+        hedge_workers: int = LLM_HEDGE_WORKERS,
+    ):
+        """
+        Args:
+            retry_attempts: Attempts per backend, including the first one.
+            base_delay: Backoff before the first retry, doubled per retry.
+            max_delay: Cap of a single backoff.
+            hedging: Send a second request to an alternate backend when the
+                     primary is slower than its hedge_percentile latency.
+            hedge_min_samples: Latencies needed before the percentile is used.
+            hedge_default_delay: Hedge delay until then.
+            alternates: Backends to fail over / hedge to, per primary backend.
+            failure_threshold: Consecutive failures that open a breaker.
+            reset_timeout: Seconds an open breaker rejects calls.
+            hedge_workers: Threads running hedges (primaries run on the caller's
+                           thread).
+        """
+        self.retry_attempts = max(1, retry_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_default_delay = hedge_default_delay
+        self.alternates = LLM_ALTERNATE_BACKENDS if alternates is None else alternates
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_workers = hedge_workers
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def breaker(self, backend: str) -> CircuitBreaker:
+        with self._lock:
+            if backend not in self._breakers:
+                self._breakers[backend] = CircuitBreaker(
+                    backend, self.failure_threshold, self.reset_timeout
+                )
+            return self._breakers[backend]
+
+    def latency(self, backend: str) -> LatencyTracker:
+        with self._lock:
+            return self._latencies.setdefault(backend, LatencyTracker())
+
+    def hedge_delay(self, backend: str) -> float:
+        """Seconds to wait for the backend before hedging."""
+        percentile = self.latency(backend).percentile(
+            self.hedge_percentile, self.hedge_min_samples
+        )
+        return self.hedge_default_delay if percentile is None else percentile
+
+    def call(
+        self,
+        primary: str,
+        call: Callable[[str], str],
+        validate: Optional[Callable[[str], object]] = None,
+    ) -> str:
+        """
+        Runs call(backend) on the primary backend, retrying, hedging and failing
+        over as configured.
+
+        Args:
+            primary: Backend serving the request.
+            call: Callable (backend) -> completion text.
+            validate: Raises on an unusable completion; by default empty
+                      completions are rejected. Invalid completions are not
+                      retried, but the next backend is tried.
+
+        Raises:
+            CircuitOpenError: If every candidate backend's breaker is open.
+            Exception: The last backend's error when all of them failed.
+        """
+        backends = [primary] + [
+            backend
+            for backend in self.alternates.get(primary, [])
+            if backend != primary
+        ]
+        if self.hedging and len(backends) > 1:
+            return self._call_hedged(backends, call, validate)
+
+        last_error = None
+        for backend in backends:
+            if not self.breaker(backend).allow():
+                logger.info(f"Circuit of {backend} is open, skipping it")
+                continue
+            if last_error is not None:
+                self._count("failovers")
+            try:
+                return self._attempt(backend, call, validate)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"LLM call to {backend} failed: {str(e)}")
+        if last_error is None:
+            raise CircuitOpenError(f"No LLM backend available among {backends}")
+        raise last_error
+
+    def _call_hedged(self, backends, call, validate):
+        """
+        Runs the primary attempt on the caller's thread. A hedge task on the pool
+        waits until the primary has run for its hedge delay, then calls the next
+        available backend. The primary's answer is returned when it succeeds;
+        when it fails, the hedge's answer is used (it may already be there).
+        """
+        candidates = iter(backends)
+        primary = self._next_allowed(candidates)
+        if primary is None:
+            raise CircuitOpenError(f"No LLM backend available among {backends}")
+
+        primary_done = threading.Event()
+        # The delay counts from the primary's start, not from when the hedge
+        # task gets a pool thread
+        deadline = time.monotonic() + self.hedge_delay(primary)
+        hedge = self._get_executor().submit(
+            contextvars.copy_context().run,
+            self._hedge,
+            primary,
+            candidates,
+            call,
+            validate,
+            primary_done,
+            deadline,
+        )
+        try:
+            return self._attempt(primary, call, validate)
+        except Exception as e:
+            last_error = e
+            logger.warning(f"LLM call to {primary} failed: {str(e)}")
+        finally:
+            primary_done.set()
+
+        # An abandoned hedge finishes in the background and still feeds the
+        # breakers and latencies
+        try:
+            hedged = hedge.result()
+        except Exception as e:
+            last_error = e
+            logger.warning(f"Hedged LLM call failed: {str(e)}")
+        else:
+            if hedged is not None:
+                self._count("hedge_wins")
+                return hedged
+
+        # The primary failed before the hedge was due: fail over in turn
+        for backend in candidates:
+            if not self.breaker(backend).allow():
+                logger.info(f"Circuit of {backend} is open, skipping it")
+                continue
+            self._count("failovers")
+            try:
+                return self._attempt(backend, call, validate)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"LLM call to {backend} failed: {str(e)}")
+        raise last_error
+
+    def _hedge(self, primary, candidates, call, validate, primary_done, deadline):
+        """
+        Pool task: once the deadline passes with the primary still running,
+        calls the next available backend. Returns None if no hedge was sent.
+        """
+        if primary_done.wait(timeout=max(0.0, deadline - time.monotonic())):
+            return None
+        backend = self._next_allowed(candidates)
+        if backend is None:
+            return None
+        self._count("hedges")
+        logger.info(f"{primary} still running at its hedge delay, hedging to {backend}")
+        return self._attempt(backend, call, validate)
+
+    def _next_allowed(self, candidates) -> Optional[str]:
+        """Takes backends from the iterator until one's breaker allows a call."""
+        for backend in candidates:
+            if self.breaker(backend).allow():
+                return backend
+            logger.info(f"Circuit of {backend} is open, skipping it")
+        return None
+
+    def _attempt(self, backend, call, validate):
+        """Calls one backend with retries, recording its health and latency."""
+        breaker = self.breaker(backend)
+        for attempt in range(self.retry_attempts):
+            cache_hits = cache_hits_on_thread()
+            start = time.monotonic()
+            try:
+                result = call(backend)
+            except Exception as e:
+                breaker.record_failure()
+                if (
+                    attempt + 1 == self.retry_attempts
+                    or not is_retryable(e)
+                    or not breaker.allow()
+                ):
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                logger.warning(
+                    f"LLM call to {backend} failed ({str(e)}), retrying in {delay:.2f}s"
+                )
+                self._count("retries")
+                time.sleep(delay)
+                continue
+
+            # The backend is healthy even if the completion turns out unusable
+            breaker.record_success()
+            # Cached completions say nothing about the backend's latency
+            if cache_hits_on_thread() == cache_hits:
+                self.latency(backend).record(time.monotonic() - start)
+            if not result:
+                raise InvalidCompletionError(f"Empty completion from {backend}")
+            if validate is not None:
+                try:
+                    validate(result)
+                except Exception as e:
+                    raise InvalidCompletionError(
+                        f"Invalid completion from {backend}: {str(e)}"
+                    ) from e
+            return result
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.hedge_workers, thread_name_prefix="llm-hedge"
+                )
+            return self._executor
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict:
+        """Retry/hedge/failover counters plus breaker state and latency per backend."""
+        with self._lock:
+            backends = list(self._breakers)
+            counters = {
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "failovers": self.failovers,
+            }
+        return {
+            **counters,
+            "backends": {
+                backend: {
+                    **self.breaker(backend).stats(),
+                    "p50_seconds": self.latency(backend).percentile(50),
+                    "p95_seconds": self.latency(backend).percentile(95),
+                }
+                for backend in backends
+            },
+        }
+
+    def shutdown(self, wait: bool = False):
+        """Stops the hedging threads; wait=True lets abandoned calls finish first."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+@lru_cache(maxsize=1)
+def get_resilient_caller() -> ResilientCaller:
+    """The process-wide resilient caller, configured from config."""
+    return ResilientCaller()
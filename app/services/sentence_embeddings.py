@@ -1,18 +1,51 @@
+import hashlib
 import json
 import logging
 import os
 
-import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
-from config.config import OPEN_SEARCH
+from app.utils.template_loader import compute_catalog_version
+from config.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_NAME,
+    FAISS_HNSW_EF_CONSTRUCTION,
+    FAISS_HNSW_EF_SEARCH,
+    FAISS_HNSW_M,
+    FAISS_HNSW_MIN_TEMPLATES,
+    FAISS_INDEX_TYPE,
+    FAISS_IVF_MIN_TEMPLATES,
+    FAISS_IVF_NPROBE,
+    OPEN_SEARCH,
+    TEMPLATE_MATCH_MIN_MARGIN,
+)
 
 logger = logging.getLogger(__name__)
 TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
 FAISS_PATH = os.path.join(os.path.dirname(__file__), "..", "data/faiss")
 INDEX_PATH = os.path.join(FAISS_PATH, "persisted_index.index")
 METADATA_PATH = os.path.join(FAISS_PATH, "metadata.json")
+# Embeddings are L2-normalized, so inner product is cosine similarity
+INDEX_METRIC = "inner_product"
+
+# faiss and sentence_transformers are heavy to import; they are imported where
+# they are first used so importing this module stays cheap
+
+
+def load_sentence_encoder(backend=EMBEDDING_BACKEND):
+    """
+    Loads the sentence embedding model for the given backend.
+    "torch" uses SentenceTransformer; "onnx" uses the exported int8 ONNX model.
+    """
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(EMBEDDING_MODEL_NAME)
+    if backend == "onnx":
+        from app.services.onnx_encoder import OnnxSentenceEncoder
+
+        return OnnxSentenceEncoder()
+    raise ValueError(f"Unknown embedding backend: {backend}")
 
 
 class SentenceEmbeddingMatcher:
@@ -21,96 +54,430 @@ class SentenceEmbeddingMatcher:
         templates_dir=TEMPLATES_DIR,
         index_path=INDEX_PATH,
         metadata_path=METADATA_PATH,
+        backend=EMBEDDING_BACKEND,
+        encoder=None,
     ):
+        """
+        Args:
+            templates_dir: Directory of the JSON templates.
+            index_path: Where the FAISS index is persisted.
+            metadata_path: Where the index metadata is persisted.
+            backend: Encoder backend, "torch" (SentenceTransformer) or "onnx"
+                     (quantized ONNX Runtime model from EMBEDDING_ONNX_MODEL_DIR).
+            encoder: Optional object with a SentenceTransformer-compatible encode
+                     method; overrides backend.
+        """
         self.templates_dir = templates_dir
         self.index_path = index_path
         self.metadata_path = metadata_path
+        self.backend = backend
 
         # Load embedding model
-        if not OPEN_SEARCH:
-            self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        self.model = encoder
+        if self.model is None and not OPEN_SEARCH:
+            self.model = load_sentence_encoder(backend)
         self.index = None
         self.templates = []
         self.filenames = []
+        self.index_type = None
+        self.catalog_version = None
+        self._metadata_mtime = None
+        self._entries = []
+        self._position_by_id = {}
+        self._next_id = 0
 
         # Initialize by loading a persisted index if available; otherwise build it.
         if not OPEN_SEARCH:
             self._init_index()
 
     def _init_index(self):
-        """Checks for persisted index and metadata. Loads them if available; otherwise, build and save."""
-        if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
+        """
+        Loads the persisted index and brings it in line with the templates on disk.
+
+        The metadata records a content hash per template, so only templates that
+        were added, changed or removed since the index was persisted are
+        re-encoded and patched in (ID-mapped add/remove). A full rebuild is the
+        fallback when there is no usable persisted index, the index type no
+        longer fits the catalog size, or the index can't remove vectors (HNSW).
+        """
+        import faiss
+
+        current = self._scan_templates()
+        metadata = self._read_metadata()
+
+        if (
+            os.path.exists(self.index_path)
+            and metadata.get("metric") == INDEX_METRIC
+            and metadata.get("encoder") == self.encoder_id
+            and "entries" in metadata
+        ):
             # Load persisted FAISS index
             self.index = faiss.read_index(self.index_path)
-            # Load associated metadata
-            with open(self.metadata_path, "r", encoding="utf-8") as f:
-                metadata = json.load(f)
-                self.filenames = metadata.get("filenames", [])
-                self.templates = metadata.get("templates", [])
+            self.index_type = metadata.get("index_type", "flat")
+            self._configure_search(self.index)
+            self._set_entries(metadata["entries"])
+            self._next_id = metadata.get("next_id", len(self._entries))
+
+            try:
+                changed = self._patch_index(current)
+            except Exception as e:
+                logger.warning(f"Incremental FAISS update failed ({e}), rebuilding")
+                self._rebuild_index(current)
+                changed = True
         else:
-            # Build the index since persisted data doesn't exist
-            self._load_templates()
+            # Build the index since persisted data doesn't exist (or predates
+            # the inner-product metric / content hashes, or was encoded by
+            # another backend)
+            self._rebuild_index(current)
+            changed = True
 
-            # Creates dir if it doesn't exist
-            os.makedirs(FAISS_PATH, exist_ok=True)
+        if changed:
+            self._persist()
 
-            # Persist the FAISS index
-            if self.index is not None:
-                faiss.write_index(self.index, self.index_path)
-            # Save metadata (template filenames and content)
-            with open(self.metadata_path, "w", encoding="utf-8") as f:
-                json.dump({"filenames": self.filenames, "templates": self.templates}, f)
+        self._metadata_mtime = (
+            os.path.getmtime(self.metadata_path)
+            if os.path.exists(self.metadata_path)
+            else None
+        )
+        self.catalog_version = compute_catalog_version(
+            [(entry["filename"], entry["hash"]) for entry in self._entries]
+        )
 
-    def _load_templates(self):
-        """Loads JSON templates, extracts descriptions, and builds FAISS index."""
-        template_files = [
-            f for f in os.listdir(self.templates_dir) if f.endswith(".json")
-        ]
+    @property
+    def encoder_id(self):
+        """Identifies the encoder that produced the persisted vectors."""
+        return f"{self.backend}:{EMBEDDING_MODEL_NAME}"
 
-        descriptions = []
-        for filename in template_files:
+    def _scan_templates(self):
+        """
+        Reads the templates directory.
+
+        Returns:
+            dict: filename (without extension) -> (template, content hash), for
+                  every template that has a description.
+        """
+        current = {}
+        for filename in sorted(os.listdir(self.templates_dir)):
+            if not filename.endswith(".json"):
+                continue
             with open(
                 os.path.join(self.templates_dir, filename), "r", encoding="utf-8"
             ) as f:
                 template = json.load(f)
-                if "description" in template:
-                    self.templates.append(template)
-                    self.filenames.append(filename.split(".")[0])
-                    descriptions.append(template["description"])
+            if "description" in template:
+                content = json.dumps(template, sort_keys=True).encode("utf-8")
+                current[filename.split(".")[0]] = (
+                    template,
+                    hashlib.sha256(content).hexdigest(),
+                )
+        return current
+
+    def _patch_index(self, current):
+        """
+        Applies the difference between the indexed and current templates.
+        Returns True if anything changed.
+        """
+        indexed = {entry["filename"]: entry for entry in self._entries}
+        removed = [name for name in indexed if name not in current]
+        changed = [
+            name
+            for name in indexed
+            if name in current and current[name][1] != indexed[name]["hash"]
+        ]
+        added = [name for name in current if name not in indexed]
+
+        if not (removed or changed or added):
+            return False
+
+        if self._select_index_type(len(current)) != self.index_type:
+            logger.info("Catalog size calls for a different index type, rebuilding")
+            self._rebuild_index(current)
+            return True
+
+        stale = removed + changed
+        if stale and self.index_type == "hnsw":
+            logger.info("HNSW index can't remove templates, rebuilding")
+            self._rebuild_index(current)
+            return True
+
+        logger.info(
+            f"Patching FAISS index: {len(added)} added, {len(changed)} changed, "
+            f"{len(removed)} removed templates"
+        )
+        if stale:
+            stale_ids = np.array(
+                [indexed[name]["id"] for name in stale], dtype=np.int64
+            )
+            self.index.remove_ids(stale_ids)
+
+        fresh = changed + added
+        entries = [entry for entry in self._entries if entry["filename"] not in stale]
+        if fresh:
+            ids = np.arange(self._next_id, self._next_id + len(fresh), dtype=np.int64)
+            self._next_id += len(fresh)
+            embeddings = self._encode(
+                [current[name][0]["description"] for name in fresh]
+            )
+            self.index.add_with_ids(embeddings, ids)
+            for name, template_id in zip(fresh, ids):
+                template, content_hash = current[name]
+                entries.append(
+                    {
+                        "id": int(template_id),
+                        "filename": name,
+                        "hash": content_hash,
+                        "template": template,
+                    }
+                )
+
+        self._set_entries(sorted(entries, key=lambda entry: entry["filename"]))
+        return True
+
+    def _rebuild_index(self, current):
+        """Encodes every template description and builds a fresh index."""
+        self.index = None
+        self._next_id = len(current)
+        self._set_entries(
+            [
+                {"id": i, "filename": name, "hash": content_hash, "template": template}
+                for i, (name, (template, content_hash)) in enumerate(current.items())
+            ]
+        )
+        self._load_templates()
+
+    def _set_entries(self, entries):
+        """Installs the indexed entries and the derived lookup structures."""
+        self._entries = entries
+        self.filenames = [entry["filename"] for entry in entries]
+        self.templates = [entry["template"] for entry in entries]
+        self._position_by_id = {entry["id"]: i for i, entry in enumerate(entries)}
+
+    def _persist(self):
+        """
+        Writes the FAISS index and its metadata to disk, each through a temp
+        file and os.replace so concurrent workers never read a partial file.
+        A failed write (e.g. a read-only package dir on Lambda) is logged and
+        the in-memory index is kept.
+        """
+        import faiss
+
+        try:
+            # Creates dir if it doesn't exist
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+
+            # Persist the FAISS index
+            if self.index is not None:
+                tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                faiss.write_index(self.index, tmp_path)
+                os.replace(tmp_path, self.index_path)
+            # Save metadata (index type, ids, content hashes and templates)
+            tmp_path = f"{self.metadata_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "index_type": self.index_type,
+                        "metric": INDEX_METRIC,
+                        "encoder": self.encoder_id,
+                        "next_id": self._next_id,
+                        "entries": self._entries,
+                    },
+                    f,
+                )
+            os.replace(tmp_path, self.metadata_path)
+        except (OSError, RuntimeError) as e:
+            # faiss reports I/O errors as RuntimeError
+            logger.warning(
+                f"Could not persist the FAISS index ({e}), keeping it in memory"
+            )
+
+    def _read_metadata(self):
+        """Returns the persisted metadata, or an empty dict if there is none."""
+        if not os.path.exists(self.metadata_path):
+            return {}
+        with open(self.metadata_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def reload_if_changed(self):
+        """
+        Re-syncs the index when the templates or the persisted metadata changed
+        on disk. Returns True if the catalog version changed.
+        """
+        if OPEN_SEARCH:
+            return False
+
+        current_hashes = {
+            name: content_hash
+            for name, (_, content_hash) in self._scan_templates().items()
+        }
+        indexed_hashes = {entry["filename"]: entry["hash"] for entry in self._entries}
+        metadata_changed = (
+            os.path.exists(self.metadata_path)
+            and os.path.getmtime(self.metadata_path) != self._metadata_mtime
+        )
+        if current_hashes == indexed_hashes and not metadata_changed:
+            return False
+
+        logger.info("Templates or FAISS metadata changed on disk, updating the index")
+        previous_version = self.catalog_version
+        self._init_index()
+        return self.catalog_version != previous_version
+
+    def _load_templates(self):
+        """Encodes the entry descriptions and builds the FAISS index."""
+        descriptions = [template["description"] for template in self.templates]
 
         if descriptions:
-            # Convert descriptions to embeddings
-            embeddings = self.model.encode(descriptions)
+            # Convert descriptions to unit-length embeddings
+            embeddings = self._encode(descriptions)
 
             # Store embeddings in FAISS
-            embedding_dim = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(embedding_dim)
-            self.index.add(np.array(embeddings))
+            self.index_type = self._select_index_type(len(descriptions))
+            self.index = self._build_index(
+                embeddings,
+                self.index_type,
+                ids=np.array([entry["id"] for entry in self._entries], dtype=np.int64),
+            )
 
-    def match_template(self, user_request, threshold=0.40):
+    def _encode(self, texts, batch_size=64):
+        """Encodes texts into L2-normalized float32 embeddings (inner product == cosine)."""
+        embeddings = self.model.encode(
+            list(texts), batch_size=batch_size, normalize_embeddings=True
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    @staticmethod
+    def _select_index_type(catalog_size):
+        """Index type from FAISS_INDEX_TYPE, or chosen by catalog size when "auto"."""
+        if FAISS_INDEX_TYPE != "auto":
+            return FAISS_INDEX_TYPE
+        if catalog_size < FAISS_HNSW_MIN_TEMPLATES:
+            return "flat"
+        if catalog_size < FAISS_IVF_MIN_TEMPLATES:
+            return "hnsw"
+        return "ivf"
+
+    def _build_index(self, embeddings, index_type, ids):
+        """
+        Builds an inner-product FAISS index of the given type over the embeddings,
+        labelled with the given template ids.
+        """
+        import faiss
+
+        embedding_dim = embeddings.shape[1]
+        if index_type == "flat":
+            # Exact brute-force search, best up to a few thousand templates
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(embedding_dim))
+        elif index_type == "hnsw":
+            # Graph-based approximate search, no training needed
+            hnsw = faiss.IndexHNSWFlat(
+                embedding_dim, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT
+            )
+            hnsw.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+            # HNSW can't remove vectors; changed templates trigger a rebuild
+            index = faiss.IndexIDMap2(hnsw)
+        elif index_type == "ivf":
+            # Inverted lists over k-means clusters; needs a training pass.
+            # IVF stores ids natively and supports remove_ids without an id map
+            nlist = max(1, min(len(embeddings), int(4 * np.sqrt(len(embeddings)))))
+            quantizer = faiss.IndexFlatIP(embedding_dim)
+            index = faiss.IndexIVFFlat(
+                quantizer, embedding_dim, nlist, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(embeddings)
+        else:
+            raise ValueError(f"Unknown FAISS index type: {index_type}")
+
+        index.add_with_ids(embeddings, ids)
+        self._configure_search(index)
+        logger.info(f"Built {index_type} FAISS index over {index.ntotal} templates")
+        return index
+
+    @staticmethod
+    def _configure_search(index):
+        """Applies the search-time parameters of approximate index types."""
+        import faiss
+
+        if isinstance(index, faiss.IndexIDMap):
+            index = faiss.downcast_index(index.index)
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+        elif isinstance(index, faiss.IndexIVF):
+            index.nprobe = FAISS_IVF_NPROBE
+
+    def match_template(self, user_request, threshold=0.25):
         """
         Finds the best matching template based on the user request.
         Computes the embedding for the user input, queries the persisted index,
-        and returns the filename if the similarity score meets the threshold;
+        and returns the filename if the cosine similarity meets the threshold and
+        the margin over the runner-up meets TEMPLATE_MATCH_MIN_MARGIN;
         otherwise, returns "NOT_FOUND".
         """
-        if not self.index or not self.templates:
-            return "NOT_FOUND"
+        return self.match_templates([user_request], threshold)[0]
+
+    def match_templates(
+        self, user_requests, threshold=0.25, min_margin=None, batch_size=64
+    ):
+        """
+        Batched match_template: encodes all requests in one SentenceTransformer
+        call and runs a single FAISS search for the whole batch.
+        Returns one filename (or "NOT_FOUND") per request, in order.
 
-        # Encode user request
-        user_embedding = self.model.encode([user_request])
-        distances, I = self.index.search(np.array(user_embedding), 1)  # Get top match
+        The default threshold of 0.25 cosine is what the previous 1 / (1 + L2^2)
+        score threshold of 0.40 amounts to on normalized embeddings.
+        """
+        min_margin = TEMPLATE_MATCH_MIN_MARGIN if min_margin is None else min_margin
+
+        matches = []
+        for top_matches in self.search(user_requests, k=2, batch_size=batch_size):
+            if (
+                not top_matches
+                or top_matches[0]["score"] < threshold
+                or top_matches[0]["confidence"] < min_margin
+            ):
+                matches.append("NOT_FOUND")
+            else:
+                matches.append(top_matches[0]["template"])
+        return matches
 
-        best_match_idx = I[0][0]
-        best_distance = distances[0][0]  # FAISS returns squared L2 distance
+    def search(self, user_requests, k=3, batch_size=64):
+        """
+        Top-k cosine search for a batch of requests.
 
-        # Normalize distance into a similarity score (1 - min-max scaled L2)
-        similarity_score = 1 / (1 + best_distance)
+        Returns:
+            One list per request of up to k dicts, best first:
+            {"template": filename, "score": cosine similarity,
+             "confidence": margin between this score and the next one}
+            The confidence of the last (or only) hit is its own score.
+        """
+        if self.index is None or not self.templates:
+            return [[] for _ in user_requests]
+        if not user_requests:
+            return []
 
-        if similarity_score < threshold:
-            return "NOT_FOUND"
+        # Encode user requests
+        user_embeddings = self._encode(user_requests, batch_size=batch_size)
+        scores, I = self.index.search(user_embeddings, min(k, self.index.ntotal))
 
-        return self.filenames[best_match_idx]
+        results = []
+        for row_scores, row_ids in zip(scores, I):
+            # FAISS pads with -1 when fewer than k neighbours are found
+            hits = [
+                (self.filenames[self._position_by_id[template_id]], float(score))
+                for template_id, score in zip(row_ids, row_scores)
+                if template_id >= 0
+            ]
+            results.append(
+                [
+                    {
+                        "template": filename,
+                        "score": score,
+                        "confidence": score
+                        - (hits[i + 1][1] if i + 1 < len(hits) else 0.0),
+                    }
+                    for i, (filename, score) in enumerate(hits)
+                ]
+            )
+        return results
 
 
 # Example usage
@@ -0,0 +1,100 @@
+# app/services/stream_generation.py
+"""
+Row streaming for the /api/generate/stream endpoint.
+
+open_generation_stream selects the template up front (so a bad request fails
+before any bytes are sent) and returns a GenerationStream. Iterating it yields
+rows as the selected engine produces them; once the rows run out, the whole
+dataset is saved like the non-streaming flow would save it (S3 or local).
+"""
+
+import logging
+import time
+from typing import Callable, Dict, Iterator, Optional
+
+import pandas as pd
+
+from app.models.request import GenerateRequest, OutputFormat
+from app.services.llm_service import LLMService
+from app.services.local_generator import save_generated_dataframe, stream_locally
+from app.services.model_registry import ModelRegistry
+from app.services.preprocess_input import (
+    TRANSCRIPT_TEMPLATES,
+    build_generation_prompt,
+    generation_engine,
+    select_template,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationStream:
+    """
+    Iterable of generated rows (dicts). After the last row has been yielded, the
+    rows are saved and `location` holds the local path or S3 URL of the file.
+    """
+
+    def __init__(
+        self,
+        template_name: str,
+        rows: Iterator[Dict],
+        save: Callable[[pd.DataFrame], str],
+    ):
+        self.template_name = template_name
+        self.location: Optional[str] = None
+        self.rows = 0
+        self._rows = rows
+        self._save = save
+
+    def __iter__(self) -> Iterator[Dict]:
+        start = time.perf_counter()
+        collected = []
+        for row in self._rows:
+            collected.append(row)
+            self.rows += 1
+            yield row
+
+        self.location = self._save(pd.DataFrame(collected))
+        logger.info(
+            f"{self.rows} rows streamed for '{self.template_name}' in "
+            f"{time.perf_counter() - start:.2f}s, saved to {self.location}"
+        )
+
+
+def open_generation_stream(
+    request: GenerateRequest, registry: Optional[ModelRegistry] = None
+) -> GenerationStream:
+    """
+    Selects the template for the request and prepares its row stream.
+
+    Raises:
+        LookupError: If no template matches the prompt.
+        ValueError: For call transcript templates (free text, not rows) and
+                    unknown engines.
+    """
+    template_name, selected_template, error = select_template(request.prompt, registry)
+    if error:
+        raise LookupError(error)
+    if template_name in TRANSCRIPT_TEMPLATES:
+        raise ValueError("Call transcripts can't be streamed as rows")
+
+    if generation_engine(request) == "local":
+        parameters = request.parameters or {}
+        rows = stream_locally(
+            selected_template, request.volume, seed=parameters.get("seed")
+        )
+        return GenerationStream(template_name, rows, save_generated_dataframe)
+
+    # Rows are parsed from CSV whatever format the response is encoded in
+    rows = LLMService.stream_generated_rows(
+        lambda rows, batch_index: build_generation_prompt(
+            selected_template,
+            request.prompt,
+            OutputFormat.CSV,
+            rows,
+            batch_index,
+        ),
+        request.volume,
+        selected_template.get("fields"),
+    )
+    return GenerationStream(template_name, rows, LLMService._save_dataframe)
@@ -0,0 +1,166 @@
+# app/services/template_candidate_index.py
+import logging
+import string
+from typing import Dict, List
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from app.utils.template_loader import compute_catalog_version
+
+logger = logging.getLogger(__name__)
+
+
+# Character buckets for the count-based prefilter; anything else shares the last bucket
+_ALPHABET = {ch: i for i, ch in enumerate(string.ascii_lowercase + string.digits + " ")}
+_OTHER_BUCKET = len(_ALPHABET)
+
+
+def _char_counts(text: str) -> np.ndarray:
+    counts = np.zeros(_OTHER_BUCKET + 1, dtype=np.uint16)
+    for ch in text:
+        counts[_ALPHABET.get(ch, _OTHER_BUCKET)] += 1
+    return counts
+
+
+def _sort_tokens(text: str) -> str:
+    """The token_sort_ratio preprocessing: whitespace tokens, sorted, re-joined."""
+    return " ".join(sorted(text.split()))
+
+
+class TemplateCandidateIndex:
+    """
+    Precomputed fuzzy-matching index over the template mapping phrases.
+
+    Built once per catalog version: the candidate phrases are deduplicated and
+    token-sorted up front (so scoring with fuzz.ratio is equivalent to
+    fuzz.token_sort_ratio on the raw strings), and a candidate -> template dict
+    replaces the linear scan over the mappings to resolve the winner.
+
+    Before exact scoring, a character-count bound prunes the candidates:
+    fuzz.ratio is 200 * LCS / (len1 + len2) and the LCS can't exceed the sum of
+    per-character minimum counts, so any candidate whose bound is below the
+    threshold can be skipped without computing its edit distance.
+    """
+
+    def __init__(self, template_mappings: Dict[str, List[str]]):
+        """
+        Args:
+            template_mappings: Mapping of template name -> list of mapping phrases.
+        """
+        self.version = compute_catalog_version(template_mappings)
+
+        # First template listing a phrase wins, as with the old linear scan
+        self.candidate_to_template: Dict[str, str] = {}
+        for key, value_list in template_mappings.items():
+            for desc in value_list:
+                self.candidate_to_template.setdefault(desc, key)
+
+        self.candidates = list(self.candidate_to_template)
+        self.processed_candidates = [_sort_tokens(desc) for desc in self.candidates]
+
+        # One row per character bucket so a query only touches the rows of the
+        # characters it contains
+        self._lengths = np.array(
+            [len(desc) for desc in self.processed_candidates], dtype=np.float64
+        )
+        self._char_count_rows = (
+            np.stack([_char_counts(desc) for desc in self.processed_candidates], axis=1)
+            if self.candidates
+            else np.zeros((_OTHER_BUCKET + 1, 0), dtype=np.uint16)
+        )
+        logger.info(
+            f"Built template candidate index with {len(self.candidates)} phrases "
+            f"(catalog version {self.version})"
+        )
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def match(self, query: str, threshold: float = 85.0) -> str:
+        """
+        Returns the template whose mapping phrase best matches the query, or
+        "NOT_FOUND" when no phrase scores at least the threshold.
+        """
+        return self.match_many([query], threshold)[0]
+
+    def match_many(self, queries: List[str], threshold: float = 85.0) -> List[str]:
+        """
+        Batched match: scores all queries against all candidates in one
+        process.cdist call, with score_cutoff skipping low scores early.
+        """
+        if not self.candidates:
+            return ["NOT_FOUND"] * len(queries)
+        if not queries:
+            return []
+
+        processed_queries = [_sort_tokens(query) for query in queries]
+
+        # Union of the candidates that pass the bound for at least one query,
+        # kept in catalog order so argmax ties resolve like extractOne
+        survivors = np.flatnonzero(
+            np.logical_or.reduce(
+                [self._upper_bounds(query) >= threshold for query in processed_queries]
+            )
+        )
+        if not len(survivors):
+            return ["NOT_FOUND"] * len(queries)
+
+        scores = process.cdist(
+            processed_queries,
+            [self.processed_candidates[i] for i in survivors],
+            scorer=fuzz.ratio,
+            score_cutoff=threshold,
+            workers=-1 if len(queries) > 1 else 1,
+        )
+        best_indices = scores.argmax(axis=1)
+
+        matches = []
+        for row, best_index in enumerate(best_indices):
+            score = scores[row, best_index]
+            if score > 0 and score >= threshold:
+                candidate = self.candidates[survivors[best_index]]
+                matches.append(self.candidate_to_template[candidate])
+            else:
+                matches.append("NOT_FOUND")
+        return matches
+
+    def _upper_bounds(self, processed_query: str) -> np.ndarray:
+        """Upper bound of fuzz.ratio between the query and every candidate."""
+        query_counts = _char_counts(processed_query)
+        common = np.zeros(len(self.candidates), dtype=np.float64)
+        for bucket in np.flatnonzero(query_counts):
+            common += np.minimum(self._char_count_rows[bucket], query_counts[bucket])
+        # Small epsilon so float rounding never prunes a candidate at the threshold
+        return 200.0 * common / (self._lengths + len(processed_query)) + 1e-9
+
+
+# Benchmark with a synthetic catalog of tens of thousands of phrases
+if __name__ == "__main__":
+    import random
+    import time
+
+    from app.utils.template_loader import _load_template_mappings_from_local
+
+    mappings = _load_template_mappings_from_local()
+    rng = random.Random(0)
+    for i in range(2000):
+        mappings[f"tenant_schema_{i}"] = [
+            " ".join(
+                "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+                for _ in range(rng.randint(2, 4))
+            )
+            for _ in range(10)
+        ]
+
+    index = TemplateCandidateIndex(mappings)
+    queries = ["tax free saving account", "dental insurance", "pension income fund"]
+
+    number = 200
+    start = time.perf_counter()
+    for _ in range(number):
+        for query in queries:
+            index.match(query)
+    per_query_ms = (time.perf_counter() - start) / (number * len(queries)) * 1000
+    print(f"{len(index)} candidates: {per_query_ms:.3f} ms/query")
+    print({query: index.match(query) for query in queries})
@@ -34,7 +34,8 @@ def main(content, format=DEFAULT_FORMAT):
     epic_prompt = epic_generator.generate_prompt()
 
     # Sending a request to the model based on the model_used argument
-    llm_response = LLMService.call_llm_api(epic_prompt)
+    # Generated rows repeating the uploaded data are dropped
+    llm_response = LLMService.call_llm_api(epic_prompt, seed_rows=epic_generator.df)
     return 200, llm_response
 
 
@@ -0,0 +1,79 @@
+# app/utils/phrase_matcher.py
+import logging
+import re
+from functools import lru_cache
+from typing import Iterable, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=8)
+def compile_phrase_pattern(phrases: Tuple[str, ...]) -> Pattern:
+    """
+    Compile a list of phrases into a single word-bounded alternation.
+
+    Alternatives are ordered longest first so that, at any position, a
+    multi-word phrase ("mock data") wins over the single word it contains
+    ("data"). The pattern is cached per phrase tuple, so it is compiled once at
+    startup and rebuilt automatically when the configured phrases change.
+
+    Args:
+        phrases: Phrases to match (must be hashable, hence a tuple).
+
+    Returns:
+        Pattern: Compiled regex matching any of the phrases at word boundaries.
+    """
+    alternatives = sorted(set(phrases), key=len, reverse=True)
+    logger.debug(f"Compiling phrase pattern for {len(alternatives)} phrases")
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, alternatives)) + r")\b")
+
+
+def remove_phrases(text: str, phrases: Iterable[str]) -> str:
+    """
+    Remove all phrases from the text in a single pass and collapse the
+    whitespace left behind.
+
+    Args:
+        text: Text to clean.
+        phrases: Phrases to remove.
+
+    Returns:
+        str: The cleaned, stripped text.
+    """
+    pattern = compile_phrase_pattern(tuple(phrases))
+    text = pattern.sub("", text)
+
+    # Clean up any double spaces that might result from removals
+    return _WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+# Micro-benchmark against the previous per-phrase re.sub loop
+if __name__ == "__main__":
+    import timeit
+
+    from config.config import FILLER_PHRASES
+
+    def remove_phrases_loop(text, phrases):
+        for phrase in phrases:
+            text = re.sub(r"\b" + re.escape(phrase) + r"\b", "", text)
+        text = re.sub(r"\s+", " ", text)
+        return text.strip()
+
+    samples = [
+        "mock data tfsa",
+        "synthetic records dental insurances",
+        "generate synthetic data registered retirement savings plans",
+        "need synthetic data critical illness plan",
+        "create mock data first time home buyer savings account",
+    ]
+    number = 20000
+
+    for name, func in (("loop", remove_phrases_loop), ("compiled", remove_phrases)):
+        seconds = timeit.timeit(
+            lambda: [func(sample, FILLER_PHRASES) for sample in samples],
+            number=number,
+        )
+        per_call_us = seconds / (number * len(samples)) * 1e6
+        print(f"{name:>8}: {per_call_us:.2f} us/call")
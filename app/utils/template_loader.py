@@ -1,11 +1,9 @@
 # app/utils/template_loader.py
+import hashlib
 import json
 import logging
 import os
 
-import boto3
-from botocore.exceptions import ClientError
-
 from config.config import (
     AWS_PROFILE,
     OPEN_SEARCH,
@@ -61,6 +59,9 @@ def _get_template_from_s3(template_name: str):
         >>> get_template_from_s3("tax_free_savings")
         {'template_name': 'tax_free_savings', 'mappings': [...]}
     """
+    import boto3
+    from botocore.exceptions import ClientError
+
     # Explicitly set the AWS profile
     session = boto3.Session(profile_name=AWS_PROFILE)
     s3_client = session.client("s3")
@@ -112,6 +113,15 @@ def load_template_mappings():
         return _load_template_mappings_from_s3()
 
 
+def compute_catalog_version(template_mappings) -> str:
+    """
+    Returns a short content hash identifying a version of the template mappings.
+    Any added, removed or edited mapping phrase yields a new version.
+    """
+    payload = json.dumps(template_mappings, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()[:12]
+
+
 def _load_template_mappings_from_local():
     """
     Dynamically loads all templates from the /templates directory
@@ -142,6 +152,8 @@ def _load_template_mappings_from_s3():
     - Key = template_name
     - Value = mappings
     """
+    import boto3
+
     # Explicitly set the AWS profile
     session = boto3.Session(profile_name=AWS_PROFILE)
     s3_client = session.client("s3")
@@ -2,9 +2,9 @@ import logging
 import os
 import uuid
 from datetime import datetime
+from functools import lru_cache
 from io import StringIO
 
-import boto3
 import pandas as pd
 
 from config.config import (
@@ -17,8 +17,18 @@ from config.config import (
 )
 
 logger = logging.getLogger(__name__)
-session = boto3.Session(profile_name=AWS_PROFILE)
-s3 = session.client("s3")
+
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """
+    Returns the shared S3 client, creating it on first use so that importing
+    this module doesn't pay for boto3 (or need AWS credentials).
+    """
+    import boto3
+
+    session = boto3.Session(profile_name=AWS_PROFILE)
+    return session.client("s3")
 
 
 def generate_filename(file_extension=".csv"):
@@ -31,6 +41,7 @@ def save_dataframe_to_s3(df, bucket_name, prefix="output/", generate_url=True):
 
     s3_key = f"{prefix}{generate_filename()}"
 
+    s3 = get_s3_client()
     s3.put_object(Bucket=bucket_name, Key=s3_key, Body=csv_buffer.getvalue())
 
     if generate_url:
@@ -113,6 +124,7 @@ async def save_uploaded_data_to_s3(
     file_key = f"{prefix}/{new_file_name}"
 
     # Upload directly to S3
+    s3 = get_s3_client()
     s3.put_object(
         Bucket=bucket_name, Key=file_key, Body=content, ContentType=file.content_type
     )
@@ -154,9 +166,7 @@ def save_text_to_s3(text, bucket_name, prefix="output/"):
     file_name = generate_filename("_transcript.txt")
     s3_key = f"{prefix}{file_name}"
 
-    # Create an S3 client
-    session = boto3.Session(profile_name=AWS_PROFILE)
-    s3 = session.client("s3")
+    s3 = get_s3_client()
 
     # Upload the text as a file to S3
     s3.put_object(Bucket=bucket_name, Key=s3_key, Body=text)
@@ -55,6 +55,142 @@ FILLER_PHRASES = [
     "generate",
 ]
 
+# Template-match cache: (normalized prompt, catalog version) -> template
+TEMPLATE_CACHE_SIZE = 4096
+TEMPLATE_CACHE_TTL_SECONDS = 3600
+# How often the template mappings and FAISS metadata are checked for changes
+TEMPLATE_CATALOG_REFRESH_SECONDS = 300
+
+# Sentence embedding model. EMBEDDING_BACKEND is "torch" (SentenceTransformer)
+# or "onnx" (int8 quantized ONNX Runtime export, loaded from a local directory;
+# create it with: python -m app.services.onnx_encoder export)
+EMBEDDING_BACKEND = "torch"
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_ONNX_MODEL_DIR = "app/data/onnx/all-MiniLM-L6-v2"
+EMBEDDING_ONNX_MODEL_FILE = "model_quantized.onnx"
+EMBEDDING_ONNX_MAX_LENGTH = 256
+EMBEDDING_ONNX_THREADS = 0  # 0 lets ONNX Runtime decide
+
+# Template embedding index (cosine similarity over normalized embeddings).
+# FAISS_INDEX_TYPE is "flat", "hnsw", "ivf" or "auto" (chosen by catalog size)
+FAISS_INDEX_TYPE = "auto"
+FAISS_HNSW_MIN_TEMPLATES = 10000
+FAISS_IVF_MIN_TEMPLATES = 500000
+FAISS_HNSW_M = 32
+FAISS_HNSW_EF_CONSTRUCTION = 200
+FAISS_HNSW_EF_SEARCH = 64
+FAISS_IVF_NPROBE = 16
+# Minimum cosine margin between the best and second-best template (0 disables)
+TEMPLATE_MATCH_MIN_MARGIN = 0.0
+
+# Generation engine: "llm" sends the whole schema to the LLM, "local" generates
+# rows with the vectorized local generator and only asks the LLM for example
+# values of free-text fields. Overridable per request with parameters["engine"]
+DEFAULT_GENERATION_ENGINE = "llm"
+LOCAL_GENERATOR_TEXT_POOL_SIZE = 50
+LOCAL_GENERATOR_NUMBER_RANGE = (0, 100000)
+LOCAL_GENERATOR_INTEGER_RANGE = (0, 100)
+LOCAL_GENERATOR_DATE_RANGE = ("1950-01-01", "2025-12-31")
+# Rows generated per chunk when the local engine streams its output
+LOCAL_GENERATOR_STREAM_CHUNK_SIZE = 1000
+
+# Large volumes are split into LLM batches sized to the output token budget and
+# sent concurrently (see LLMService.generate_rows)
+LLM_MAX_OUTPUT_TOKENS = 3000
+LLM_TOKENS_PER_FIELD = 10  # Rough CSV cost of one value, including separators
+LLM_MAX_ROWS_PER_BATCH = 50
+LLM_MAX_CONCURRENT_BATCHES = 4
+LLM_MAX_BATCH_ROUNDS = 3  # Extra rounds to top up rows lost to failures/duplicates
+# Streamed rows queued while the previous ones were checked are deduplicated
+# together, up to this many
+LLM_STREAM_MICRO_BATCH_ROWS = 256
+
+# Shared HTTP client for the Groq / OpenAI-compatible backends (seconds).
+# HTTP/2 is used when enabled and the optional h2 package is installed
+HTTP2_ENABLED = True
+HTTP_CONNECT_TIMEOUT = 5.0
+HTTP_READ_TIMEOUT = 120.0
+HTTP_WRITE_TIMEOUT = 30.0
+HTTP_POOL_TIMEOUT = 10.0
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY = 30.0
+
+# Background generation jobs (/api/jobs). JOB_STORE_BACKEND is "memory" (per
+# process) or "sqlite" (shared by the workers of one host)
+JOB_STORE_BACKEND = "memory"
+JOB_STORE_SQLITE_PATH = "app/data/jobs.sqlite3"
+JOB_STORE_MAX_JOBS = 10000  # Oldest finished jobs are dropped beyond this
+# Jobs run on their backend's bulkhead (PIPELINE_MAX_WORKERS); at most this
+# many may be queued or running per process, beyond that POST /api/jobs is a 503
+JOB_MAX_PENDING = 64
+
+# Bulkheads: the blocking generation pipeline behind the async endpoints runs on
+# a bounded thread pool per LLM backend, so a slow backend can only exhaust its
+# own threads. Requests beyond max workers + max queue get a 503
+PIPELINE_MAX_WORKERS = {"bedrock": 8, "groq": 8}
+PIPELINE_MAX_QUEUE = {"bedrock": 32, "groq": 32}
+PIPELINE_RETRY_AFTER_SECONDS = 5
+# A streamed response holds its bulkhead slot until the last row; the worker
+# runs at most this many encoded chunks ahead of the client
+PIPELINE_STREAM_BUFFER_CHUNKS = 64
+
+# Content-addressed LLM response cache (opt-in, see app/services/llm_cache.py).
+# parameters["cache"] = False bypasses it for one request
+LLM_CACHE_ENABLED = False
+LLM_CACHE_TTL_SECONDS = 24 * 3600
+LLM_CACHE_MEMORY_SIZE = 256  # Entries
+LLM_CACHE_DIR = "app/data/llm_cache"  # None keeps the cache in memory only
+LLM_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024
+
+# Client-side rate limiting per LLM provider/model (see app/services/rate_limiter.py).
+# A token bucket caps the request rate; the number of concurrent calls starts at
+# initial_concurrency, grows by one per window of successes up to max_concurrency
+# and is halved on every 429 / ThrottlingException
+RATE_LIMITS = {
+    "groq": {
+        "requests_per_minute": 30,
+        "burst": 5,
+        "initial_concurrency": 4,
+        "max_concurrency": 16,
+    },
+    "bedrock": {
+        "requests_per_minute": 100,
+        "burst": 10,
+        "initial_concurrency": 4,
+        "max_concurrency": 32,
+    },
+}
+RATE_LIMIT_MAX_THROTTLE_RETRIES = 5
+RATE_LIMIT_DEFAULT_RETRY_AFTER = 2.0  # Seconds, when the provider doesn't say
+
+# Retries, hedging and circuit breaking of LLM calls (see app/services/resilience.py).
+# Retryable errors are retried with exponential backoff; with hedging on, a call
+# slower than the backend's LLM_HEDGE_PERCENTILE latency is also sent to the
+# first alternate backend, whose answer is used if the primary fails. A backend failing
+# LLM_BREAKER_FAILURE_THRESHOLD times in a row is skipped for a while
+LLM_RETRY_ATTEMPTS = 3  # Per backend, including the first call
+LLM_RETRY_BASE_DELAY = 0.5  # Seconds, doubled per retry (with full jitter)
+LLM_RETRY_MAX_DELAY = 8.0
+LLM_HEDGING_ENABLED = False
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_MIN_SAMPLES = 20  # Latencies needed before the percentile is trusted
+LLM_HEDGE_DEFAULT_DELAY = 20.0  # Seconds, until then
+LLM_HEDGE_WORKERS = 16
+# Backends to fail over / hedge to, per primary backend. Opt-in: a prompt is
+# then sent to another provider when the primary fails, returns an invalid
+# completion or is slow, e.g. {"bedrock": ["groq"]}
+LLM_ALTERNATE_BACKENDS = {}
+LLM_BREAKER_FAILURE_THRESHOLD = 5
+LLM_BREAKER_RESET_SECONDS = 30.0
+
+# Duplicate suppression across batches and sample data (see
+# app/services/deduplicator.py). Fingerprints are exact (8 bytes per row) up to
+# DEDUP_MAX_EXACT_FINGERPRINTS, then a Bloom filter bounds memory
+DEDUP_MAX_EXACT_FINGERPRINTS = 5_000_000
+DEDUP_BLOOM_CAPACITY = 20_000_000
+DEDUP_BLOOM_FALSE_POSITIVE_RATE = 0.001  # About 36 MB at capacity
+
 # LLM configuration for local deployment
 LLM_LOCAL_URL = "http://10.111.30.94:1234/v1/completions"
 
@@ -63,6 +199,14 @@ LLM_LOCAL_URL = "http://10.111.30.94:1234/v1/completions"
 LLM_BEDROCK_MODEL_ID = "anthropic.claude-v2:1"
 LLM_BEDROCK_ENDPOINT = "https://bedrock.endpoint.url"
 
+# Shared Bedrock runtime clients (see app/services/bedrock_client.py)
+BEDROCK_MAX_POOL_CONNECTIONS = 50
+BEDROCK_RETRY_MODE = "adaptive"
+BEDROCK_MAX_ATTEMPTS = 5
+BEDROCK_CONNECT_TIMEOUT = 5
+BEDROCK_READ_TIMEOUT = 120
+BEDROCK_ENDPOINT_URL = None  # e.g. a VPC endpoint; None uses the regional default
+
 # AWS KEYS
 REGION_NAME = "us-east-1"
 AWS_PROFILE = "DavidAbad"
@@ -0,0 +1,105 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class StubServer:
+    """
+    Local keep-alive HTTP server standing in for an LLM provider. respond(body)
+    gets each POSTed JSON body and returns (status, payload, headers): a dict
+    payload is sent as JSON, an iterable of str is streamed piece by piece with
+    chunked transfer encoding.
+    """
+
+    def __init__(self, respond):
+        self.requests = []
+        self.connections = set()
+        lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with lock:
+                    server.requests.append(body)
+                    server.connections.add(self.client_address)
+                status, payload, headers = respond(body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if isinstance(payload, dict):
+                    data = json.dumps(payload).encode()
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for piece in payload:
+                    data = piece.encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """Starts StubServers on demand and shuts them down after the test."""
+    started = []
+
+    def start(respond):
+        server = StubServer(respond)
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.shutdown()
+
+
+@pytest.fixture
+def fake_nlp():
+    """
+    Blank English pipeline with a stand-in parser, so template selection runs
+    without en_core_web_sm. Every token is a noun chained into one noun chunk,
+    and lemmas drop a plural "s".
+    """
+    spacy = pytest.importorskip("spacy")
+    from spacy.language import Language
+
+    if "chain_parser" not in Language.factories:
+
+        @Language.component("chain_parser")
+        def chain_parser(doc):
+            for token in doc:
+                token.pos_ = "NOUN"
+                plural = len(token.text) > 3 and token.text.endswith("s")
+                token.lemma_ = token.text[:-1] if plural else token.text
+            for token in doc[:-1]:
+                token.head = doc[token.i + 1]
+                token.dep_ = "compound"
+            if len(doc):
+                doc[-1].head = doc[-1]
+                doc[-1].dep_ = "ROOT"
+            return doc
+
+    nlp = spacy.blank("en")
+    nlp.add_pipe("chain_parser")
+    return nlp
@@ -0,0 +1,48 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("boto3")
+
+from app.services.bedrock_client import (  # noqa: E402
+    clear_bedrock_clients,
+    get_bedrock_client,
+)
+
+
+def upper_completion(body):
+    return 200, {"completion": body["prompt"].upper()}, {}
+
+
+@pytest.fixture
+def endpoint(monkeypatch, stub_server):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "stub")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "stub")
+    yield stub_server(upper_completion).url
+    clear_bedrock_clients()
+
+
+def test_clients_are_cached_per_profile_and_region(endpoint):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(
+            executor.map(
+                lambda _: get_bedrock_client(None, "us-east-1", endpoint), range(32)
+            )
+        )
+    assert all(client is clients[0] for client in clients)
+    assert get_bedrock_client(None, "us-west-2", endpoint) is not clients[0]
+    assert clients[0].meta.config.max_pool_connections >= 8
+    assert clients[0].meta.config.retries["mode"] == "adaptive"
+
+
+def test_shared_client_serves_concurrent_calls(endpoint):
+    def invoke(i):
+        client = get_bedrock_client(None, "us-east-1", endpoint)
+        response = client.invoke_model(
+            modelId="stub-model", body=json.dumps({"prompt": f"row {i}"})
+        )
+        return json.loads(response["body"].read())["completion"]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(invoke, range(40))) == [f"ROW {i}" for i in range(40)]
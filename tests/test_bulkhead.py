@@ -0,0 +1,143 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.context.request_context import selected_model_ctx
+from app.endpoints import generate
+from app.main_fastapi import app
+from app.services import bulkhead, stream_generation
+from app.services.bulkhead import Bulkhead, BulkheadFullError
+from app.services.llm_service import LLMService
+
+BODY = {"output_format": "csv", "prompt": "car insurance claims", "volume": 5}
+
+
+@pytest.fixture
+def bulkheads(monkeypatch):
+    """One worker and no queue per backend."""
+    heads = {name: Bulkhead(name, 1, 0) for name in ("bedrock", "groq")}
+    monkeypatch.setattr(bulkhead, "_bulkheads", heads)
+    yield heads
+    for head in heads.values():
+        head.shutdown(wait=True)
+
+
+def test_bulkhead_bounds_workers_and_queue():
+    head = Bulkhead("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        running = head.submit(release.wait, 5)
+        queued = head.submit(lambda: "done")
+        with pytest.raises(BulkheadFullError):
+            head.submit(lambda: "rejected")
+        assert head.stats()["active"] + head.stats()["queued"] == 2
+        assert head.stats()["rejected"] == 1
+
+        release.set()
+        assert running.result(timeout=5) is True
+        assert queued.result(timeout=5) == "done"
+        stats = head.stats()
+        assert (stats["active"], stats["queued"], stats["completed"]) == (0, 0, 2)
+    finally:
+        release.set()
+        head.shutdown(wait=True)
+
+
+def test_cancelled_queued_call_frees_its_slot():
+    head = Bulkhead("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        head.submit(release.wait, 5)
+        assert head.submit(lambda: None).cancel()
+        assert head.stats()["queued"] == 0
+        head.submit(lambda: None)  # The queue slot is free again
+    finally:
+        release.set()
+        head.shutdown(wait=True)
+
+
+def test_run_propagates_context():
+    head = Bulkhead("test", max_workers=2, max_queue=0)
+
+    async def main():
+        selected_model_ctx.set("llama3-70b-8192")
+        return await head.run(selected_model_ctx.get)
+
+    try:
+        assert asyncio.run(main()) == "llama3-70b-8192"
+    finally:
+        head.shutdown(wait=True)
+
+
+def test_saturated_backend_does_not_starve_the_other(monkeypatch, bulkheads):
+    def lambda_handler(request, content, event=""):
+        body = {"url": f"s3://bucket/{selected_model_ctx.get()}.csv"}
+        return {"statusCode": 200, "body": json.dumps(body)}
+
+    monkeypatch.setattr(generate, "lambda_handler", lambda_handler)
+    release = threading.Event()
+    bulkheads["bedrock"].submit(release.wait, 5)  # A slow Bedrock call
+    client = TestClient(app)
+    try:
+        response = client.post(
+            "/api/generate",
+            json={**BODY, "parameters": {"selectedModel": "claude-2.1"}},
+        )
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+
+        response = client.post(
+            "/api/generate",
+            json={**BODY, "parameters": {"selectedModel": "llama3-70b-8192"}},
+        )
+        assert response.status_code == 200
+        assert response.json()["data"]["url"] == "s3://bucket/llama3-70b-8192.csv"
+
+        stats = client.get("/api/health/pipeline").json()["backends"]
+        assert stats["bedrock"]["active"] == 1
+        assert stats["bedrock"]["rejected"] == 1
+        assert stats["groq"]["completed"] == 1
+    finally:
+        release.set()
+
+
+def test_streamed_rows_are_produced_on_the_backend_bulkhead(monkeypatch, bulkheads):
+    template = {"fields": {"ClaimID": {"datatype": "string"}}}
+    monkeypatch.setattr(
+        stream_generation,
+        "select_template",
+        lambda prompt, registry=None: ("claims", template, None),
+    )
+    monkeypatch.setattr(LLMService, "_save_dataframe", staticmethod(lambda df: "-"))
+    producers = []
+
+    def stream_generated_rows(build_prompt, volume, fields, max_tokens=None):
+        for i in range(volume):
+            producers.append(threading.current_thread().name)
+            # The stream holds the backend's only slot until its last row
+            with pytest.raises(BulkheadFullError):
+                bulkheads["groq"].submit(lambda: None)
+            yield {"ClaimID": f"CLM-{i}"}
+
+    monkeypatch.setattr(
+        LLMService, "stream_generated_rows", staticmethod(stream_generated_rows)
+    )
+    response = TestClient(app).post(
+        "/api/generate/stream",
+        json={**BODY, "parameters": {"selectedModel": "llama3-70b-8192"}},
+    )
+
+    assert response.status_code == 200
+    assert response.text.splitlines() == ["ClaimID"] + [f"CLM-{i}" for i in range(5)]
+    assert len(producers) == 5
+    assert all(name.startswith("groq-pipeline") for name in producers)
+    # The worker frees its slot just after handing over the last line
+    deadline = time.monotonic() + 5
+    while bulkheads["groq"].stats()["active"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = bulkheads["groq"].stats()
+    assert (stats["active"], stats["completed"], stats["rejected"]) == (0, 1, 5)
@@ -0,0 +1,82 @@
+import csv
+import io
+import random
+
+import pytest
+
+from app.services.csv_parser import CsvParser, IncrementalCsvParser, scan_csv_blocks
+
+CLAIMS = "ClaimID,Amount\nCLM-1,100\nCLM-2,250\n"
+EXAMPLE = "id,code\n1,`x`\n2,``y``\n"
+
+RESPONSES = {
+    "fenced with a tag": f"Sure:\n```csv\n{CLAIMS}```\nAnything else?",
+    "fenced without a tag": f"```\n{CLAIMS}```",
+    "fenced on one line": "```ClaimID,Amount\nCLM-1,100\nCLM-2,250```",
+    "single backticks": f"`{CLAIMS}`",
+    "after an inline span": f"Use `ClaimID` as the key.\n`{CLAIMS}`",
+    "bare": f"Sure, here are the claims:\n{CLAIMS}\nLet me know.",
+    "truncated": f"```csv\n{CLAIMS}",
+    "after an example": f"Format:\n```csv\n{EXAMPLE}```\nData:\n```csv\n{CLAIMS}```",
+}
+
+
+def _rows(text):
+    return [row for row in csv.reader(io.StringIO(text.strip()))]
+
+
+@pytest.mark.parametrize("name", RESPONSES)
+def test_finds_the_csv_block(name):
+    data = CsvParser.parse_csv_response(RESPONSES[name], ["ClaimID", "Amount"])
+    assert _rows(data) == _rows(CLAIMS)
+
+
+def test_backticks_inside_a_fenced_block_are_data():
+    blocks = scan_csv_blocks(f"```csv\n{EXAMPLE}```")
+    assert [block.kind for block in blocks] == ["fenced"]
+    assert _rows(blocks[0].text)[1:] == [["1", "`x`"], ["2", "``y``"]]
+
+
+def test_without_expected_columns_the_largest_table_wins():
+    response = f"```\n{EXAMPLE}```\n`a,b`\n```\n{CLAIMS}CLM-3,9\n```"
+    assert _rows(CsvParser.parse_csv_response(response))[0] == ["ClaimID", "Amount"]
+    # Header matches outrank size
+    expected = CsvParser.parse_csv_response(response, ["id", "code"])
+    assert _rows(expected)[0] == ["id", "code"]
+
+
+def test_no_csv_fails():
+    with pytest.raises(ValueError):
+        CsvParser.parse_csv_response("I can't help with that.")
+
+
+def _stream(text, expected_columns=None, seed=0):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, 30)))
+    parser = IncrementalCsvParser(expected_columns)
+    rows = []
+    for i, j in zip([0] + cuts, cuts + [len(text)]):
+        rows += parser.feed(text[i:j])
+    rows += parser.close()
+    return [parser.header] + rows
+
+
+@pytest.mark.parametrize("name", RESPONSES)
+def test_incremental_parser_agrees_with_the_scanner(name):
+    for seed in range(20):
+        rows = _stream(RESPONSES[name], ["ClaimID", "Amount"], seed)
+        assert rows == _rows(CLAIMS)
+
+
+def test_incremental_parser_skips_blocks_without_records():
+    # Without expected columns only the record-less inline span is skipped
+    assert _stream(RESPONSES["after an inline span"]) == _rows(CLAIMS)
+    assert _stream(RESPONSES["after an example"]) == _rows(EXAMPLE)
+
+
+def test_bare_rows_stream_before_the_response_ends():
+    parser = IncrementalCsvParser(["ClaimID", "Amount"])
+    assert parser.feed("Sure, here they are:\nClaimID,Amount\nCLM-1,1") == []
+    assert parser.feed("00\nCLM-2,") == [["CLM-1", "100"]]
+    assert parser.feed("250\n\nDone.") == [["CLM-2", "250"]]
+    assert parser.close() == []
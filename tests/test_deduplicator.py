@@ -0,0 +1,187 @@
+import json
+import os
+import queue
+
+import numpy as np
+import pandas as pd
+
+from app.context.request_context import selected_model_ctx
+from app.services.deduplicator import (
+    FingerprintSet,
+    RowDeduplicator,
+    fingerprint_rows,
+)
+from app.services.llm_service import LLMService
+from app.services.local_generator import stream_locally
+from app.services.output_validator import OutputValidator
+from app.services.preprocess_input import build_generation_prompt
+
+FIELDS = {
+    "PolicyID": {"datatype": "string", "pattern": "^POL-[0-9]{3}$"},
+    "Premium": {"datatype": "number"},
+}
+
+
+def test_fingerprints_ignore_formatting_and_column_order():
+    a = pd.DataFrame({"Name": ["  Alice  Smith", "Bob"], "Premium": ["100", "7"]})
+    b = pd.DataFrame({"premium": [100.0, 7.5], "name": ["alice smith", "Bob"]})
+    prints_a, prints_b = fingerprint_rows(a), fingerprint_rows(b)
+    assert prints_a[0] == prints_b[0]
+    assert prints_a[1] != prints_b[1]
+
+    # Values don't leak between columns
+    swapped = pd.DataFrame({"Name": ["x", "y"], "City": ["y", "x"]})
+    assert len(set(fingerprint_rows(swapped))) == 2
+
+
+def test_drops_exact_and_key_duplicates_across_batches():
+    deduplicator = RowDeduplicator.for_fields(FIELDS)
+    first = pd.DataFrame(
+        {"PolicyID": ["POL-001", "POL-002", "POL-001"], "Premium": [1, 2, 3]}
+    )
+    assert list(deduplicator.filter(first)["PolicyID"]) == ["POL-001", "POL-002"]
+
+    second = pd.DataFrame(
+        {"PolicyID": ["POL-002", "pol-003", "POL-003"], "Premium": [2, 4, 5]}
+    )
+    kept = deduplicator.filter(second)
+    assert list(kept["PolicyID"]) == ["pol-003"]
+    stats = deduplicator.stats()
+    assert (stats["dropped_exact"], stats["dropped_key"]) == (1, 2)
+
+
+def test_seed_rows_count_as_seen():
+    sample = pd.DataFrame({"policy_id": ["POL-001"], "Holder": ["Alice"]})
+    deduplicator = RowDeduplicator.for_sample(sample)
+    assert deduplicator.key_columns == ["policy_id"]
+
+    generated = pd.DataFrame(
+        {
+            "policy_id": ["POL-001", "POL-002", "POL-003"],
+            "Holder": ["Bob", "alice", "Carol"],
+        }
+    )
+    assert list(deduplicator.filter(generated)["policy_id"]) == ["POL-002", "POL-003"]
+    # Nothing from the sample itself is reported as dropped
+    assert deduplicator.stats()["dropped_key"] == 1
+
+
+def test_fingerprint_set_switches_to_a_bounded_bloom_filter():
+    fingerprints = np.random.default_rng(0).integers(0, 2**63, 200_000, dtype=np.uint64)
+    seen = FingerprintSet(max_exact=50_000, bloom_capacity=200_000)
+    for batch in np.array_split(fingerprints, 20):
+        seen.add(batch)
+    assert not seen.exact
+    assert seen.contains(fingerprints).all()
+    # ~1.2 bytes per row at a 0.1% false positive rate, vs 8 for exact storage
+    assert seen.nbytes < 2 * len(fingerprints)
+
+    unseen = np.random.default_rng(1).integers(0, 2**63, 100_000, dtype=np.uint64)
+    assert seen.contains(unseen).mean() < 0.005
+
+
+def test_generate_rows_replaces_duplicates_of_earlier_batches(monkeypatch):
+    prompts = []
+
+    def call_llm_text(prompt, max_tokens=3000, validate=None):
+        prompts.append(prompt)
+        rows, batch = map(int, prompt.split(":"))
+        # The second batch repeats two identifiers of the first
+        start = 8 if batch == 1 else 10 * batch
+        body = "\n".join(f"POL-{start + i:03d},{batch}" for i in range(rows))
+        return f"`PolicyID,Premium\n{body}\n`"
+
+    monkeypatch.setattr(LLMService, "call_llm_text", staticmethod(call_llm_text))
+    monkeypatch.setattr(LLMService, "_save_dataframe", staticmethod(lambda df: df))
+    token = selected_model_ctx.set("groq-model")
+    try:
+        df = LLMService.generate_rows(
+            lambda rows, batch: f"{rows}:{batch}", 14, FIELDS, max_tokens=200
+        )
+    finally:
+        selected_model_ctx.reset(token)
+
+    assert df["PolicyID"].is_unique and len(df) == 14
+
+
+def test_call_llm_api_drops_rows_repeating_the_sample(monkeypatch):
+    completion = "`policy_id,holder\nPOL-001,Bob\nPOL-002,Alice\nPOL-003,Carol\n`"
+    monkeypatch.setattr(
+        LLMService, "call_llm_text", staticmethod(lambda *args, **kwargs: completion)
+    )
+    monkeypatch.setattr(LLMService, "_save_dataframe", staticmethod(lambda df: df))
+    sample = pd.DataFrame({"policy_id": ["POL-001"], "holder": ["Alice"]})
+    token = selected_model_ctx.set("groq-model")
+    try:
+        df = LLMService.call_llm_api("prompt", seed_rows=sample)
+    finally:
+        selected_model_ctx.reset(token)
+    assert list(df["policy_id"]) == ["POL-002", "POL-003"]
+
+
+def test_stream_locally_keeps_identifiers_unique_across_chunks():
+    template = {
+        "fields": {"PolicyID": {"datatype": "string", "pattern": "POL-[0-9]{3}"}}
+    }
+    rows = list(stream_locally(template, 500, seed=0, chunk_size=100))
+    ids = [row["PolicyID"] for row in rows]
+    assert len(ids) == len(set(ids)) == 500
+
+
+def test_streamed_rows_are_deduplicated_in_micro_batches():
+    rows = queue.Queue()
+    for i in [1, 2, 1, None, 3, 4]:
+        premium = "x" if i == 4 else "1"
+        rows.put(
+            None if i is None else {"PolicyID": f"POL-{i:03d}", "Premium": premium}
+        )
+    validator = OutputValidator(FIELDS)
+    deduplicator = RowDeduplicator.for_fields(FIELDS)
+
+    # Everything already queued is taken at once, up to the limit
+    micro_batch, finished = LLMService._drain(rows, limit=2)
+    assert (len(micro_batch), finished) == (2, 0)
+    assert len(LLMService._unique_rows(micro_batch, validator, deduplicator)) == 2
+    micro_batch, finished = LLMService._drain(rows)
+    assert (len(micro_batch), finished) == (3, 1)
+    # Invalid rows are dropped before they can claim an identifier
+    unique = LLMService._unique_rows(micro_batch, validator, deduplicator)
+    assert [row["PolicyID"] for row in unique] == ["POL-003"]
+
+
+def test_foreign_key_identifiers_may_repeat():
+    fields = {
+        "DueDiligenceID": {"datatype": "string", "pattern": "^DD-[0-9]{3}$"},
+        "ClientID": {"datatype": "string", "pattern": "^CL-[0-9]{3}$"},
+        "Score": {"datatype": "number"},
+    }
+    deduplicator = RowDeduplicator.for_fields(fields)
+    assert deduplicator.key_columns == ["DueDiligenceID"]
+    batch = pd.DataFrame(
+        {
+            "DueDiligenceID": ["DD-001", "DD-002", "DD-001"],
+            "ClientID": ["CL-001", "CL-001", "CL-002"],
+            "Score": [1, 2, 3],
+        }
+    )
+    assert list(deduplicator.filter(batch)["DueDiligenceID"]) == ["DD-001", "DD-002"]
+
+    # Identifiers repeating in the sample aren't keys
+    sample = pd.DataFrame({"ClientID": ["CL-1", "CL-1"], "AlertID": ["A-1", "A-2"]})
+    assert RowDeduplicator.for_sample(sample).key_columns == ["AlertID"]
+
+
+def test_key_metadata_stays_out_of_the_prompt():
+    path = os.path.join(
+        os.path.dirname(__file__), "..", "app", "templates", "aml_risk_assessment.json"
+    )
+    with open(path, encoding="utf-8") as f:
+        template = json.load(f)
+    assert '"unique"' in json.dumps(template)
+    prompt = build_generation_prompt(template, "risk assessments", "csv", 10)
+    assert '"unique"' not in prompt
+    assert "ClientID" in prompt
+    # The template itself keeps the flag for key_columns
+    assert RowDeduplicator.for_fields(template["fields"]).key_columns == [
+        "RiskAssessmentID"
+    ]
@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import threading
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.context.request_context import selected_model_ctx
+from app.main_fastapi import app
+from app.services import stream_generation
+from app.services.llm_service import LLMService
+
+TEMPLATE = {
+    "template_name": "claims",
+    "fields": {
+        "ClaimID": {"datatype": "string", "pattern": "CLM-[0-9]{6}"},
+        "Status": {"datatype": "string", "enum": ["Open", "Closed"]},
+        "Amount": {"datatype": "number", "min": 10, "max": 500},
+    },
+}
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Selects TEMPLATE for every prompt and captures the saved DataFrames."""
+    frames = []
+
+    def save(df):
+        frames.append(df)
+        return f"memory://{len(frames)}.csv"
+
+    monkeypatch.setattr(
+        stream_generation,
+        "select_template",
+        lambda prompt, registry=None: ("claims", TEMPLATE, None),
+    )
+    monkeypatch.setattr(stream_generation, "save_generated_dataframe", save)
+    monkeypatch.setattr(LLMService, "_save_dataframe", staticmethod(save))
+    return frames
+
+
+@pytest.fixture
+def fake_llm_stream(monkeypatch):
+    """Streams "<rows>" rows per batch; every batch repeats one row of batch 0."""
+    models = []
+    lock = threading.Lock()
+
+    def stream_rows(prompt, max_tokens=None, columns=None):
+        batch = prompt.count("batch")
+        with lock:
+            models.append(selected_model_ctx.get(None))
+            offset = len(models) * 1000
+        yield {"ClaimID": "CLM-000000", "Status": "Open", "Amount": "10"}
+        for i in range(49):
+            yield {"ClaimID": f"CLM-{offset + i:06d}", "Status": "Open", "Amount": "10"}
+
+    monkeypatch.setattr(LLMService, "stream_rows", staticmethod(stream_rows))
+    return models
+
+
+def _post(output_format, volume, **parameters):
+    client = TestClient(app)
+    return client.post(
+        "/api/generate/stream",
+        json={
+            "output_format": output_format,
+            "prompt": "claims for a car insurance policy",
+            "volume": volume,
+            "parameters": parameters,
+        },
+    )
+
+
+def test_local_engine_streams_ndjson_and_saves_the_file(saved):
+    response = _post("json", 2500, engine="local", seed=1)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    rows = [line["row"] for line in lines[:-1]]
+    assert len(rows) == 2500
+    assert set(rows[0]) == {"ClaimID", "Status", "Amount"}
+    assert lines[-1] == {"done": {"rows": 2500, "url": "memory://1.csv"}}
+    pd.testing.assert_frame_equal(saved[0], pd.DataFrame(rows))
+
+
+def test_llm_engine_streams_csv_with_the_selected_model(saved, fake_llm_stream):
+    response = _post("csv", 120, selectedModel="llama3-70b-8192")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 120
+    assert len({row["ClaimID"] for row in rows}) == 120
+    assert set(fake_llm_stream) == {"llama3-70b-8192"}
+    assert len(saved[0]) == 120
+
+
+def test_unmatched_prompt_is_rejected_before_streaming(monkeypatch):
+    monkeypatch.setattr(
+        stream_generation,
+        "select_template",
+        lambda prompt, registry=None: (None, None, "No template found"),
+    )
+    response = _post("csv", 10)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "No template found"
+
+
+def test_unsupported_stream_format():
+    assert _post("xml", 10).status_code == 400
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app.services import http_client
+
+
+def echo(body):
+    return (500 if body.get("fail") else 200), {"echo": body}, {}
+
+
+@pytest.fixture
+def echo_server(stub_server):
+    return stub_server(echo)
+
+
+@pytest.fixture
+def server_url(echo_server):
+    return f"{echo_server.url}/v1/chat/completions"
+
+
+def test_sync_client_reuses_connections(echo_server, server_url):
+    try:
+        for i in range(5):
+            assert http_client.post_json(server_url, {"i": i}) == {"echo": {"i": i}}
+        assert len(echo_server.connections) == 1
+        with pytest.raises(httpx.HTTPStatusError):
+            http_client.post_json(server_url, {"fail": True})
+    finally:
+        asyncio.run(http_client.close_http_clients())
+
+
+def test_worker_threads_use_the_bound_event_loop(server_url):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        http_client.bind_event_loop(loop)
+        assert http_client.post_json(server_url, {"a": 1}) == {"echo": {"a": 1}}
+        assert http_client._async_client is not None
+        assert http_client._sync_client is None
+    finally:
+        asyncio.run_coroutine_threadsafe(
+            http_client.close_http_clients(), loop
+        ).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
@@ -0,0 +1,54 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Cumulative import time of app.main_fastapi, in microseconds. Today it is
+# dominated by FastAPI and pandas; the NLP/embedding stack and boto3 must not
+# be imported until they are used.
+IMPORT_TIME_BUDGET_US = 2_500_000
+LAZY_MODULES = [
+    "spacy",
+    "rapidfuzz",
+    "faiss",
+    "sentence_transformers",
+    "torch",
+    "boto3",
+    "botocore",
+    "opensearchpy",
+]
+
+
+def _import_main(*flags):
+    code = (
+        "import json, sys; import app.main_fastapi; "
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    )
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_heavy_dependencies_are_not_imported_eagerly():
+    assert json.loads(_import_main().stdout.strip().splitlines()[-1]) == []
+
+
+def test_main_fastapi_import_time_within_budget():
+    report = _import_main("-X", "importtime").stderr
+    cumulative_us = None
+    for line in report.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "app.main_fastapi":
+            cumulative_us = int(parts[1])
+    assert cumulative_us is not None, report[-2000:]
+    assert cumulative_us < IMPORT_TIME_BUDGET_US, (
+        f"import app.main_fastapi took {cumulative_us / 1e6:.2f}s, "
+        f"budget is {IMPORT_TIME_BUDGET_US / 1e6:.2f}s"
+    )
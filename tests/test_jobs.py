@@ -0,0 +1,267 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import lambda_function
+from app.context.request_context import report_progress, selected_model_ctx
+from app.main_fastapi import app
+from app.models.job import Job, JobKind, JobStatus
+from app.models.request import GenerateRequest
+from app.services import bulkhead, job_manager
+from app.services.bulkhead import Bulkhead
+from app.services.job_manager import JobManager
+from app.services.job_store import InMemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryJobStore(max_jobs=3)
+    else:
+        store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"), max_jobs=3)
+        yield store
+        store.close()
+
+
+@pytest.fixture(autouse=True)
+def bulkheads(monkeypatch):
+    """One worker and one queue slot per backend."""
+    heads = {name: Bulkhead(name, 1, 1) for name in ("bedrock", "groq")}
+    monkeypatch.setattr(bulkhead, "_bulkheads", heads)
+    yield heads
+    for head in heads.values():
+        head.shutdown(wait=True)
+
+
+@pytest.fixture
+def fake_lambda(monkeypatch):
+    """Reports progress, waits for `release`, then returns the lambda response."""
+    release = threading.Event()
+    models = []
+
+    def lambda_handler(request, content, event=""):
+        models.append(selected_model_ctx.get(None))
+        report_progress(0.5, "Halfway")
+        release.wait(timeout=5)
+        if request is not None and request.prompt == "please fail":
+            return {"statusCode": 500, "body": json.dumps({"error": "LLM down"})}
+        url = "s3://bucket/epic.csv" if request is None else "s3://bucket/out.csv"
+        return {"statusCode": 200, "body": json.dumps({"url": url})}
+
+    monkeypatch.setattr(lambda_function, "lambda_handler", lambda_handler)
+    return release, models
+
+
+def _wait_for(manager, job_id, predicate):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if predicate(job):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} never reached the expected state: {job}")
+
+
+def test_store_create_get_update(store):
+    job = store.create(Job(job_id="a", kind=JobKind.TEMPLATE))
+    assert store.get("a") == job
+    assert store.get("missing") is None
+    assert store.update("missing", status=JobStatus.RUNNING) is None
+
+    updated = store.update("a", status=JobStatus.SUCCEEDED, result={"url": "x"})
+    assert updated.status == JobStatus.SUCCEEDED
+    assert updated.updated_at >= job.updated_at
+    assert store.get("a").result == {"url": "x"}
+
+
+def test_store_evicts_oldest_finished_jobs(store):
+    for job_id in "abcd":
+        store.create(Job(job_id=job_id, kind=JobKind.TEMPLATE))
+    store.update("a", status=JobStatus.RUNNING)
+    store.update("b", status=JobStatus.FAILED)
+    store.update("c", status=JobStatus.SUCCEEDED)
+    store.create(Job(job_id="e", kind=JobKind.EPIC))
+    store.create(Job(job_id="f", kind=JobKind.EPIC))
+
+    # Running and queued jobs are kept even over the limit
+    assert [j for j in "abcdef" if store.get(j)] == ["a", "d", "e", "f"]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    writer, reader = SQLiteJobStore(path), SQLiteJobStore(path)
+    writer.create(Job(job_id="a", kind=JobKind.EPIC))
+    writer.update("a", progress=0.25)
+    assert reader.get("a").progress == 0.25
+
+
+def test_manager_runs_jobs_in_the_background(store, fake_lambda):
+    release, models = fake_lambda
+    manager = JobManager(store)
+    try:
+        request = GenerateRequest(
+            output_format="csv", prompt="car insurance claims", volume=5
+        )
+        job = manager.submit_template(request, "llama3-70b-8192")
+        assert job.status == JobStatus.QUEUED
+
+        running = _wait_for(manager, job.job_id, lambda j: j.progress == 0.5)
+        assert running.status == JobStatus.RUNNING
+        assert running.message == "Halfway"
+
+        failed = manager.submit_template(
+            request.model_copy(update={"prompt": "please fail"}), "claude-2.1"
+        )
+        release.set()
+        done = _wait_for(manager, job.job_id, lambda j: j.status.finished)
+        assert done.status == JobStatus.SUCCEEDED
+        assert done.progress == 1.0
+        assert done.result == {"url": "s3://bucket/out.csv"}
+
+        failed = _wait_for(manager, failed.job_id, lambda j: j.status.finished)
+        assert failed.status == JobStatus.FAILED
+        assert failed.error == "LLM down"
+        assert sorted(models) == ["claude-2.1", "llama3-70b-8192"]
+    finally:
+        manager.shutdown(wait=True)
+
+
+def test_jobs_api(monkeypatch, fake_lambda):
+    release, models = fake_lambda
+    release.set()
+    manager = JobManager(InMemoryJobStore())
+    monkeypatch.setattr(job_manager, "_manager", manager)
+    client = TestClient(app)
+    try:
+        response = client.post(
+            "/api/jobs",
+            json={
+                "output_format": "csv",
+                "prompt": "car insurance claims",
+                "volume": 5,
+                "parameters": {"selectedModel": "llama3-70b-8192"},
+            },
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        _wait_for(manager, job_id, lambda j: j.status.finished)
+
+        job = client.get(f"/api/jobs/{job_id}").json()
+        assert job["status"] == "succeeded"
+        assert job["result"]["url"] == "s3://bucket/out.csv"
+        assert models == ["llama3-70b-8192"]
+
+        assert client.get("/api/jobs/unknown").status_code == 404
+
+        response = client.post(
+            "/api/jobs/upload",
+            files={"file": ("sample.txt", b"a,b\n1,2\n")},
+            data={"selectedModel": "claude-2.1"},
+        )
+        assert response.status_code == 400
+    finally:
+        manager.shutdown(wait=True)
+
+
+def test_shutdown_fails_jobs_that_never_started(store, fake_lambda):
+    release, _ = fake_lambda
+    manager = JobManager(store)
+    request = GenerateRequest(
+        output_format="csv", prompt="car insurance claims", volume=5
+    )
+    try:
+        running = manager.submit_template(request, "llama3-70b-8192")
+        queued = manager.submit_template(request, "llama3-70b-8192")
+        _wait_for(manager, running.job_id, lambda j: j.status == JobStatus.RUNNING)
+        manager.shutdown()
+
+        cancelled = manager.get(queued.job_id)
+        assert cancelled.status == JobStatus.FAILED
+        assert cancelled.message == "Cancelled"
+    finally:
+        release.set()
+        manager.shutdown(wait=True)
+    assert manager.get(running.job_id).status == JobStatus.SUCCEEDED
+
+
+def test_sqlite_store_fails_jobs_of_stopped_workers(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = SQLiteJobStore(path)
+    for job_id in ("alive", "dead", "restarted", "legacy", "done"):
+        store.create(Job(job_id=job_id, kind=JobKind.TEMPLATE))
+    store.update("alive", status=JobStatus.RUNNING)
+    store.update("done", status=JobStatus.SUCCEEDED)
+    owners = {
+        # A pid above the kernel's limit never exists
+        "dead": "999999999:gone",
+        # Same pid, another process (e.g. pid 1 after a container restart)
+        "restarted": f"{os.getpid()}:previous",
+        "legacy": None,
+        "done": None,
+    }
+    with store._conn:
+        for job_id, owner in owners.items():
+            store._conn.execute(
+                "UPDATE jobs SET owner = ? WHERE job_id = ?", (owner, job_id)
+            )
+    store.close()
+
+    reopened = SQLiteJobStore(path)
+    try:
+        statuses = {
+            job_id: reopened.get(job_id).status
+            for job_id in ("alive", "dead", "restarted", "legacy", "done")
+        }
+    finally:
+        reopened.close()
+    assert statuses == {
+        "alive": JobStatus.RUNNING,
+        "dead": JobStatus.FAILED,
+        "restarted": JobStatus.FAILED,
+        "legacy": JobStatus.FAILED,
+        "done": JobStatus.SUCCEEDED,
+    }
+
+
+def test_jobs_run_on_the_backend_bulkhead(monkeypatch, bulkheads):
+    release = threading.Event()
+    threads = []
+
+    def lambda_handler(request, content, event=""):
+        threads.append(threading.current_thread().name)
+        release.wait(timeout=5)
+        return {"statusCode": 200, "body": json.dumps({"url": "s3://bucket/x.csv"})}
+
+    monkeypatch.setattr(lambda_function, "lambda_handler", lambda_handler)
+    manager = JobManager(InMemoryJobStore(), max_pending=3)
+    monkeypatch.setattr(job_manager, "_manager", manager)
+    client = TestClient(app)
+    body = {
+        "output_format": "csv",
+        "prompt": "car insurance claims",
+        "volume": 5,
+        "parameters": {"selectedModel": "llama3-70b-8192"},
+    }
+    try:
+        # One running and one queued on the groq bulkhead, then it is full
+        first = client.post("/api/jobs", json=body).json()["job_id"]
+        assert client.post("/api/jobs", json=body).status_code == 202
+        _wait_for(manager, first, lambda j: j.status == JobStatus.RUNNING)
+        response = client.post("/api/jobs", json=body)
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+        assert bulkheads["groq"].stats()["rejected"] == 1
+
+        # The pending bound rejects before the bulkhead is asked
+        manager.max_pending = 2
+        assert client.post("/api/jobs", json=body).status_code == 503
+        assert bulkheads["groq"].stats()["rejected"] == 1
+    finally:
+        release.set()
+        manager.shutdown(wait=True)
+    assert threads and all(name.startswith("groq-pipeline") for name in threads)
+    assert manager.get(first).status == JobStatus.SUCCEEDED
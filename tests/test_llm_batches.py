@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from app.context.request_context import selected_model_ctx
+from app.services.llm_service import LLMService
+
+FIELDS = {
+    "PolicyID": {"datatype": "string"},
+    "Period": {
+        "datatype": "object",
+        "properties": {
+            "StartDate": {"datatype": "date"},
+            "EndDate": {"datatype": "date"},
+        },
+    },
+}
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Answers each prompt "<rows>:<batch>" with rows CSV rows inside backticks."""
+    calls = []
+    lock = threading.Lock()
+
+    def call_llm_text(prompt, max_tokens=3000, validate=None):
+        rows, batch = map(int, prompt.split(":"))
+        with lock:
+            calls.append((rows, batch, selected_model_ctx.get(None)))
+        # Batch 1 repeats batch 0's rows, so merging has duplicates to drop
+        ids = range(rows) if batch <= 1 else range(batch * 1000, batch * 1000 + rows)
+        body = "\n".join(f"ID-{i},2024-01-01,2024-12-31" for i in ids)
+        return f"`PolicyID,Period.StartDate,Period.EndDate\n{body}\n`"
+
+    monkeypatch.setattr(LLMService, "call_llm_text", staticmethod(call_llm_text))
+    monkeypatch.setattr(LLMService, "_save_dataframe", staticmethod(lambda df: df))
+    return calls
+
+
+def test_plan_batches_fits_token_budget():
+    batches = LLMService.plan_batches(1000, FIELDS, max_tokens=300)
+    # 3 columns * 10 tokens per field -> 7 rows in 75% of 300 tokens
+    assert batches == [7] * 142 + [6]
+    assert LLMService.plan_batches(5, FIELDS) == [5]
+
+
+def test_generate_rows_merges_dedupes_and_tops_up(fake_llm):
+    token = selected_model_ctx.set("groq-model")
+    try:
+        df = LLMService.generate_rows(
+            lambda rows, batch: f"{rows}:{batch}", 20, FIELDS, max_tokens=300
+        )
+    finally:
+        selected_model_ctx.reset(token)
+
+    assert len(df) == 20 and df["PolicyID"].is_unique
+    # 3 batches of 7/7/6, batch 1 duplicates batch 0, so a second round fills in
+    assert sorted(batch for _, batch, _ in fake_llm) == [0, 1, 2, 3]
+    assert {model for _, _, model in fake_llm} == {"groq-model"}
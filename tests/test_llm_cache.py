@@ -0,0 +1,142 @@
+import os
+import time
+
+from app.services import request_model
+from app.services.llm_cache import (
+    LLMResponseCache,
+    bypass_llm_cache,
+    make_cache_key,
+)
+
+PARAMS = {"max_tokens": 3000, "temperature": 0.5, "top_p": 0.9, "top_k": 250}
+
+
+class Completions:
+    """Fake LLM returning a new completion per call."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.last = f"`a,b\n{self.calls},x\n`"
+        return self.last
+
+
+def _cache(tmp_path, **kwargs):
+    options = dict(enabled=True, memory_size=8, directory=str(tmp_path))
+    return LLMResponseCache(**{**options, **kwargs})
+
+
+def test_key_covers_model_prompt_and_params():
+    key = make_cache_key("bedrock", "claude", "prompt", PARAMS)
+    assert key == make_cache_key("bedrock", "claude", "prompt", dict(PARAMS))
+    keys = {
+        key,
+        make_cache_key("groq", "claude", "prompt", PARAMS),
+        make_cache_key("bedrock", "llama", "prompt", PARAMS),
+        make_cache_key("bedrock", "claude", "prompt!", PARAMS),
+        make_cache_key("bedrock", "claude", "prompt", {**PARAMS, "top_p": 0.8}),
+    }
+    assert len(keys) == 5
+
+
+def test_memory_then_disk_hits(tmp_path):
+    llm = Completions()
+    cache = _cache(tmp_path)
+    first = cache.get_or_compute("groq", "llama", "p", {}, llm)
+    assert cache.get_or_compute("groq", "llama", "p", {}, llm) == first
+    assert llm.calls == 1
+
+    # A new process only has the disk tier
+    restarted = _cache(tmp_path)
+    assert restarted.get_or_compute("groq", "llama", "p", {}, llm) == first
+    assert llm.calls == 1
+    stats = restarted.stats()
+    assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 0)
+    assert stats["hit_rate"] == 1.0
+
+
+def test_bypass_refreshes_the_entry(tmp_path):
+    llm = Completions()
+    cache = _cache(tmp_path)
+    cache.get_or_compute("groq", "llama", "p", {}, llm)
+    with bypass_llm_cache():
+        fresh = cache.get_or_compute("groq", "llama", "p", {}, llm)
+    assert llm.calls == 2
+    assert cache.get_or_compute("groq", "llama", "p", {}, llm) == fresh
+    assert cache.stats()["bypassed"] == 1
+
+
+def test_entries_expire(tmp_path):
+    llm = Completions()
+    cache = _cache(tmp_path, ttl_seconds=0.05)
+    cache.get_or_compute("groq", "llama", "p", {}, llm)
+    time.sleep(0.1)
+    cache.get_or_compute("groq", "llama", "p", {}, llm)
+    assert llm.calls == 2
+
+
+def test_disk_tier_stays_within_budget(tmp_path):
+    cache = _cache(tmp_path, memory_size=0, disk_max_bytes=2000)
+    for i in range(50):
+        cache.get_or_compute("groq", "llama", f"prompt {i}", {}, lambda: "x" * 100)
+    assert cache.disk.size_bytes() <= 2000
+    on_disk = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(tmp_path)
+        for name in names
+    )
+    assert on_disk == cache.disk.size_bytes()
+    # The most recent entries survive
+    assert cache.get(make_cache_key("groq", "llama", "prompt 49", {})) == "x" * 100
+
+
+def test_disabled_or_empty_responses_are_not_cached(tmp_path):
+    llm = Completions()
+    disabled = _cache(tmp_path, enabled=False)
+    disabled.get_or_compute("groq", "llama", "p", {}, llm)
+    disabled.get_or_compute("groq", "llama", "p", {}, llm)
+    assert llm.calls == 2
+
+    cache = _cache(tmp_path)
+    assert cache.get_or_compute("groq", "llama", "p", {}, lambda: "") == ""
+    cache.get_or_compute("groq", "llama", "p", {}, llm)
+    assert llm.calls == 3
+
+
+def test_invalid_completions_are_not_cached(tmp_path):
+    def validate(text):
+        if "`" not in text:
+            raise ValueError("no CSV block")
+
+    cache = _cache(tmp_path)
+    answers = iter(["Sorry, I can't.", "`a,b\n1,2\n`"])
+    compute = lambda: next(answers)  # noqa: E731
+    # The bad answer is returned for the caller to reject, but not stored
+    assert cache.get_or_compute("groq", "llama", "p", {}, compute, validate) == (
+        "Sorry, I can't."
+    )
+    assert cache.get_or_compute("groq", "llama", "p", {}, compute, validate) == (
+        "`a,b\n1,2\n`"
+    )
+
+    # An entry cached without validation is evicted once a validator rejects it
+    cache.get_or_compute("groq", "llama", "q", {}, lambda: "Sorry")
+    llm = Completions()
+    assert cache.get_or_compute("groq", "llama", "q", {}, llm, validate) == llm.last
+    assert _cache(tmp_path).get_or_compute("groq", "llama", "q", {}, llm) == llm.last
+    assert llm.calls == 1
+
+
+def test_request_model_completions_are_cached(monkeypatch, tmp_path):
+    cache = _cache(tmp_path)
+    monkeypatch.setattr(request_model, "get_llm_cache", lambda: cache)
+    llm = Completions()
+    monkeypatch.setattr(
+        request_model.RequestModel, "_invoke_groq", lambda self, prompt: llm()
+    )
+    rm = request_model.RequestModel()
+    assert rm.complete_groq("same prompt") == rm.complete_groq("same prompt")
+    assert rm.complete_groq("other prompt") != rm.complete_groq("same prompt")
+    assert llm.calls == 2
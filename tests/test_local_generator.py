@@ -0,0 +1,95 @@
+import json
+import os
+
+import pandas as pd
+
+from app.services.local_generator import LocalGenerator, parse_text_pool_response
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "..", "app", "templates")
+
+FIELDS = {
+    "PolicyID": {"datatype": "string", "pattern": "POL-[0-9]{3}"},
+    "PolicyType": {"datatype": "string", "enum": ["Basic", "Standard", "Enhanced"]},
+    "ContributionLimit": {"datatype": "number", "min": 0, "max": 8000},
+    "PolicyHolderAge": {"datatype": "integer", "min": 18, "max": 65},
+    "IsActive": {"datatype": "boolean"},
+    "StartDate": {"datatype": "date", "format": "YYYY-MM-DD"},
+    "Services": {
+        "datatype": "array",
+        "items": {"datatype": "string", "enum": ["Dental", "Vision", "Drugs"]},
+    },
+    "Period": {
+        "datatype": "object",
+        "properties": {"EndDate": {"datatype": "date", "format": "YYYY-MM-DD"}},
+    },
+    "PolicyHolderName": {"datatype": "string"},
+}
+
+
+def test_columns_respect_field_constraints():
+    generator = LocalGenerator(
+        FIELDS, text_values={"PolicyHolderName": ["Ana Diaz"]}, seed=1
+    )
+    df = generator.generate(5000)
+
+    assert list(df.columns) == [
+        "PolicyID",
+        "PolicyType",
+        "ContributionLimit",
+        "PolicyHolderAge",
+        "IsActive",
+        "StartDate",
+        "Services",
+        "Period.EndDate",
+        "PolicyHolderName",
+    ]
+    assert list(generator.text_fields) == ["PolicyHolderName"]
+    # 1000 possible ids for 5000 rows: valid but not unique
+    assert df["PolicyID"].str.fullmatch(r"POL-[0-9]{3}").all()
+    assert generator.generate(1000)["PolicyID"].is_unique
+    assert df["PolicyType"].isin(["Basic", "Standard", "Enhanced"]).all()
+    assert df["ContributionLimit"].between(0, 8000).all()
+    assert df["PolicyHolderAge"].between(18, 65).all()
+    assert df["IsActive"].dtype == bool
+    assert pd.to_datetime(df["StartDate"], format="%Y-%m-%d").notna().all()
+    services = df["Services"].str.split("; ")
+    assert services.map(
+        lambda s: 0 < len(s) and set(s) <= {"Dental", "Vision", "Drugs"}
+    ).all()
+    assert (df["PolicyHolderName"] == "Ana Diaz").all()
+
+
+def test_seed_makes_output_reproducible():
+    first = LocalGenerator(FIELDS, seed=7).generate(100)
+    second = LocalGenerator(FIELDS, seed=7).generate(100)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_every_bundled_template_compiles():
+    for filename in sorted(os.listdir(TEMPLATES_DIR)):
+        with open(os.path.join(TEMPLATES_DIR, filename), "r", encoding="utf-8") as f:
+            template = json.load(f)
+        df = LocalGenerator(template["fields"], seed=0).generate(10)
+        assert len(df) == 10 and not df.isna().any().any(), filename
+
+
+def test_parse_text_pool_response():
+    text = 'Here you go:\n{"PolicyHolderName": ["Ana Diaz", "Li Wei"], "x": "y"}'
+    assert parse_text_pool_response(text) == {
+        "PolicyHolderName": ["Ana Diaz", "Li Wei"]
+    }
+
+
+def test_one_sided_ranges_stay_ordered():
+    fields = {
+        "Fee": {"datatype": "number", "max": 50},
+        "Credit": {"datatype": "number", "max": -10},
+        "Score": {"datatype": "integer", "min": 500},
+        "Count": {"datatype": "integer", "max": 5},
+    }
+    df = LocalGenerator(fields, seed=0).generate(2000)
+    assert df["Fee"].between(0, 50).all()
+    assert df["Credit"].between(-100010, -10).all()
+    assert df["Score"].between(500, 600).all()
+    assert df["Count"].between(0, 5).all()
+    assert df["Count"].nunique() == 6
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main_fastapi import app
+from app.services import model_registry, prompt_processor
+from app.services.model_registry import ModelRegistry, start_background_warmup
+from app.utils.ttl_cache import TTLCache
+
+
+class StubProcessor:
+    catalog_version = "stub"
+
+    def __init__(self):
+        self.prompts = []
+        self.template_cache = TTLCache(maxsize=8, ttl_seconds=60)
+
+    def process(self, user_input):
+        self.prompts.append(user_input)
+        return {"template": "NOT_FOUND"}
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ModelRegistry()
+    monkeypatch.setattr(model_registry, "_registry", registry)
+    return registry
+
+
+def stub_load(registry, processor=None, error=None):
+    def load():
+        if error is not None:
+            raise error
+        registry.prompt_processor = processor or StubProcessor()
+
+    registry._load = load
+
+
+def test_ready_turns_green_after_warmup(registry):
+    processor = StubProcessor()
+    stub_load(registry, processor)
+    client = TestClient(app)
+
+    response = client.get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming_up"
+
+    registry.warmup()
+    registry.warmup()
+    # Only the first call loads and runs the warmup inference
+    assert processor.prompts == [model_registry.WARMUP_PROMPT]
+    response = client.get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_failed_warmup_keeps_the_probe_red(registry):
+    stub_load(registry, error=OSError("model not found"))
+    with pytest.raises(OSError):
+        registry.warmup()
+
+    response = TestClient(app).get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["error"] == "model not found"
+
+
+def test_background_warmup_failure_is_logged(registry, caplog):
+    stub_load(registry, error=OSError("model not found"))
+
+    async def warm_up():
+        task = start_background_warmup()
+        await asyncio.wait([task])
+        # Let the done-callback run
+        await asyncio.sleep(0)
+        return task
+
+    with caplog.at_level(logging.ERROR, logger=model_registry.__name__):
+        task = asyncio.run(warm_up())
+    assert isinstance(task.exception(), OSError)
+    assert "Background model warmup failed" in caplog.text
+    assert not registry.ready
+
+
+def test_open_search_loads_no_models(registry, monkeypatch):
+    monkeypatch.setattr(model_registry, "OPEN_SEARCH", True)
+    monkeypatch.setattr(prompt_processor, "OPEN_SEARCH", True)
+    monkeypatch.setattr(model_registry, "load_template_mappings", lambda: "NOT_FOUND")
+
+    def no_spacy(*args, **kwargs):
+        raise AssertionError("spaCy loaded under OPEN_SEARCH")
+
+    monkeypatch.setattr("spacy.load", no_spacy)
+    registry.warmup()
+
+    assert registry.ready
+    assert registry.nlp is None and registry.template_matcher is None
+    assert registry.prompt_processor.nlp is None
+    # No catalog refresh either, OpenSearch owns the templates
+    registry._catalog_checked_at = float("-inf")
+    assert registry.refresh_catalog_if_stale() is False
+
+
+def test_stale_catalog_is_refreshed_in_the_background(registry, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    refreshed = threading.Event()
+
+    def slow_refresh():
+        started.set()
+        release.wait(timeout=5)
+        refreshed.set()
+        return True
+
+    registry.ready = True
+    registry.refresh_catalog = slow_refresh
+    assert registry.refresh_catalog_if_stale() is False
+
+    registry._catalog_checked_at = float("-inf")
+    # Returns while the reload is still running
+    assert registry.refresh_catalog_if_stale() is True
+    assert started.wait(timeout=5)
+    assert not refreshed.is_set()
+    # A concurrent stale check doesn't start a second reload
+    registry._catalog_checked_at = float("-inf")
+    assert registry.refresh_catalog_if_stale() is False
+
+    release.set()
+    assert refreshed.wait(timeout=5)
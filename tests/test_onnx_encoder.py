@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+pytest.importorskip("faiss")
+pytest.importorskip("sentence_transformers")
+
+from app.services.onnx_encoder import (  # noqa: E402
+    check_onnx_accuracy,
+    export_onnx_model,
+    load_sample_requests,
+)
+from config.config import (  # noqa: E402
+    EMBEDDING_ONNX_MODEL_DIR,
+    EMBEDDING_ONNX_MODEL_FILE,
+)
+
+
+@pytest.fixture(scope="module")
+def onnx_model():
+    """Exports the ONNX model on first use, as the build step would."""
+    model_path = os.path.join(EMBEDDING_ONNX_MODEL_DIR, EMBEDDING_ONNX_MODEL_FILE)
+    if not os.path.exists(model_path):
+        pytest.importorskip("torch")
+        pytest.importorskip("transformers")
+        try:
+            export_onnx_model()
+        except OSError as e:
+            # The Hugging Face model could not be downloaded
+            pytest.skip(f"ONNX model could not be exported: {e}")
+    return model_path
+
+
+def test_onnx_backend_selects_same_templates_as_torch(onnx_model):
+    assert check_onnx_accuracy(load_sample_requests()) == []
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.context.request_context import selected_model_ctx
+from app.services.json_parser import JsonParser
+from app.services.llm_service import LLMService
+from app.services.output_validator import OutputValidator
+
+FIELDS = {
+    "PolicyID": {"datatype": "string", "pattern": "^POL-[0-9]{3}$"},
+    "PolicyType": {"datatype": "string", "enum": ["Basic", "Standard"]},
+    "ContributionLimit": {"datatype": "number", "min": 0, "max": 8000},
+    "PolicyHolderAge": {"datatype": "integer", "min": 18, "max": 65},
+    "IsActive": {"datatype": "boolean"},
+    "Services": {
+        "datatype": "array",
+        "items": {"datatype": "string", "enum": ["Dental", "Vision", "Drugs"]},
+    },
+    "Period": {
+        "datatype": "object",
+        "properties": {
+            "StartDate": {"datatype": "date", "min": "2020-01-01"},
+            "Notes": {"datatype": "string", "nullable": True},
+        },
+    },
+}
+
+ROWS = [
+    ["POL-001", "Basic", 100.5, 30, "true", "Dental; Vision", "2024-01-01", "ok"],
+    ["POL-002", "Gold", 100, 30, "true", "Dental", "2024-01-01", None],  # enum
+    ["POL-003", "Basic", 9000, 30, "false", "Dental", "2024-01-01", None],  # max
+    ["POL-004", "Basic", 1, 30.5, "false", "Dental", "2024-01-01", None],  # int
+    ["POL-005", "Basic", 1, 30, "maybe", "Dental", "2024-01-01", None],  # bool
+    ["POL-006", "Basic", 1, 30, "no", "Dental, Teeth", "2024-01-01", None],  # item
+    ["POL-007", "Basic", 1, 30, "yes", "Drugs", "2024-02-30", None],  # date
+    ["POL-008", "Basic", 1, 30, "yes", "Drugs", "2019-12-31", None],  # min date
+    ["POL-9", "Basic", 1, 30, "yes", "Drugs", "2024-01-01", None],  # pattern
+    ["POL-001", "Basic", 1, 30, "yes", "Drugs", "2024-01-01", None],  # duplicate
+    ["POL-010", " Standard ", 1, 30, "yes", "Drugs", "2024-01-01", None],
+    ["POL-011", "Basic", None, 30, "yes", "Drugs", "2024-01-01", None],  # missing
+]
+COLUMNS = [
+    "PolicyID",
+    "PolicyType",
+    "ContributionLimit",
+    "PolicyHolderAge",
+    "IsActive",
+    "Services",
+    "Period.StartDate",
+    "Period.Notes",
+]
+
+
+def test_violation_mask_flags_each_constraint():
+    df = pd.DataFrame(ROWS, columns=COLUMNS)
+    result = OutputValidator(FIELDS).validate(df)
+
+    assert result.mask.shape == (len(ROWS), len(COLUMNS))
+    assert list(np.flatnonzero(result.invalid_rows)) == list(range(1, 10)) + [11]
+    assert result.violations() == {
+        "PolicyID": 2,
+        "PolicyType": 1,
+        "ContributionLimit": 2,
+        "PolicyHolderAge": 1,
+        "IsActive": 1,
+        "Services": 1,
+        "Period.StartDate": 2,
+    }
+    # The padded enum value and the nullable Notes column pass
+    assert list(result.valid["PolicyID"]) == ["POL-001", "POL-010"]
+
+
+def test_leaf_column_names_and_missing_fields():
+    df = pd.DataFrame({"PolicyID": ["POL-001"], "StartDate": ["2024-01-01"]})
+    result = OutputValidator(FIELDS).validate(df)
+    assert not result.invalid_rows.any()
+    assert "Period.StartDate" not in result.missing_columns
+    assert "PolicyType" in result.missing_columns
+
+
+def test_validates_a_large_frame_once_per_distinct_value():
+    n = 200_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "PolicyID": [f"POL-{i % 1000:03d}" for i in range(n)],
+            "PolicyType": rng.choice(["Basic", "Standard", "Gold"], n),
+            "PolicyHolderAge": rng.integers(0, 100, n),
+        }
+    )
+    result = OutputValidator(FIELDS).validate(df)
+    expected = (
+        (np.arange(n) >= 1000)
+        | (df["PolicyType"] == "Gold").to_numpy()
+        | ~df["PolicyHolderAge"].between(18, 65).to_numpy()
+    )
+    assert np.array_equal(result.invalid_rows, expected)
+
+
+def test_generate_rows_replaces_only_invalid_rows(monkeypatch):
+    prompts = []
+
+    def call_llm_text(prompt, max_tokens=3000, validate=None):
+        prompts.append(prompt)
+        rows, batch = map(int, prompt.split(":"))
+        # The first batch has two rows with an out-of-range age
+        ages = [99 if batch == 0 and i < 2 else 40 for i in range(rows)]
+        body = "\n".join(
+            f"POL-{batch}{i:02d},{age}" for i, age in zip(range(rows), ages)
+        )
+        return f"`PolicyID,PolicyHolderAge\n{body}\n`"
+
+    monkeypatch.setattr(LLMService, "call_llm_text", staticmethod(call_llm_text))
+    monkeypatch.setattr(LLMService, "_save_dataframe", staticmethod(lambda df: df))
+    fields = {
+        "PolicyID": {"datatype": "string", "pattern": "POL-[0-9]{3}"},
+        "PolicyHolderAge": {"datatype": "integer", "min": 18, "max": 65},
+    }
+    token = selected_model_ctx.set("groq-model")
+    try:
+        df = LLMService.generate_rows(lambda rows, batch: f"{rows}:{batch}", 10, fields)
+    finally:
+        selected_model_ctx.reset(token)
+
+    assert len(df) == 10 and df["PolicyHolderAge"].max() == 40
+    # One batch of 10, then a batch for just the two rejected rows
+    assert prompts == ["10:0", "2:1"]
+
+
+def test_json_parser_drops_objects_violating_the_schema():
+    response = (
+        "<<REPLY>>"
+        '{"PolicyID": "POL-001", "Period": {"StartDate": "2024-01-01"}, '
+        '"Services": ["Dental", "Vision"]}'
+        '{"PolicyID": "POL-002", "Period": {"StartDate": "yesterday"}, '
+        '"Services": ["Dental"]}'
+        "[/REPLY]"
+    )
+    fields = {key: FIELDS[key] for key in ("PolicyID", "Services", "Period")}
+    parsed = JsonParser(schema=fields).parse_response(response)
+    assert [item["PolicyID"] for item in parsed] == ["POL-001"]
+
+    with pytest.raises(ValueError):
+        JsonParser(schema={"PolicyID": {"enum": ["X"]}}).parse_response(response)
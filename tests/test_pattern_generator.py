@@ -0,0 +1,58 @@
+import re
+
+import numpy as np
+import pytest
+
+from app.services.pattern_generator import (
+    PatternError,
+    _sample_indexes,
+    compile_pattern,
+)
+
+PATTERNS = [
+    "AML-RA-[0-9]{8}",
+    "CL-[0-9]{7}",
+    "([DI|LI|CI|DA|DC|LC])-[0-9]{6}",
+    "^[0-9]{10}$",
+    "(DI|LI|CI)-[0-9]{6}",
+    "(?:ACC|INV)_[A-Z]{2,4}-\\d{3}",
+    "[A-Za-z]{1,5}(-[0-9]+)?",
+    "x\\.y?z*",
+    "[a-c-]{3}|Q",
+]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_generated_values_fully_match(pattern):
+    values = compile_pattern(pattern).generate(2000, np.random.default_rng(3))
+    assert len(values) == 2000
+    assert all(re.fullmatch(pattern, value) for value in values)
+
+
+@pytest.mark.parametrize("pattern", ["CL-[0-9]{4}", "(A|B)[0-9]{3}[a-z]?"])
+def test_unique_values(pattern):
+    generator = compile_pattern(pattern)
+    values = generator.generate(5000, np.random.default_rng(0), unique=True)
+    assert len(set(values)) == 5000
+    assert all(re.fullmatch(pattern, value) for value in values)
+
+
+def test_unique_beyond_cardinality_raises():
+    with pytest.raises(ValueError):
+        compile_pattern("ID-[0-9]{2}").generate(101, unique=True)
+
+
+@pytest.mark.parametrize("pattern", ["[^0-9]{3}", "a\\bc", "(?=x)y", "a+?"])
+def test_unsupported_syntax_raises(pattern):
+    with pytest.raises(PatternError):
+        compile_pattern(pattern)
+
+
+@pytest.mark.parametrize("population, n", [(10**12, 50_000), (1000, 700), (10, 10)])
+def test_sampled_indexes_are_distinct_and_shuffled(population, n):
+    indexes = _sample_indexes(np.random.default_rng(0), population, n)
+    assert len(indexes) == n == len(np.unique(indexes))
+    assert indexes.min() >= 0 and indexes.max() < population
+    if n > 10:
+        # Random order, not the sorted order deduplication produces
+        assert (np.diff(indexes) < 0).any()
@@ -0,0 +1,38 @@
+import re
+
+from app.utils.phrase_matcher import compile_phrase_pattern, remove_phrases
+from config.config import FILLER_PHRASES
+
+
+def remove_phrases_loop(text, phrases):
+    """The per-phrase re.sub loop PromptProcessor used before the compiled pattern."""
+    for phrase in phrases:
+        text = re.sub(r"\b" + re.escape(phrase) + r"\b", "", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip()
+
+
+def test_matches_per_phrase_loop():
+    samples = [
+        "mock data tfsa",
+        "synthetic records dental insurances",
+        "generate synthetic data registered retirement savings plans",
+        "disability coverage policy",
+        "records data generate",
+        "dataset metadata generated",
+        "",
+    ]
+    for sample in samples:
+        assert remove_phrases(sample, FILLER_PHRASES) == remove_phrases_loop(
+            sample, FILLER_PHRASES
+        )
+
+
+def test_longest_phrase_wins():
+    assert remove_phrases("need mock data now", ["data", "mock data"]) == "need now"
+
+
+def test_pattern_rebuilt_when_phrases_change():
+    first = compile_phrase_pattern(("mock data",))
+    assert compile_phrase_pattern(("mock data",)) is first
+    assert compile_phrase_pattern(("mock data", "test data")) is not first
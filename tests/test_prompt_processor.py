@@ -0,0 +1,203 @@
+import pytest
+
+spacy = pytest.importorskip("spacy")
+pytest.importorskip("rapidfuzz")
+
+from spacy.language import Language  # noqa: E402
+
+from app.services import model_registry  # noqa: E402
+from app.services.model_registry import ModelRegistry  # noqa: E402
+from app.services.prompt_processor import PromptProcessor  # noqa: E402
+
+TEST_REQUESTS = [
+    "burgers and fries i want to buy",
+    "Generate synthetic data for a tax free saving account",
+    "I need data for a health insurance policy",
+    "Produce synthetic records for dental insurances",
+    "Mock data for TFSA",
+    "Data generation for retirement savings",
+    "Create data for a claim submission process",
+    "Synthetic data for business owner insurance",
+    "Generate records for critical illness coverage",
+    "Mock data for disability insurance",
+    "Data generation for life insurance policies",
+    "Produce synthetic data for long-term care insurance",
+    "Create mock records for mortgage protection",
+    "Synthetic data for personal health insurance",
+    "Generate data for travel insurance policies",
+    "Mock data for a first home savings account",
+    "Data generation for life income fund",
+    "Produce synthetic records for locked-in retirement accounts",
+    "Create data for registered education savings plans",
+    "Synthetic data for registered retirement income funds",
+    "Generate mock data for registered retirement savings plans",
+    "Data generation for tax-free savings accounts",
+    "I need synthetic data for a critical illness plan",
+    "Produce mock records for a dental plan",
+    "Create data for a disability coverage policy",
+    "Generate synthetic data for a life protection plan",
+    "Mock data for elder care insurance",
+    "Data generation for home loan protection",
+    "Synthetic data for individual health plans",
+    "Produce records for trip protection insurance",
+    "Create mock data for a first-time home buyer savings account",
+    "Generate data for a retirement income fund",
+    "Synthetic data for a pension income fund",
+    "Mock data for a child education fund",
+    "Data generation for a pension fund",
+    "Produce synthetic records for a tax-free investment account",
+]
+
+
+# Docs that went through the full pipeline
+PARSED = []
+
+
+@Language.component("count_docs")
+def count_docs(doc):
+    PARSED.append(doc.text)
+    return doc
+
+
+class KeywordMatcher:
+    """Stands in for SentenceEmbeddingMatcher so the tests don't need torch."""
+
+    def match_template(self, user_request):
+        return self.match_templates([user_request])[0]
+
+    def match_templates(self, user_requests):
+        return [
+            "insurance_travel" if "trip" in request.lower() else "NOT_FOUND"
+            for request in user_requests
+        ]
+
+
+@pytest.fixture(scope="module")
+def processor():
+    try:
+        nlp = spacy.load("en_core_web_sm")
+    except OSError:
+        pytest.skip("en_core_web_sm is not installed")
+    return PromptProcessor(KeywordMatcher(), nlp=nlp)
+
+
+def test_process_many_matches_process(processor):
+    expected = [processor.process(request) for request in TEST_REQUESTS]
+    assert processor.process_many(TEST_REQUESTS, batch_size=8) == expected
+
+
+def test_process_many_matches_process_without_a_model(fake_nlp):
+    processor = PromptProcessor(
+        KeywordMatcher(),
+        nlp=fake_nlp,
+        template_mappings={"insurance_dental": ["produce dental insurance"]},
+    )
+    expected = [processor.process(request) for request in TEST_REQUESTS]
+    assert {result["template"] for result in expected} == {
+        "insurance_dental",
+        "insurance_travel",
+        "NOT_FOUND",
+    }
+
+    processor.template_cache.clear()
+    assert processor.process_many(TEST_REQUESTS, batch_size=8) == expected
+
+
+def test_filter_step_only_tokenizes(fake_nlp):
+    fake_nlp.add_pipe("count_docs", first=True)
+    processor = PromptProcessor(KeywordMatcher(), nlp=fake_nlp, template_mappings={})
+
+    def full_parse_key_phrase(text):
+        # The original three full parses of the prompt
+        filtered_text = processor._filter_doc(fake_nlp(text.lower()))
+        normalized = processor._lemmatize_doc(fake_nlp(filtered_text))
+        return processor._key_phrase_from_doc(fake_nlp(normalized), normalized)
+
+    expected = [full_parse_key_phrase(request) for request in TEST_REQUESTS]
+    assert "produce dental insurance" in expected
+
+    PARSED.clear()
+    assert [processor._extract_key_phrase(r) for r in TEST_REQUESTS] == expected
+    assert len(PARSED) == 2 * len(TEST_REQUESTS)
+
+    PARSED.clear()
+    assert processor._extract_key_phrases(TEST_REQUESTS, batch_size=8) == expected
+    assert len(PARSED) == 2 * len(TEST_REQUESTS)
+
+
+class VersionedMatcher(KeywordMatcher):
+    """KeywordMatcher with an index version, counting embedding lookups."""
+
+    def __init__(self):
+        self.catalog_version = "v1"
+        self.lookups = 0
+        self.changed = False
+
+    def match_templates(self, user_requests):
+        self.lookups += len(user_requests)
+        return super().match_templates(user_requests)
+
+    def reload_if_changed(self):
+        if not self.changed:
+            return False
+        self.changed = False
+        self.catalog_version = "v2"
+        return True
+
+
+@pytest.fixture
+def cached_processor(fake_nlp):
+    return PromptProcessor(
+        VersionedMatcher(),
+        nlp=fake_nlp,
+        template_mappings={"insurance_dental": ["produce dental insurance"]},
+    )
+
+
+def test_repeated_prompt_is_a_cache_hit(cached_processor):
+    matcher = cached_processor.template_matcher
+    first = cached_processor.process("Produce records for trip protection insurance")
+    assert first["template"] == "insurance_travel"
+    # Same words, different case and punctuation
+    again = cached_processor.process("produce records for trip-protection insurance!")
+    assert again["template"] == "insurance_travel"
+    assert matcher.lookups == 1
+    assert cached_processor.template_cache.stats()["hits"] == 1
+
+
+def test_catalog_version_change_invalidates_the_cache(cached_processor):
+    matcher = cached_processor.template_matcher
+    prompt = "Produce records for trip protection insurance"
+    cached_processor.process(prompt)
+
+    matcher.catalog_version = "v2"
+    cached_processor.process(prompt)
+    assert matcher.lookups == 2
+
+    # New mappings change the version as well
+    cached_processor.template_mappings = {"insurance_travel": ["trip protection"]}
+    cached_processor.process(prompt)
+    assert matcher.lookups == 3
+
+
+def test_catalog_refresh_clears_the_cache(cached_processor, monkeypatch):
+    matcher = cached_processor.template_matcher
+    registry = ModelRegistry()
+    registry.template_matcher = matcher
+    registry.template_mappings = cached_processor.template_mappings
+    registry.prompt_processor = cached_processor
+    monkeypatch.setattr(
+        model_registry,
+        "load_template_mappings",
+        lambda: dict(cached_processor.template_mappings),
+    )
+
+    cached_processor.process("Produce records for trip protection insurance")
+    assert registry.refresh_catalog() is False
+    assert len(cached_processor.template_cache) == 1
+
+    matcher.changed = True
+    assert registry.refresh_catalog() is True
+    assert len(cached_processor.template_cache) == 0
+    cached_processor.process("Produce records for trip protection insurance")
+    assert matcher.lookups == 2
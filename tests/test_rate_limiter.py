@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services import http_client, request_model
+from app.services.rate_limiter import ProviderLimiter, RateLimitedError, parse_duration
+
+
+def _limiter(**kwargs):
+    options = dict(
+        requests_per_minute=6000, burst=100, initial_concurrency=4, max_concurrency=8
+    )
+    return ProviderLimiter("test", **{**options, **kwargs})
+
+
+def test_parse_duration():
+    assert parse_duration("2") == 2.0
+    assert parse_duration("0.5") == 0.5
+    assert parse_duration("1m26.4s") == pytest.approx(86.4)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("") is None
+    assert parse_duration("soon") is None
+    assert parse_duration("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_token_bucket_paces_requests():
+    limiter = _limiter(requests_per_minute=1200, burst=2)  # 20 per second
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.run(lambda: None)
+    # Two from the burst, then four at 50ms intervals
+    assert time.monotonic() - start >= 0.18
+
+
+def test_concurrency_grows_and_halves():
+    limiter = _limiter(initial_concurrency=4)
+    for _ in range(40):
+        limiter.run(lambda: None)
+    assert limiter.stats()["limit"] == 8  # Capped at max_concurrency
+
+    limiter.acquire()
+    limiter.release(throttled=True, retry_after=0)
+    stats = limiter.stats()
+    assert (stats["limit"], stats["throttle_events"], stats["in_flight"]) == (4, 1, 0)
+
+
+def test_in_flight_calls_never_exceed_the_limit():
+    limiter = _limiter(initial_concurrency=2, max_concurrency=2)
+    peak, running, lock = [0], [0], threading.Lock()
+
+    def call():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    threads = [threading.Thread(target=limiter.run, args=(call,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+def test_exhausted_quota_headers_pause_the_limiter():
+    limiter = _limiter()
+    limiter.update_from_headers(
+        {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "150ms"}
+    )
+    assert limiter.stats()["paused_for"] > 0
+    start = time.monotonic()
+    limiter.run(lambda: None)
+    assert time.monotonic() - start >= 0.1
+
+
+def test_throttled_calls_are_requeued():
+    limiter = _limiter()
+    attempts = []
+
+    def call():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RateLimitedError("slow down", retry_after=0.05)
+        return "ok"
+
+    assert limiter.run(call) == "ok"
+    assert len(attempts) == 3
+    assert attempts[1] - attempts[0] >= 0.05
+    assert limiter.stats()["throttle_events"] == 2
+
+
+throttled = threading.Event()
+
+
+def throttle_once(body):
+    """Answers the first request with a 429 and retry-after, then completes."""
+    if not throttled.is_set():
+        throttled.set()
+        error = {"error": {"message": "Rate limit reached", "type": "requests"}}
+        return 429, error, {"retry-after": "0.1"}
+    completion = {"choices": [{"message": {"content": "`a,b\n1,2\n`"}}]}
+    return 200, completion, {"x-ratelimit-remaining-requests": "10"}
+
+
+@pytest.fixture
+def groq_server(monkeypatch, stub_server):
+    throttled.clear()
+    server = stub_server(throttle_once)
+    monkeypatch.setattr(request_model, "GROQ_URL", f"{server.url}/v1/chat/completions")
+    yield server
+    asyncio.run(http_client.close_http_clients())
+
+
+@pytest.fixture
+def groq_limiter(monkeypatch, groq_server):
+    limiter = _limiter()
+    monkeypatch.setattr(request_model, "get_rate_limiter", lambda *args: limiter)
+    return limiter
+
+
+def test_groq_429_is_retried_after_retry_after(groq_server, groq_limiter):
+    start = time.monotonic()
+    text = request_model.RequestModel().complete_groq("prompt")
+    assert text == "`a,b\n1,2\n`"
+    assert time.monotonic() - start >= 0.1
+    assert len(groq_server.requests) == 2
+    assert groq_limiter.stats()["throttle_events"] == 1
+
+
+def test_groq_error_body_is_reported():
+    with pytest.raises(ValueError, match="Rate limit reached"):
+        request_model._message_content({"error": {"message": "Rate limit reached"}})
@@ -0,0 +1,243 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.context.request_context import selected_model_ctx
+from app.services import http_client, llm_service, request_model
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_service import LLMService
+from app.services.rate_limiter import ProviderLimiter
+from app.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    InvalidCompletionError,
+    ResilientCaller,
+    is_retryable,
+)
+
+COMPLETION = "`a,b\n1,2\n`"
+
+
+class FakeBackend:
+    """
+    Local OpenAI-style chat server. Each request takes the next (delay, status)
+    from the script; the last entry repeats.
+    """
+
+    def __init__(self, stub_server, *script):
+        self.script = list(script) or [(0, 200)]
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.url = f"{stub_server(self.respond).url}/v1/chat/completions"
+
+    def respond(self, body):
+        with self._lock:
+            index = min(self.requests, len(self.script) - 1)
+            self.requests += 1
+        delay, status = self.script[index]
+        time.sleep(delay)
+        if status != 200:
+            return status, {"error": {"message": f"injected {status}"}}, {}
+        return status, {"choices": [{"message": {"content": COMPLETION}}]}, {}
+
+    def complete(self):
+        response = http_client.post_json(self.url, {"messages": []})
+        return response["choices"][0]["message"]["content"]
+
+
+@pytest.fixture
+def backends(stub_server):
+    """Starts FakeBackends on demand."""
+    yield lambda *script: FakeBackend(stub_server, *script)
+    asyncio.run(http_client.close_http_clients())
+
+
+def _caller(**kwargs):
+    options = dict(
+        retry_attempts=3,
+        base_delay=0.01,
+        max_delay=0.05,
+        hedging=False,
+        alternates={"bedrock": ["groq"], "groq": []},
+        failure_threshold=3,
+        reset_timeout=60,
+    )
+    return ResilientCaller(**{**options, **kwargs})
+
+
+def _route(**servers):
+    return lambda backend: servers[backend].complete()
+
+
+def test_retryable_errors_are_retried(backends):
+    flaky = backends((0, 503), (0, 500), (0, 200))
+    caller = _caller()
+    assert caller.call("groq", _route(groq=flaky)) == COMPLETION
+    assert flaky.requests == 3
+    assert caller.stats()["retries"] == 2
+    assert caller.breaker("groq").state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_retried(backends):
+    broken = backends((0, 400))
+    caller = _caller()
+    with pytest.raises(httpx.HTTPStatusError):
+        caller.call("groq", _route(groq=broken))
+    assert broken.requests == 1
+
+
+def test_failing_primary_fails_over(backends):
+    down, up = backends((0, 500)), backends()
+    caller = _caller()
+    assert caller.call("bedrock", _route(bedrock=down, groq=up)) == COMPLETION
+    assert (down.requests, up.requests) == (3, 1)
+    assert caller.stats()["failovers"] == 1
+
+
+def test_hedge_answers_when_a_straggler_fails(backends):
+    # The primary fails (non-retryable) after 1s; the hedge went out at 0.1s
+    slow, fast = backends((1, 400)), backends()
+    caller = _caller(hedging=True, hedge_default_delay=0.1)
+    start = time.monotonic()
+    assert caller.call("bedrock", _route(bedrock=slow, groq=fast)) == COMPLETION
+    assert time.monotonic() - start < 1.5
+    # The hedge's answer was used, not a fresh failover call
+    assert fast.requests == 1
+    stats = caller.stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["failovers"]) == (1, 1, 0)
+    caller.shutdown(wait=True)
+
+
+def test_hedged_primary_runs_on_the_callers_thread(backends):
+    slow, fast = backends((0.5, 200)), backends()
+    threads = []
+
+    def route(backend):
+        threads.append((backend, threading.current_thread()))
+        return _route(bedrock=slow, groq=fast)(backend)
+
+    caller = _caller(hedging=True, hedge_default_delay=0.1)
+    assert caller.call("bedrock", route) == COMPLETION
+    caller.shutdown(wait=True)  # The abandoned hedge still completes
+    assert dict(threads)["bedrock"] is threading.current_thread()
+    assert dict(threads)["groq"].name.startswith("llm-hedge")
+    stats = caller.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 0)
+    assert caller.breaker("groq").stats()["consecutive_failures"] == 0
+
+    # A primary answering before its hedge delay sends no hedge
+    assert caller.call("bedrock", _route(bedrock=fast, groq=fast)) == COMPLETION
+    assert caller.stats()["hedges"] == 1
+
+
+def test_failover_is_opt_in(backends):
+    down, up = backends((0, 400)), backends()
+    caller = ResilientCaller(retry_attempts=1)
+    with pytest.raises(httpx.HTTPStatusError):
+        caller.call("bedrock", _route(bedrock=down, groq=up))
+    assert up.requests == 0
+
+
+def test_hedge_delay_follows_the_latency_percentile():
+    caller = _caller(hedge_min_samples=10, hedge_default_delay=30)
+    assert caller.hedge_delay("bedrock") == 30
+    for seconds in range(1, 21):
+        caller.latency("bedrock").record(seconds / 10)
+    assert caller.hedge_delay("bedrock") == pytest.approx(2.0)  # p95 of 0.1..2.0
+
+
+def test_invalid_completion_tries_the_next_backend(backends):
+    primary, alternate = backends(), backends()
+
+    def validate(text):
+        if text == COMPLETION and not validate.seen:
+            validate.seen = True
+            raise ValueError("no CSV block")
+
+    validate.seen = False
+    caller = _caller()
+    route = _route(bedrock=primary, groq=alternate)
+    assert caller.call("bedrock", route, validate) == COMPLETION
+    # Invalid answers aren't retried and don't count against the backend
+    assert (primary.requests, alternate.requests) == (1, 1)
+    assert caller.breaker("bedrock").failures == 0
+
+    with pytest.raises(InvalidCompletionError):
+        _caller().call("groq", lambda backend: "")
+
+
+def test_breaker_routes_away_and_recovers(backends):
+    down, up = backends((0, 500), (0, 500), (0, 500), (0, 200)), backends()
+    caller = _caller(retry_attempts=1, failure_threshold=3, reset_timeout=0.2)
+    route = _route(bedrock=down, groq=up)
+    for _ in range(3):
+        caller.call("bedrock", route)
+    assert caller.breaker("bedrock").state == CircuitBreaker.OPEN
+
+    # Open: the failing backend isn't called at all
+    caller.call("bedrock", route)
+    assert down.requests == 3
+
+    # After the reset timeout one trial call closes it again
+    time.sleep(0.25)
+    caller.call("bedrock", route)
+    assert down.requests == 4
+    assert caller.breaker("bedrock").state == CircuitBreaker.CLOSED
+
+
+def test_all_breakers_open():
+    caller = _caller(retry_attempts=1, failure_threshold=1)
+
+    def fail(backend):
+        raise httpx.ConnectError("refused")
+
+    with pytest.raises(httpx.ConnectError):
+        caller.call("groq", fail)
+    with pytest.raises(CircuitOpenError):
+        caller.call("groq", fail)
+
+
+def test_llm_service_retries_groq(backends, monkeypatch):
+    groq = backends((0, 502), (0, 200))
+    monkeypatch.setattr(request_model, "GROQ_URL", groq.url)
+    limiter = ProviderLimiter("test", 6000, 100, 4, 8)
+    monkeypatch.setattr(request_model, "get_rate_limiter", lambda *args: limiter)
+    caller = _caller()
+    monkeypatch.setattr(llm_service, "get_resilient_caller", lambda: caller)
+
+    token = selected_model_ctx.set("llama3-70b-8192")
+    try:
+        assert LLMService.call_llm_text("prompt") == COMPLETION
+    finally:
+        selected_model_ctx.reset(token)
+    assert groq.requests == 2
+
+
+def test_botocore_transport_errors_fail_over_without_retrying():
+    from botocore.exceptions import ClientError, ReadTimeoutError
+
+    # botocore already retried these BEDROCK_MAX_ATTEMPTS times
+    assert not is_retryable(ReadTimeoutError(endpoint_url="https://bedrock"))
+    error = {"Error": {"Code": "ModelNotReadyException", "Message": "warming"}}
+    assert is_retryable(ClientError(error, "InvokeModel"))
+
+
+def test_cache_hits_are_not_recorded_as_latency(monkeypatch):
+    cache = LLMResponseCache(enabled=True, memory_size=8, directory=None)
+    monkeypatch.setattr(request_model, "get_llm_cache", lambda: cache)
+
+    def invoke_groq(self, prompt):
+        time.sleep(0.05)
+        return COMPLETION
+
+    monkeypatch.setattr(request_model.RequestModel, "_invoke_groq", invoke_groq)
+    rm = request_model.RequestModel()
+    caller = _caller()
+    for _ in range(5):
+        assert caller.call("groq", lambda backend: rm.complete_groq("p")) == COMPLETION
+    latency = caller.latency("groq")
+    assert latency.percentile(50) >= 0.05
+    assert latency.percentile(0, min_samples=2) is None  # Only the real call
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from app.services import sentence_embeddings  # noqa: E402
+from app.services.sentence_embeddings import SentenceEmbeddingMatcher  # noqa: E402
+
+DESCRIPTIONS = {
+    "insurance_dental": "dental insurance policy records",
+    "insurance_travel": "travel insurance trip protection",
+    "investment_tfsa": "tax free savings account investments",
+}
+
+
+class HashingEncoder:
+    """Bag-of-words hashing encoder, so the tests don't need torch."""
+
+    dim = 64
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=64, normalize_embeddings=True):
+        self.encoded.extend(texts)
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                digest = hashlib.sha256(word.encode("utf-8")).digest()
+                embeddings[row, digest[0] % self.dim] += 1.0
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+
+def write_templates(directory, descriptions):
+    directory.mkdir(exist_ok=True)
+    for name in os.listdir(directory):
+        os.remove(directory / name)
+    for name, description in descriptions.items():
+        with open(directory / f"{name}.json", "w", encoding="utf-8") as f:
+            json.dump({"description": description, "fields": {}}, f)
+
+
+def make_matcher(tmp_path, descriptions=DESCRIPTIONS, encoder=None):
+    write_templates(tmp_path / "templates", descriptions)
+    return SentenceEmbeddingMatcher(
+        templates_dir=str(tmp_path / "templates"),
+        index_path=str(tmp_path / "faiss" / "index.index"),
+        metadata_path=str(tmp_path / "faiss" / "metadata.json"),
+        encoder=encoder or HashingEncoder(),
+    )
+
+
+def test_scores_are_cosine_similarities(tmp_path):
+    matcher = make_matcher(tmp_path)
+    [hits] = matcher.search(["dental insurance policy records"], k=3)
+    assert hits[0]["template"] == "insurance_dental"
+    assert hits[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+    encoder = matcher.model
+    query, *rest = encoder.encode(
+        ["travel insurance"] + list(DESCRIPTIONS.values()),
+    )
+    expected = dict(zip(DESCRIPTIONS, rest @ query))
+    [hits] = matcher.search(["travel insurance"], k=3)
+    for hit in hits:
+        assert hit["score"] == pytest.approx(expected[hit["template"]], abs=1e-5)
+    assert [hit["score"] for hit in hits] == sorted(
+        (hit["score"] for hit in hits), reverse=True
+    )
+
+
+def test_top_k_confidence_and_min_margin(tmp_path):
+    matcher = make_matcher(tmp_path)
+    [hits] = matcher.search(["travel insurance"], k=3)
+    assert len(hits) == 3
+    for hit, runner_up in zip(hits, hits[1:]):
+        assert hit["confidence"] == pytest.approx(hit["score"] - runner_up["score"])
+    assert hits[-1]["confidence"] == pytest.approx(hits[-1]["score"])
+
+    # "insurance" is shared by two templates, so the margin is below 1
+    margin = hits[0]["confidence"]
+    assert matcher.match_templates(["travel insurance"], threshold=0.0) == [
+        "insurance_travel"
+    ]
+    assert matcher.match_templates(
+        ["travel insurance"], threshold=0.0, min_margin=margin + 0.01
+    ) == ["NOT_FOUND"]
+    assert matcher.match_template("burgers and fries") == "NOT_FOUND"
+
+
+@pytest.mark.parametrize(
+    "size, index_type",
+    [(3, "flat"), (6, "hnsw"), (12, "ivf")],
+)
+def test_index_type_follows_catalog_size(tmp_path, monkeypatch, size, index_type):
+    monkeypatch.setattr(sentence_embeddings, "FAISS_INDEX_TYPE", "auto")
+    monkeypatch.setattr(sentence_embeddings, "FAISS_HNSW_MIN_TEMPLATES", 5)
+    monkeypatch.setattr(sentence_embeddings, "FAISS_IVF_MIN_TEMPLATES", 10)
+    descriptions = {f"template_{i}": f"topic{i} records" for i in range(size)}
+    matcher = make_matcher(tmp_path, descriptions)
+
+    assert matcher.index_type == index_type
+    assert matcher.index.ntotal == size
+    expected = {"flat": faiss.IndexFlat, "hnsw": faiss.IndexHNSW, "ivf": faiss.IndexIVF}
+    index = matcher.index
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    assert isinstance(index, expected[index_type])
+    assert index.metric_type == faiss.METRIC_INNER_PRODUCT
+    assert matcher.match_template(f"topic{size - 1} records") == f"template_{size - 1}"
+
+
+def test_persist_is_atomic_and_failures_keep_the_index(tmp_path, monkeypatch):
+    matcher = make_matcher(tmp_path)
+    # No temp files are left behind
+    assert sorted(os.listdir(tmp_path / "faiss")) == ["index.index", "metadata.json"]
+    with open(tmp_path / "faiss" / "metadata.json", encoding="utf-8") as f:
+        metadata = json.load(f)
+    assert metadata["metric"] == "inner_product"
+    assert metadata["encoder"] == matcher.encoder_id
+
+    def read_only(src, dst):
+        raise PermissionError(30, "Read-only file system", dst)
+
+    monkeypatch.setattr(sentence_embeddings.os, "replace", read_only)
+    write_templates(
+        tmp_path / "templates", {**DESCRIPTIONS, "investment_rrsp": "retirement plan"}
+    )
+    matcher = SentenceEmbeddingMatcher(
+        templates_dir=str(tmp_path / "templates"),
+        index_path=str(tmp_path / "faiss" / "index.index"),
+        metadata_path=str(tmp_path / "faiss" / "metadata.json"),
+        encoder=HashingEncoder(),
+    )
+    assert matcher.match_template("retirement plan") == "investment_rrsp"
+
+
+def test_changed_templates_are_patched_into_the_persisted_index(tmp_path):
+    make_matcher(tmp_path)
+    updated = dict(DESCRIPTIONS)
+    del updated["investment_tfsa"]
+    updated["insurance_dental"] = "dental plan coverage"
+    updated["investment_rrsp"] = "retirement savings plan"
+    write_templates(tmp_path / "templates", updated)
+
+    encoder = HashingEncoder()
+    matcher = SentenceEmbeddingMatcher(
+        templates_dir=str(tmp_path / "templates"),
+        index_path=str(tmp_path / "faiss" / "index.index"),
+        metadata_path=str(tmp_path / "faiss" / "metadata.json"),
+        encoder=encoder,
+    )
+    # Only the changed and added templates were re-encoded
+    assert sorted(encoder.encoded) == [
+        "dental plan coverage",
+        "retirement savings plan",
+    ]
+    assert isinstance(matcher.index, faiss.IndexIDMap2)
+    assert matcher.index.ntotal == 3
+    assert matcher.filenames == sorted(updated)
+    ids = [entry["id"] for entry in matcher._entries]
+    assert len(set(ids)) == 3 and matcher._next_id == 5
+    assert matcher.match_template("dental plan coverage") == "insurance_dental"
+    assert matcher.match_template("retirement savings plan") == "investment_rrsp"
+    # The removed template is no longer in the index
+    [hits] = matcher.search(["tax free savings account investments"], k=3)
+    assert "investment_tfsa" not in [hit["template"] for hit in hits]
+
+
+def test_hnsw_index_is_rebuilt_when_templates_change(tmp_path, monkeypatch):
+    monkeypatch.setattr(sentence_embeddings, "FAISS_INDEX_TYPE", "hnsw")
+    make_matcher(tmp_path)
+    write_templates(
+        tmp_path / "templates",
+        {**DESCRIPTIONS, "insurance_dental": "dental plan coverage"},
+    )
+
+    encoder = HashingEncoder()
+    matcher = SentenceEmbeddingMatcher(
+        templates_dir=str(tmp_path / "templates"),
+        index_path=str(tmp_path / "faiss" / "index.index"),
+        metadata_path=str(tmp_path / "faiss" / "metadata.json"),
+        encoder=encoder,
+    )
+    # HNSW can't remove the old vector, so everything was re-encoded
+    assert len(encoder.encoded) == 3
+    assert matcher.index_type == "hnsw" and matcher.index.ntotal == 3
+    assert matcher.match_template("dental plan coverage") == "insurance_dental"
+
+
+def test_reload_if_changed_reports_catalog_changes(tmp_path):
+    matcher = make_matcher(tmp_path)
+    version = matcher.catalog_version
+    assert matcher.reload_if_changed() is False
+
+    write_templates(
+        tmp_path / "templates",
+        {**DESCRIPTIONS, "investment_rrsp": "retirement savings plan"},
+    )
+    assert matcher.reload_if_changed() is True
+    assert matcher.catalog_version != version
+    assert matcher.match_template("retirement savings plan") == "investment_rrsp"
+    assert matcher.reload_if_changed() is False
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+import pytest
+
+from app.context.request_context import selected_model_ctx
+from app.services import http_client, request_model
+from app.services.csv_parser import IncrementalCsvParser
+from app.services.llm_service import LLMService
+
+CSV = (
+    "Here is the data:\n"
+    "```csv\n"
+    "ClaimID,Notes,Amount\n"
+    'CLM-1,"Rear-ended at a light, minor damage",1200\n'
+    'CLM-2,"Customer said ""it was dark""\nand raining",830.5\n'
+    "CLM-3,Windshield chip,90\n"
+    "```\n"
+    "Let me know if you need more."
+)
+ROWS = [
+    ["CLM-1", "Rear-ended at a light, minor damage", "1200"],
+    ["CLM-2", 'Customer said "it was dark"\nand raining', "830.5"],
+    ["CLM-3", "Windshield chip", "90"],
+]
+
+
+def _pieces(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+release_last_row = threading.Event()
+
+
+def _events(text):
+    """OpenAI-style SSE deltas, split by the network at arbitrary points."""
+    stream = "".join(
+        "data: " + json.dumps({"choices": [{"delta": {"content": delta}}]}) + "\n\n"
+        for delta in _pieces(text, 7)
+    )
+    return _pieces(stream, 13)
+
+
+def replay(body):
+    """Streams CSV as SSE deltas, holding the last row back until released."""
+    assert body["stream"] is True
+
+    def stream():
+        last_row = CSV.index("CLM-3")
+        yield from _events(CSV[:last_row])
+        # Hold the last row back until the client has seen the earlier ones
+        release_last_row.wait(timeout=5)
+        yield from _events(CSV[last_row:])
+        yield "data: [DONE]\n\n"
+
+    return 200, stream(), {"Content-Type": "text/event-stream"}
+
+
+@pytest.fixture
+def groq_url(monkeypatch, stub_server):
+    release_last_row.clear()
+    url = f"{stub_server(replay).url}/v1/chat/completions"
+    monkeypatch.setattr(request_model, "GROQ_URL", url)
+    yield url
+    release_last_row.set()
+    asyncio.run(http_client.close_http_clients())
+
+
+def test_incremental_parser_matches_any_chunking():
+    rng = random.Random(0)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(CSV)), rng.randint(1, 40)))
+        chunks = [CSV[i:j] for i, j in zip([0] + cuts, cuts + [len(CSV)])]
+        parser = IncrementalCsvParser()
+        rows = [row for chunk in chunks for row in parser.feed(chunk)]
+        rows += parser.close()
+        assert parser.header == ["ClaimID", "Notes", "Amount"]
+        assert rows == ROWS
+
+
+def test_incremental_parser_emits_rows_on_newline():
+    parser = IncrementalCsvParser()
+    assert parser.feed("```\nA,B\n1,") == []
+    assert parser.feed("2\n3") == [["1", "2"]]
+    assert parser.feed(",4\n`") == [["3", "4"]]
+    assert parser.close() == []
+
+
+def test_incremental_parser_without_fence_fails():
+    parser = IncrementalCsvParser()
+    parser.feed("I can't help with that.")
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_groq_stream_yields_deltas(groq_url):
+    release_last_row.set()
+    text = "".join(request_model.RequestModel().stream_groq("prompt"))
+    assert text == CSV
+
+
+def test_stream_rows_arrive_before_the_response_ends(groq_url):
+    token = selected_model_ctx.set("llama3-70b-8192")
+    try:
+        rows = LLMService.stream_rows("prompt")
+        first = next(rows)
+        second = next(rows)
+        # The server is still holding back the rest of the response
+        assert not release_last_row.is_set()
+        release_last_row.set()
+        rest = list(rows)
+    finally:
+        selected_model_ctx.reset(token)
+
+    assert [first, second] + rest == [
+        dict(zip(["ClaimID", "Notes", "Amount"], row)) for row in ROWS
+    ]
+
+
+def test_stream_through_the_bound_event_loop(groq_url):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        http_client.bind_event_loop(loop)
+        release_last_row.set()
+        start = time.perf_counter()
+        text = "".join(request_model.RequestModel().stream_groq("prompt"))
+        assert text == CSV
+        assert time.perf_counter() - start < 5
+        assert http_client._sync_client is None
+    finally:
+        asyncio.run_coroutine_threadsafe(
+            http_client.close_http_clients(), loop
+        ).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
@@ -0,0 +1,53 @@
+import random
+import string
+
+import pytest
+
+pytest.importorskip("rapidfuzz")
+
+from rapidfuzz import fuzz, process  # noqa: E402
+
+from app.services.template_candidate_index import TemplateCandidateIndex  # noqa: E402
+from app.utils.template_loader import _load_template_mappings_from_local  # noqa: E402
+
+
+def linear_match(mappings, query, threshold=85.0):
+    """The flatten + extractOne + linear scan PromptProcessor used before the index."""
+    candidate_list = [desc for sublist in mappings.values() for desc in sublist]
+    best_match, score, _ = process.extractOne(
+        query, candidate_list, scorer=fuzz.token_sort_ratio
+    )
+    if score >= threshold:
+        for key, value_list in mappings.items():
+            if best_match in value_list:
+                return key
+    return "NOT_FOUND"
+
+
+def test_matches_linear_extract_one():
+    mappings = _load_template_mappings_from_local()
+    index = TemplateCandidateIndex(mappings)
+
+    rng = random.Random(7)
+    phrases = [desc for sublist in mappings.values() for desc in sublist]
+    queries = ["burgers fries", "tax free saving account", "retirement income fund"]
+    for phrase in rng.sample(phrases, 40):
+        # Drop or swap a character so most queries are near misses
+        chars = list(phrase)
+        chars[rng.randrange(len(chars))] = rng.choice(string.ascii_lowercase)
+        queries.append("".join(chars))
+        queries.append(" ".join(reversed(phrase.split())))
+
+    assert [index.match(query) for query in queries] == [
+        linear_match(mappings, query) for query in queries
+    ]
+    assert index.match_many(queries) == [
+        linear_match(mappings, query) for query in queries
+    ]
+
+
+def test_version_changes_with_catalog():
+    first = TemplateCandidateIndex({"investment_tfsa": ["tfsa"]})
+    second = TemplateCandidateIndex({"investment_tfsa": ["tfsa", "tax free savings"]})
+    assert first.version != second.version
+    assert TemplateCandidateIndex({}).match("tfsa") == "NOT_FOUND"
@@ -0,0 +1,29 @@
+import time
+
+from app.utils.ttl_cache import TTLCache
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" becomes most recently used
+    cache.set("c", 3)  # evicts "b"
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {
+        "size": 2,
+        "maxsize": 2,
+        "hits": 2,
+        "misses": 1,
+        "hit_rate": 2 / 3,
+    }
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(maxsize=10, ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0